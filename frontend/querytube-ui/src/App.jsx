@@ -20,6 +20,7 @@ export default function App() {
   /* SUMMARY */
   const [videoId, setVideoId] = useState("");
   const [summary, setSummary] = useState("");
+  const summaryStreamRef = useRef(null);
 
   /* SPEECH (TEXT TO SPEECH) */
   const speechRef = useRef(null);
@@ -103,6 +104,7 @@ export default function App() {
   /* ✅ BACK */
   const goHome = () => {
     stopSpeech();
+    if (summaryStreamRef.current) summaryStreamRef.current.close();
     try {
       if (recognitionRef.current) recognitionRef.current.stop();
     } catch {}
@@ -120,7 +122,7 @@ export default function App() {
       const res = await fetch(`${API_BASE}/search`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ query, top_k: 6 }),
+        body: JSON.stringify({ query, top_k: 6, mode: "hybrid" }),
       });
 
       const data = await res.json();
@@ -152,7 +154,21 @@ export default function App() {
       });
 
       const data = await res.json();
-      data.error ? setIngestError(data.error) : setIngestStats(data);
+      if (data.error || !data.status_url) {
+        setIngestError(data.error || "Upload failed");
+        return;
+      }
+
+      /* Ingest runs as a background job — poll until it finishes */
+      let job = data;
+      while (job.status === "queued" || job.status === "running") {
+        setIngestStats(job);
+        await new Promise((r) => setTimeout(r, 1000));
+        const poll = await fetch(`${API_BASE}${data.status_url}`);
+        job = await poll.json();
+      }
+
+      job.error ? setIngestError(job.error) : setIngestStats(job);
     } catch {
       setIngestError("Upload failed");
     }
@@ -166,16 +182,27 @@ export default function App() {
 
     setSummary("loading");
 
-    try {
-      const res = await fetch(
-        `${API_BASE}/summarize?video_id=${videoId}`,
-        { method: "POST" }
-      );
-      const data = await res.json();
-      setSummary(data.summary || "No summary available");
-    } catch {
-      setSummary("Failed to generate summary");
-    }
+    /* Tokens stream in over SSE; closing the source cancels generation */
+    if (summaryStreamRef.current) summaryStreamRef.current.close();
+
+    const source = new EventSource(
+      `${API_BASE}/summarize/stream?video_id=${encodeURIComponent(videoId)}`
+    );
+    summaryStreamRef.current = source;
+
+    let text = "";
+    source.onmessage = (e) => {
+      text += JSON.parse(e.data).token || "";
+      setSummary(text);
+    };
+    source.addEventListener("done", () => {
+      source.close();
+      if (!text) setSummary("No summary available");
+    });
+    source.addEventListener("error", () => {
+      source.close();
+      if (!text) setSummary("Failed to generate summary");
+    });
   };
 
   const videos = results.length > 0 ? results : demoVideos;
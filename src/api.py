@@ -1,19 +1,61 @@
-from fastapi import FastAPI, UploadFile, File
+import time
+
+# Start of the app_import startup phase
+APP_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Literal, Optional
+from datetime import datetime
+from contextlib import aclosing, asynccontextmanager
 import os
-import pickle
-import pandas as pd
-import faiss
-import requests
-from sentence_transformers import SentenceTransformer
+import gc
+import json
+import asyncio
+import shutil
+import threading
+import numpy as np
+
+from src.encoders import default_onnx_file, load_encoder
+from src.snapshot_store import SnapshotStore
+from src.ingest_jobs import IngestJobManager
+from src.search_batcher import SearchBatcher
+from src.query_cache import LRUCache, normalize_query
+from src.index_factory import LOSSY_TYPES, filtered_search_plan, search_params
+from src.lexical_index import reciprocal_rank_fusion
+from src.metadata_columns import filters_key
+from src.summary_store import SingleFlight, SummaryStore, transcript_hash
+from src.map_reduce_summary import MODEL_CONTEXT_TOKENS, MapReduceSummarizer, single_prompt_budget
+from src.ollama_client import OllamaError, OllamaOverloaded, OllamaPool
+from src.startup import StartupPhases
+from src.process_memory import memory_usage
+from src.shards import ShardedSearcher
 
 # ===============================
 # APP INIT
 # ===============================
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Runs the STARTUP_MODE policy when the server starts (see STARTUP).
+    """
+    if STARTUP_MODE == "eager":
+        # Old behaviour: the server only accepts connections once warm
+        await asyncio.to_thread(start_up)
+    elif STARTUP_MODE == "lazy":
+        startup.ready = True
+    else:
+        threading.Thread(target=start_up, name="startup", daemon=True).start()
+    yield
+    if sharded_searcher is not None:
+        sharded_searcher.close()
+
 app = FastAPI(
     title="Infosys Task 1 - VectorDB API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -27,39 +69,235 @@ app.add_middleware(
 # ===============================
 # CONFIG
 # ===============================
+# Versioned snapshots (index + metadata + manifest) live under SNAPSHOT_DIR.
+# INDEX_PATH / METADATA_PATH are only read until the first snapshot exists.
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOTS_TO_KEEP = int(os.getenv("SNAPSHOTS_TO_KEEP", 3))
+SNAPSHOT_VERIFY = os.getenv("SNAPSHOT_VERIFY", "0") == "1"
 INDEX_PATH = "vector.index"
 METADATA_PATH = "metadata.pkl"
 EMBEDDING_DIM = 384
+MODEL_NAME = "all-MiniLM-L6-v2"
+# torch | torch_int8 | onnx | onnx_int8 (see encoders.py)
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+# Resolved here so the embedding cache key names the file actually used
+ENCODER_ONNX_FILE = os.getenv("ENCODER_ONNX_FILE") or default_onnx_file(ENCODER_BACKEND)
+# Unset: CUDA when available, else CPU (int8 backends always use CPU)
+ENCODER_DEVICE = os.getenv("ENCODER_DEVICE") or None
+
+# When the encoder and index get loaded:
+#   background : after the server starts, in a thread; /health/ready is 503 until warm
+#   eager      : before the server accepts connections
+#   lazy       : on the first request that needs them (no warm-up)
+#   preload    : at import, in the parent of forked workers (src/serve.py or
+#                gunicorn --preload), which share the pages copy-on-write;
+#                each worker only runs the warm-up after the fork
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+WARMUP_QUERIES = ["python tutorial", "how to build a neural network from scratch"]
+
+# flat | hnsw | ivf_flat | ivf_pq (IVF types train once the corpus is big enough)
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_PARAMS = {
+    "nlist": int(os.getenv("INDEX_NLIST", 0)) or None,
+    "nprobe": int(os.getenv("INDEX_NPROBE", 8)),
+    "ef_search": int(os.getenv("INDEX_EF_SEARCH", 64)),
+}
+
+# Rows read, embedded and indexed per step of an ingest job
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", 1000))
+INGEST_JOBS_DIR = "ingest_jobs"
+# Encoder processes per ingest job (texts are length-bucketed across them)
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", os.cpu_count() or 1))
+
+# Micro-batching of concurrent /search calls
+SEARCH_BATCHING = os.getenv("SEARCH_BATCHING", "1") == "1"
+SEARCH_BATCH_MAX_SIZE = int(os.getenv("SEARCH_BATCH_MAX_SIZE", 32))
+SEARCH_BATCH_WAIT_MS = float(os.getenv("SEARCH_BATCH_WAIT_MS", 3))
+
+# Quantized indexes fetch top_k * RERANK_FACTOR candidates and re-score
+# them exactly against the snapshot's float32 vectors (1 = no re-rank)
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", 4))
+
+# Dense search over N index shards (rows split by video_id hash), each in
+# its own local process; results are merged by score (0 = no sharding)
+SEARCH_SHARDS = int(os.getenv("SEARCH_SHARDS", 0))
+
+# Hybrid search: candidates taken from each ranking, and the RRF constant
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 50))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+# Query-embedding and search-result caches
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 10_000))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 3600))
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 10_000))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 300))
+
+EMBEDDING_CACHE_DIR = "embedding_cache"
+EMBEDDING_CACHE_MAX_ENTRIES = 200_000
+
+# Internal bookkeeping fields not returned to clients
+INTERNAL_FIELDS = ("faiss_id", "content_hash")
 
 OLLAMA_URL = "http://localhost:11434/api/generate"
 OLLAMA_MODEL = "llama3"
+# One local Ollama: cap concurrent generations, queue a few, reject the rest
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", 2))
+OLLAMA_MAX_QUEUE = int(os.getenv("OLLAMA_MAX_QUEUE", 16))
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", 30))
+
+# Bump when the summary prompt changes so cached summaries are regenerated
+SUMMARY_PROMPT_VERSION = 1
+SUMMARY_DB_PATH = "summaries.db"
+# Pre-summarize the N most-viewed videos after each ingest (0 = off)
+SUMMARY_PRECOMPUTE_TOP_N = int(os.getenv("SUMMARY_PRECOMPUTE_TOP_N", 0))
+# Context size requested from Ollama; transcripts that fit in it (minus
+# room for the output) are summarized in a single prompt
+SUMMARY_CONTEXT_TOKENS = int(os.getenv("SUMMARY_CONTEXT_TOKENS", MODEL_CONTEXT_TOKENS))
+# Longer transcripts are summarized map-reduce style in chunks of this size
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 1500))
+# More map calls in flight than Ollama slots would only fill the queue
+SUMMARY_MAP_WORKERS = int(os.getenv("SUMMARY_MAP_WORKERS", OLLAMA_MAX_CONCURRENCY))
 
 # ===============================
-# MODELS
+# MODELS (LAZY LOADING)
 # ===============================
-model = SentenceTransformer("all-MiniLM-L6-v2")
+startup = StartupPhases(STARTUP_MODE)
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """
+    Encoder, loaded on first use. Requests arriving during the load wait
+    for it instead of loading a second copy.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                with startup.phase("model_load"):
+                    _model = load_encoder(MODEL_NAME, ENCODER_BACKEND, ENCODER_ONNX_FILE, ENCODER_DEVICE)
+    return _model
+
+query_embedding_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+search_result_cache = LRUCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+
+class SearchFilters(BaseModel):
+    # Channel names match case-insensitively; durations are in seconds
+    channels: Optional[List[str]] = None
+    min_views: Optional[int] = Field(default=None, ge=0)
+    max_views: Optional[int] = Field(default=None, ge=0)
+    min_duration: Optional[float] = Field(default=None, ge=0)
+    max_duration: Optional[float] = Field(default=None, ge=0)
+    published_after: Optional[datetime] = None
+    published_before: Optional[datetime] = None
 
 class SearchRequest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    query: str
+    top_k: int = 5
+    # Optional per-query ANN knobs (ignored by index types they don't apply to)
+    nprobe: Optional[int] = Field(default=None, ge=1)
+    ef_search: Optional[int] = Field(default=None, ge=1, alias="efSearch")
+    # dense: MiniLM only, lexical: BM25 only, hybrid: both fused with RRF
+    mode: Literal["dense", "lexical", "hybrid"] = "dense"
+    filters: Optional[SearchFilters] = None
+
+class BatchQuery(BaseModel):
     query: str
     top_k: int = 5
 
+class BatchSearchRequest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    queries: List[BatchQuery]
+    nprobe: Optional[int] = Field(default=None, ge=1)
+    ef_search: Optional[int] = Field(default=None, ge=1, alias="efSearch")
+
 # ===============================
-# FAISS (LAZY LOADING) 🔥
+# INDEX + METADATA SNAPSHOT (LAZY LOADING) 🔥
 # ===============================
-index = None
+snapshot_store = SnapshotStore(
+    SNAPSHOT_DIR,
+    EMBEDDING_DIM,
+    legacy_index_path=INDEX_PATH,
+    legacy_metadata_path=METADATA_PATH,
+    mmap=True,
+    keep=SNAPSHOTS_TO_KEEP,
+    verify=SNAPSHOT_VERIFY
+)
+
+def get_snapshot():
+    """
+    Current index + metadata pair. Loaded on first use (index mmapped)
+    and only reloaded when the CURRENT pointer changes.
+    """
+    return snapshot_store.current()
 
 def get_faiss_index():
     """
     Loads FAISS index only when needed.
     Prevents MemoryError on Windows / Python 3.14.
+    The index type saved with the snapshot decides the search parameters.
+    """
+    return get_snapshot().index
+
+# Shard processes are spawned on first use, i.e. after a preload fork
+sharded_searcher = (
+    ShardedSearcher(SNAPSHOT_DIR, EMBEDDING_DIM, SEARCH_SHARDS, rerank_factor=RERANK_FACTOR)
+    if SEARCH_SHARDS > 0 else None
+)
+
+def sharded(snapshot):
+    """
+    True when searches of this snapshot go to the shard processes.
+    Legacy files (no snapshot directory) are always searched in-process.
+    """
+    return sharded_searcher is not None and snapshot.name not in (None, "legacy")
+
+# ===============================
+# STARTUP
+# ===============================
+def load_index():
+    if not startup.done("index_load"):
+        with startup.phase("index_load"):
+            get_snapshot()
+
+def load_shards():
+    snapshot = get_snapshot()
+    if sharded(snapshot):
+        with startup.phase("shards_load"):
+            sharded_searcher.load(snapshot.name)
+
+def warm_up():
     """
-    global index
-    if index is None:
-        if os.path.exists(INDEX_PATH):
-            index = faiss.read_index(INDEX_PATH)
-        else:
-            index = faiss.IndexFlatIP(EMBEDDING_DIM)
-    return index
+    One encode and one search so the first real query doesn't pay for
+    lazy allocations and thread pool start-up.
+    """
+    with startup.phase("warmup"):
+        embeddings = get_model().encode(
+            WARMUP_QUERIES,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype("float32")
+        snapshot = get_snapshot()
+        if sharded(snapshot):
+            sharded_searcher.search(snapshot.name, embeddings, 1)
+        elif snapshot.rows is not None:
+            snapshot.index.search(embeddings, 1)
+
+def start_up():
+    try:
+        get_model()
+        load_index()
+        load_shards()
+        warm_up()
+    except Exception as e:
+        print(f"❌ Startup failed: {e}")
+        return
+    startup.ready = True
+    print(f"✅ Ready in {startup.stats()['total_ms']} ms (pid {os.getpid()})")
 
 # ===============================
 # HEALTH
@@ -68,151 +306,541 @@ def get_faiss_index():
 def health_check():
     return {"status": "API running"}
 
+@app.get("/health/live")
+def liveness():
+    """
+    The process is up and serving HTTP (nothing needs to be loaded).
+    """
+    return {"status": "alive", "pid": os.getpid()}
+
+@app.get("/health/ready")
+def readiness():
+    """
+    503 until the encoder and index are loaded and warmed up.
+    """
+    if not startup.ready:
+        raise HTTPException(status_code=503, detail=startup.stats(), headers={"Retry-After": "1"})
+    return {"status": "ready", **startup.stats()}
+
 # ===============================
-# CSV INGEST
+# CSV INGEST (BACKGROUND JOBS)
 # ===============================
+def publish_ingest(result):
+    """
+    Swaps in the index + metadata staged by a finished ingest job.
+    Searches keep serving the old snapshot until this returns.
+    """
+    snapshot = snapshot_store.publish(result["staged"])
+    if sharded(snapshot):
+        # Shards would otherwise build their partitions on the first search
+        sharded_searcher.load(snapshot.name)
+    # Result cache keys carry the snapshot version; drop the stale entries
+    search_result_cache.clear()
+    print(f"✅ Published snapshot {snapshot.name} ({snapshot.index.ntotal} vectors)")
+
+    if SUMMARY_PRECOMPUTE_TOP_N > 0:
+        threading.Thread(
+            target=precompute_summaries,
+            args=(snapshot, SUMMARY_PRECOMPUTE_TOP_N),
+            name="summary-precompute",
+            daemon=True
+        ).start()
+
+ingest_jobs = IngestJobManager(
+    INGEST_JOBS_DIR,
+    settings={
+        "model_name": MODEL_NAME,
+        "encoder_backend": ENCODER_BACKEND,
+        "encoder_onnx_file": ENCODER_ONNX_FILE,
+        "encoder_device": ENCODER_DEVICE,
+        "dim": EMBEDDING_DIM,
+        "snapshot_dir": SNAPSHOT_DIR,
+        "legacy_index_path": INDEX_PATH,
+        "legacy_metadata_path": METADATA_PATH,
+        "index_type": INDEX_TYPE,
+        "index_params": INDEX_PARAMS,
+        "chunk_rows": INGEST_CHUNK_ROWS,
+        "encode_workers": ENCODE_WORKERS,
+        "embedding_cache_dir": EMBEDDING_CACHE_DIR,
+        "embedding_cache_max_entries": EMBEDDING_CACHE_MAX_ENTRIES,
+    },
+    publish=publish_ingest
+)
+
 @app.post("/ingest-csv")
 def ingest_csv(file: UploadFile = File(...)):
+    """
+    Saves the upload and queues a background ingest job.
+    Poll /ingest/jobs/{job_id} for progress and the final counts.
+    """
+    job_id = ingest_jobs.new_job_id()
+    with open(ingest_jobs.upload_path(job_id), "wb") as f:
+        shutil.copyfileobj(file.file, f)
 
-    global index
-
-    df = pd.read_csv(file.file)
-    df.columns = df.columns.str.strip()
-
-    # Clean columns safely
-    df["transcript"] = df.get("transcript", "").fillna("").astype(str)
-    df["title"] = df.get("title", "").fillna("").astype(str)
-    df["channel_title"] = df.get("channel_title", "").fillna("").astype(str)
-    df["viewCount"] = pd.to_numeric(df.get("viewCount", 0), errors="coerce").fillna(0)
-    df["duration_seconds"] = pd.to_numeric(df.get("duration_seconds", 0), errors="coerce").fillna(0)
-
-    original_rows = len(df)
-
-    # Lenient filtering
-    df = df[
-        (df["transcript"].str.len() > 20) |
-        (df["title"].str.len() > 10)
-    ].reset_index(drop=True)
-
-    if df.empty:
-        return {
-            "error": "No valid rows found after filtering",
-            "original_rows": original_rows
-        }
-
-    # Create embeddings
-    texts = df["transcript"].tolist()
-    embeddings = model.encode(
-        texts,
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    ).astype("float32")
-
-    # 🔥 Rebuild FAISS index safely
-    idx = faiss.IndexFlatIP(EMBEDDING_DIM)
-    idx.add(embeddings)
-    faiss.write_index(idx, INDEX_PATH)
-
-    # Update global index
-    index = idx
-
-    # Store metadata
-    metadata = []
-    for _, row in df.iterrows():
-        metadata.append({
-            "video_id": str(row["id"]),
-            "title": row["title"],
-            "channel_title": row["channel_title"],
-            "view_count": int(row["viewCount"]),
-            "duration": str(row["duration_seconds"]),
-            "transcript": row["transcript"],
-        })
-
-    with open(METADATA_PATH, "wb") as f:
-        pickle.dump(metadata, f)
-
+    job = ingest_jobs.submit(job_id)
     return {
-        "message": "CSV ingested successfully",
-        "original_rows": original_rows,
-        "rows_after_filtering": len(df),
-        "vectors_stored": idx.ntotal
+        "message": "CSV ingest queued",
+        **job,
+        "status_url": f"/ingest/jobs/{job_id}"
     }
 
+@app.get("/ingest/jobs/{job_id}")
+def ingest_job_status(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
+
 # ===============================
 # SEARCH
 # ===============================
+def format_results(snapshot, ids, scores, top_k):
+    """
+    Maps one row of index.search output to metadata results, using the
+    metadata of the same snapshot that was searched.
+    """
+    results = []
+    for i, score in zip(ids[:top_k], scores[:top_k]):
+        row = snapshot.get_by_faiss_id(i) if i != -1 else None
+        if row is not None:
+            item = {k: v for k, v in row.items() if k not in INTERNAL_FIELDS}
+            item["similarity"] = round(float(score), 4)
+            results.append(item)
+    return results
+
+def encode_queries(queries):
+    """
+    Embeds queries, sending only those missing from the query cache to
+    the model (in one forward pass).
+    """
+    keys = [normalize_query(q) for q in queries]
+    cached = [query_embedding_cache.get(k) for k in keys]
+
+    missing = [i for i, emb in enumerate(cached) if emb is None]
+    if missing:
+        encoded = get_model().encode(
+            [keys[i] for i in missing],
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype("float32")
+        for i, emb in zip(missing, encoded):
+            query_embedding_cache.put(keys[i], emb)
+            cached[i] = emb
+
+    return np.stack(cached).astype("float32")
+
+def result_cache_key(snapshot, query, top_k, nprobe, ef_search, filters=None):
+    # A new snapshot gets a new version, so stale results are never hit
+    return (normalize_query(query), top_k, nprobe, ef_search, filters, snapshot.version)
+
+def run_search_batch(queries, top_k, key=None):
+    """
+    Encodes queries in one forward pass and runs one matrix search.
+    key = (snapshot, nprobe, ef_search, filters_key) shared by every query.
+    Filters become a FAISS ID selector, so only matching rows are scored;
+    on HNSW / IVF the search is widened for the filter's selectivity, or
+    the matching vectors are scored exactly when there are few of them.
+    With SEARCH_SHARDS the search is scattered over the shard processes.
+    """
+    snapshot, nprobe, ef_search, filters = key or (get_snapshot(), None, None, None)
+    idx = snapshot.index
+
+    query_embeddings = encode_queries(queries)
+
+    if sharded(snapshot):
+        return sharded_searcher.search(snapshot.name, query_embeddings, top_k, nprobe, ef_search, filters)
+
+    sel = None
+    if filters:
+        mask = snapshot.columns.mask(dict(filters))
+        exact, nprobe, ef_search = filtered_search_plan(idx, int(mask.sum()), nprobe, ef_search)
+        if exact and snapshot.vectors is not None:
+            return snapshot.vectors.search_subset(query_embeddings, snapshot.columns.faiss_ids[mask], top_k)
+        sel = snapshot.columns.selector(mask)
+
+    params = search_params(idx, nprobe=nprobe, ef_search=ef_search, sel=sel)
+
+    rerank = (
+        RERANK_FACTOR > 1
+        and snapshot.vectors is not None
+        and snapshot.config.get("index_type") in LOSSY_TYPES
+    )
+    if not rerank:
+        return idx.search(query_embeddings, top_k, params=params)
+
+    _, candidates = idx.search(query_embeddings, top_k * RERANK_FACTOR, params=params)
+    return snapshot.vectors.rerank(query_embeddings, candidates, top_k)
+
+search_batcher = SearchBatcher(
+    run_search_batch,
+    max_batch_size=SEARCH_BATCH_MAX_SIZE,
+    max_wait_ms=SEARCH_BATCH_WAIT_MS
+)
+
+def search_filters(data):
+    """
+    The request's filters as a plain dict without unset fields.
+    """
+    if data.filters is None:
+        return None
+    return data.filters.model_dump(exclude_none=True) or None
+
+def dense_search(snapshot, data, top_k):
+    """
+    Dense FAISS search for one query: result cache, then the batcher
+    (or a direct search). Returns (distances, indices) for one query.
+    """
+    filters = filters_key(search_filters(data))
+    key = (snapshot, data.nprobe, data.ef_search, filters)
+    cache_key = result_cache_key(snapshot, data.query, top_k, data.nprobe, data.ef_search, filters)
+    cached = search_result_cache.get(cache_key)
+
+    if cached is not None:
+        return cached
+
+    if SEARCH_BATCHING:
+        # Coalesced with other in-flight queries by the batcher thread
+        distances, indices = search_batcher.submit(data.query, top_k, key).result()
+    else:
+        distances, indices = run_search_batch([data.query], top_k, key)
+        distances, indices = distances[0], indices[0]
+    search_result_cache.put(cache_key, (distances, indices))
+    return distances, indices
+
 @app.post("/search")
 def search_videos(data: SearchRequest):
 
-    if not os.path.exists(METADATA_PATH):
+    snapshot = get_snapshot()
+    if snapshot.rows is None:
         return {"error": "No metadata found"}
 
-    with open(METADATA_PATH, "rb") as f:
-        metadata = pickle.load(f)
+    if data.mode == "lexical":
+        mask = snapshot.columns.mask(search_filters(data))
+        scores, indices = snapshot.lexical.search(data.query, data.top_k, mask)
+    elif data.mode == "hybrid":
+        # Fuse dense and BM25 rankings by rank, not by their incomparable scores
+        candidates = max(data.top_k, HYBRID_CANDIDATES)
+        mask = snapshot.columns.mask(search_filters(data))
+        _, dense_ids = dense_search(snapshot, data, candidates)
+        _, lexical_ids = snapshot.lexical.search(data.query, candidates, mask)
+        indices, scores = reciprocal_rank_fusion([dense_ids, lexical_ids], k=RRF_K)
+    else:
+        scores, indices = dense_search(snapshot, data, data.top_k)
 
-    idx = get_faiss_index()
+    return {
+        "query": data.query,
+        "mode": data.mode,
+        "results": format_results(snapshot, indices, scores, data.top_k)
+    }
 
-    query_embedding = model.encode(
-        [data.query],
-        convert_to_numpy=True,
-        normalize_embeddings=True
-    ).astype("float32")
+# ===============================
+# BATCH SEARCH
+# ===============================
+@app.post("/search/batch")
+def search_videos_batch(data: BatchSearchRequest):
+    """
+    Encodes all queries in one forward pass and runs a single matrix
+    index.search at the largest top_k; each query's results are then cut
+    to its own top_k. Results are returned in input order.
+    """
+    snapshot = get_snapshot()
+    if snapshot.rows is None:
+        return {"error": "No metadata found"}
 
-    distances, indices = idx.search(query_embedding, data.top_k)
+    if not data.queries:
+        return {"results": []}
 
-    results = []
-    for i, score in zip(indices[0], distances[0]):
-        if i < len(metadata):
-            item = metadata[i].copy()
-            item["similarity"] = round(float(score), 4)
-            results.append(item)
+    max_k = max(q.top_k for q in data.queries)
+    distances, indices = run_search_batch(
+        [q.query for q in data.queries],
+        max_k,
+        (snapshot, data.nprobe, data.ef_search, None)
+    )
 
     return {
-        "query": data.query,
-        "results": results
+        "results": [
+            {
+                "query": q.query,
+                "results": format_results(snapshot, indices[row], distances[row], q.top_k)
+            }
+            for row, q in enumerate(data.queries)
+        ]
+    }
+
+# ===============================
+# STATS
+# ===============================
+@app.get("/stats")
+def service_stats():
+    snapshot = get_snapshot()
+    return {
+        "startup": startup.stats(),
+        # Per worker: each API process answers with its own pid and memory
+        "process": memory_usage(),
+        "search_batcher": search_batcher.stats(),
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "search_result_cache": search_result_cache.stats(),
+        "summary_store": summary_store.stats(),
+        "summaries_in_flight": summary_flight.inflight(),
+        "ollama": ollama_pool.stats(),
+        "summarizer_calls": summarizer.calls,
+        "summarizer_cache_hits": summarizer.cache_hits,
+        "snapshot": snapshot.name,
+        "metadata": snapshot.rows.stats() if snapshot.rows is not None else None,
+        "lexical_index": snapshot.lexical.stats() if snapshot.lexical else None,
+        "vector_store": snapshot.vectors.stats() if snapshot.vectors else None,
+        "shards": sharded_searcher.stats() if sharded_searcher is not None else None,
+        "snapshot_manifest": snapshot.manifest,
     }
 
 # ===============================
 # SUMMARIZE (OLLAMA)
 # ===============================
+ollama_pool = OllamaPool(
+    OLLAMA_URL,
+    OLLAMA_MODEL,
+    max_concurrency=OLLAMA_MAX_CONCURRENCY,
+    max_queue=OLLAMA_MAX_QUEUE,
+    queue_timeout=OLLAMA_QUEUE_TIMEOUT,
+    timeout=120,
+    num_ctx=SUMMARY_CONTEXT_TOKENS
+)
+
+def ollama_call(prompt):
+    return ollama_pool.generate_sync(prompt)
+
+def overloaded(e):
+    return HTTPException(
+        status_code=e.status_code,
+        detail=str(e),
+        headers={"Retry-After": str(int(e.retry_after))}
+    )
+
+summary_store = SummaryStore(SUMMARY_DB_PATH)
+summary_flight = SingleFlight()
+# Chunk and partial summaries go to the summary store's parts table
+summarizer = MapReduceSummarizer(
+    ollama_call,
+    cache=summary_store,
+    model=OLLAMA_MODEL,
+    prompt_version=SUMMARY_PROMPT_VERSION,
+    # Clamped: a map fan-out wider than the pool gets 429/503 partway through
+    max_workers=min(SUMMARY_MAP_WORKERS, OLLAMA_MAX_CONCURRENCY),
+    chunk_tokens=SUMMARY_CHUNK_TOKENS,
+    single_prompt_tokens=single_prompt_budget(SUMMARY_CONTEXT_TOKENS)
+)
+
+def summary_key(video):
+    return (
+        str(video["video_id"]),
+        transcript_hash(video["transcript"]),
+        OLLAMA_MODEL,
+        SUMMARY_PROMPT_VERSION,
+    )
+
+def generate_summary(video):
+    """
+    Summarizes one video's transcript: a single llama3 prompt when it
+    fits, otherwise map-reduce over chunks.
+    """
+    return ollama_call(summarizer.final_prompt(video["transcript"]))
+
+def get_summary(video):
+    """
+    Returns (summary, cached). Identical concurrent requests share one
+    generation; results are persisted for later requests and workers.
+    """
+    key = summary_key(video)
+    summary = summary_store.get(key)
+    if summary is not None:
+        return summary, True
+
+    def generate():
+        # Another worker may have finished it while we waited
+        existing = summary_store.get(key, count=False)
+        if existing is not None:
+            return existing
+        summary = generate_summary(video)
+        summary_store.put(key, summary)
+        return summary
+
+    return summary_flight.do(key, generate), False
+
+precompute_lock = threading.Lock()
+
+def precompute_summaries(snapshot, top_n):
+    """
+    Background job: summarizes the most-viewed videos that have no cached
+    summary yet, one at a time so interactive requests still get through.
+    """
+    if not precompute_lock.acquire(blocking=False):
+        return
+    try:
+        # Ranked on the view_count column; only the chosen rows get decoded
+        videos = []
+        for position in np.argsort(-snapshot.columns.view_count, kind="stable"):
+            if len(videos) == top_n:
+                break
+            row = snapshot.rows[int(position)]
+            if row.get("transcript"):
+                videos.append(row)
+
+        done = 0
+        for video in videos:
+            if summary_store.get(summary_key(video), count=False) is not None:
+                continue
+            try:
+                get_summary(video)
+                done += 1
+            except Exception as e:
+                print(f"❌ Precompute failed for {video['video_id']}: {e}")
+        print(f"🧠 Precomputed {done} summaries (top {top_n} by views)")
+    finally:
+        precompute_lock.release()
+
 @app.post("/summarize")
 def summarize_video(video_id: str):
 
-    if not os.path.exists(METADATA_PATH):
+    snapshot = get_snapshot()
+    if snapshot.rows is None:
         return {"error": "No metadata found"}
 
-    with open(METADATA_PATH, "rb") as f:
-        metadata = pickle.load(f)
-
-    video = next((v for v in metadata if v["video_id"] == video_id), None)
+    video = snapshot.get(video_id)
 
     if not video or not video["transcript"]:
         return {"error": "Video not found or transcript empty"}
 
-    prompt = f"""
-Summarize the following video transcript in 5–6 concise bullet points.
-
-Transcript:
-{video['transcript']}
-"""
-
-    response = requests.post(
-        OLLAMA_URL,
-        json={
-            "model": OLLAMA_MODEL,
-            "prompt": prompt,
-            "stream": False
-        },
-        timeout=120
-    )
-
-    if response.status_code != 200:
-        return {"error": "Failed to generate summary from Ollama"}
-
-    summary = response.json().get("response", "").strip()
+    try:
+        summary, cached = get_summary(video)
+    except OllamaOverloaded as e:
+        raise overloaded(e)
+    except OllamaError as e:
+        return {"error": str(e)}
 
     return {
         "video_id": video_id,
         "title": video["title"],
-        "summary": summary
+        "summary": summary,
+        "cached": cached
     }
+
+# ===============================
+# SUMMARIZE (STREAMING, SSE)
+# ===============================
+def sse(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+async def stream_summary(request, video):
+    """
+    Forwards Ollama's streamed tokens as Server-Sent Events.
+    Leaving the generator (client gone or cancelled) closes the upstream
+    stream, which makes Ollama stop generating.
+    A complete summary is saved to the summary store.
+    """
+    video_id = video["video_id"]
+    started = time.perf_counter()
+    try:
+        # Map and intermediate reduce steps run first; only the last one streams
+        prompt = await asyncio.to_thread(summarizer.final_prompt, video["transcript"])
+    except OllamaOverloaded as e:
+        yield sse({"error": str(e), "status": e.status_code}, event="error")
+        return
+    except OllamaError as e:
+        yield sse({"error": str(e)}, event="error")
+        return
+    prepared = time.perf_counter()
+    first_token_at = None
+    tokens = 0
+    parts = []
+    finished = False
+
+    try:
+        # aclosing: leaving early closes the upstream request right away
+        async with aclosing(ollama_pool.stream(prompt)) as chunks:
+            async for chunk in chunks:
+                if await request.is_disconnected():
+                    print(f"⛔ Client disconnected, cancelled summary for {video_id}")
+                    return
+
+                token = chunk.get("response", "")
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    tokens += 1
+                    parts.append(token)
+                    yield sse({"token": token})
+
+                if chunk.get("done"):
+                    finished = True
+                    break
+
+    except OllamaOverloaded as e:
+        yield sse({"error": str(e), "status": e.status_code}, event="error")
+        return
+    except OllamaError as e:
+        yield sse({"error": str(e)}, event="error")
+        return
+
+    total = time.perf_counter() - started
+    ttft = (first_token_at - started) if first_token_at else None
+    generating = total - ttft if ttft is not None else 0
+    metrics = {
+        "video_id": video_id,
+        "prepare_ms": round((prepared - started) * 1000, 1),
+        "time_to_first_token_ms": round(ttft * 1000, 1) if ttft is not None else None,
+        "total_ms": round(total * 1000, 1),
+        "tokens": tokens,
+        "tokens_per_sec": round(tokens / generating, 2) if generating > 0 else None,
+        "cached": False,
+    }
+    print(f"📝 Streamed summary {metrics}")
+
+    if finished:
+        summary_store.put(summary_key(video), "".join(parts).strip())
+    yield sse(metrics, event="done")
+
+@app.get("/summarize/stream")
+async def summarize_video_stream(request: Request, video_id: str):
+    """
+    Streaming variant of /summarize. Emits one SSE message per token and a
+    final `done` event with time-to-first-token and tokens/sec.
+    """
+    snapshot = get_snapshot()
+    if snapshot.rows is None:
+        return {"error": "No metadata found"}
+
+    video = snapshot.get(video_id)
+
+    if not video or not video["transcript"]:
+        return {"error": "Video not found or transcript empty"}
+
+    cached = summary_store.get(summary_key(video))
+    if cached is not None:
+        async def replay():
+            yield sse({"token": cached})
+            yield sse({"video_id": video_id, "cached": True}, event="done")
+        return StreamingResponse(replay(), media_type="text/event-stream")
+
+    # Reject before opening the stream when the queue is already full
+    if ollama_pool.is_full():
+        raise HTTPException(
+            status_code=429,
+            detail="Summarizer is busy, too many requests queued",
+            headers={"Retry-After": str(int(OLLAMA_QUEUE_TIMEOUT))}
+        )
+
+    return StreamingResponse(
+        stream_summary(request, video),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+startup.record("app_import", time.perf_counter() - APP_IMPORT_STARTED)
+
+if STARTUP_MODE == "preload":
+    # Loaded once in the parent; forked workers share these pages
+    get_model()
+    load_index()
+    # Keep the garbage collector from touching (and so copying) them
+    gc.freeze()
@@ -0,0 +1,164 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Whisper models expect 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+
+# ===============================
+# DECODING
+# ===============================
+def load_pcm(audio_path, sampling_rate=SAMPLE_RATE):
+    """
+    Decodes a whole audio file once (container parsing, resampling and
+    downmixing in-process via PyAV) into a float32 mono numpy array.
+    """
+    from faster_whisper import decode_audio
+    return decode_audio(str(audio_path), sampling_rate=sampling_rate)
+
+
+# ===============================
+# CHUNK BOUNDARIES
+# ===============================
+def fixed_boundaries(n_samples, chunk_sec, sampling_rate=SAMPLE_RATE):
+    """
+    (start, end) sample offsets of consecutive chunk_sec windows.
+    """
+    step = max(1, int(chunk_sec * sampling_rate))
+    return [(start, min(start + step, n_samples)) for start in range(0, n_samples, step)]
+
+
+def silence_boundaries(audio, chunk_sec, search_sec=5.0, frame_ms=30, sampling_rate=SAMPLE_RATE):
+    """
+    Like fixed_boundaries, but each cut is moved to the quietest frame
+    within search_sec of its target, so chunks rarely split a word.
+    """
+    frame = int(sampling_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return fixed_boundaries(len(audio), chunk_sec, sampling_rate)
+
+    # Mean energy per frame over a reshaped view of the buffer
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy = np.einsum("ij,ij->i", frames, frames) / frame
+
+    step = int(chunk_sec * sampling_rate / frame)
+    radius = int(search_sec * sampling_rate / frame)
+    cuts = [0]
+    target = step
+    # Stop once the rest fits in the search window: no sliver of a last chunk
+    while target + radius < n_frames:
+        lo, hi = max(cuts[-1] + 1, target - radius), min(n_frames, target + radius + 1)
+        cut = lo + int(np.argmin(energy[lo:hi]))
+        cuts.append(cut)
+        target = cut + step
+
+    starts = [cut * frame for cut in cuts]
+    return list(zip(starts, starts[1:] + [len(audio)]))
+
+
+# ===============================
+# PARALLEL TRANSCRIPTION
+# ===============================
+def _transcribe_slice(model, audio, offset_sec, transcribe_kwargs):
+    segments, _ = model.transcribe(audio, **transcribe_kwargs)
+    # Segments are produced lazily: decode them in this worker thread
+    return [
+        {"start": offset_sec + s.start, "end": offset_sec + s.end, "text": s.text}
+        for s in segments
+    ]
+
+
+class ChunkTranscriber:
+    """
+    Transcribes one audio buffer as several chunks at once.
+
+    The audio is decoded once into a 16 kHz float32 array and cut into
+    numpy slices (views, no copies) at fixed or silence-aligned
+    boundaries. The slices are transcribed on `workers` threads, and
+    segment timestamps are shifted by each slice's offset and put back
+    in order.
+
+    Threads share one faster-whisper model: CTranslate2 releases the GIL
+    and runs up to the model's num_workers transcriptions in parallel,
+    so create it with WhisperModel(..., num_workers=workers,
+    cpu_threads=cores // workers).
+    """
+
+    def __init__(self, model, workers=2, chunk_sec=300, split="silence", search_sec=5.0,
+                 min_chunk_sec=30, **transcribe_kwargs):
+        if split not in ("fixed", "silence"):
+            raise ValueError(f"Unknown split '{split}', expected 'fixed' or 'silence'")
+        self.model = model
+        self.workers = max(1, workers)
+        self.chunk_sec = chunk_sec
+        self.split = split
+        self.search_sec = search_sec
+        self.min_chunk_sec = min_chunk_sec
+        self.transcribe_kwargs = transcribe_kwargs
+
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="whisper")
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.files = 0
+        self.chunks = 0
+        self.audio_sec = 0.0
+        self.decode_sec = 0.0
+        self.wall_sec = 0.0
+
+    def boundaries(self, audio):
+        duration = len(audio) / SAMPLE_RATE
+        # Short files still get one chunk per worker
+        chunk_sec = min(self.chunk_sec, max(self.min_chunk_sec, duration / self.workers))
+        if self.split == "fixed":
+            return fixed_boundaries(len(audio), chunk_sec)
+        return silence_boundaries(audio, chunk_sec, self.search_sec)
+
+    def transcribe(self, audio):
+        """
+        Returns (text, segments) for a 16 kHz float32 array; segments
+        are {"start", "end", "text"} dicts with times in seconds.
+        """
+        started = time.perf_counter()
+        bounds = self.boundaries(audio)
+        futures = [
+            self._pool.submit(
+                _transcribe_slice, self.model, audio[start:end], start / SAMPLE_RATE, self.transcribe_kwargs
+            )
+            for start, end in bounds
+        ]
+        segments = [segment for future in futures for segment in future.result()]
+
+        self.files += 1
+        self.chunks += len(bounds)
+        self.audio_sec += len(audio) / SAMPLE_RATE
+        self.wall_sec += time.perf_counter() - started
+        return " ".join(s["text"].strip() for s in segments).strip(), segments
+
+    def transcribe_file(self, audio_path):
+        started = time.perf_counter()
+        audio = load_pcm(audio_path)
+        decoded = time.perf_counter()
+        self.decode_sec += decoded - started
+        result = self.transcribe(audio)
+        # Count decoding as wall time too, it is part of the per-file cost
+        self.wall_sec += decoded - started
+        return result
+
+    def close(self):
+        self._pool.shutdown()
+
+    def stats(self):
+        return {
+            "files": self.files,
+            "chunks": self.chunks,
+            "workers": self.workers,
+            "audio_sec": round(self.audio_sec, 1),
+            "decode_sec": round(self.decode_sec, 3),
+            "wall_sec": round(self.wall_sec, 3),
+            # Audio seconds transcribed per wall-clock second
+            "realtime_factor": round(self.audio_sec / self.wall_sec, 2) if self.wall_sec else 0.0,
+        }
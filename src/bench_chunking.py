@@ -0,0 +1,87 @@
+"""
+Compare audio-seconds transcribed per wall-second for the old chunking
+path of fetch_transcripts_local.py (ffprobe, one `ffmpeg -c copy` temp
+mp3 per 5-minute chunk, chunks transcribed one after another) and the
+in-memory path (decode once to 16 kHz PCM, slice without copying,
+transcribe the slices in parallel).
+
+Needs faster-whisper, and ffmpeg / ffprobe on PATH for the old path.
+
+Run from the repo root:
+    python -m src.bench_chunking audio_downloads/abc.mp3 --workers 1 2 4
+"""
+import os
+import math
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from faster_whisper import WhisperModel
+
+from src.audio_chunks import ChunkTranscriber
+
+
+def ffmpeg_chunks(model, audio_path, chunk_length_sec=300):
+    """
+    The previous transcribe_audio_chunks_ffmpeg, kept as the baseline.
+    Returns (text, audio_sec).
+    """
+    result = subprocess.run(
+        ['ffprobe', '-i', str(audio_path), '-show_entries', 'format=duration',
+         '-v', 'quiet', '-of', 'csv=p=0'],
+        capture_output=True, text=True
+    )
+    duration_sec = float(result.stdout.strip())
+    texts = []
+
+    for i in range(math.ceil(duration_sec / chunk_length_sec)):
+        start = i * chunk_length_sec
+        end = min((i + 1) * chunk_length_sec, duration_sec)
+        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmpfile:
+            chunk_path = Path(tmpfile.name)
+        subprocess.run(
+            ["ffmpeg", "-y", "-i", str(audio_path), "-ss", str(start), "-to", str(end), "-c", "copy", str(chunk_path)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        segments, _ = model.transcribe(str(chunk_path))
+        texts.append(" ".join(s.text for s in segments))
+        chunk_path.unlink()
+
+    return " ".join(texts).strip(), duration_sec
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("audio", nargs="+", help="audio files to transcribe")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunk-sec", type=float, default=300)
+    parser.add_argument("--split", choices=["fixed", "silence"], default="silence")
+    parser.add_argument("--skip-ffmpeg", action="store_true")
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+
+    if not args.skip_ffmpeg:
+        model = WhisperModel(args.model, device="cpu")
+        started = time.perf_counter()
+        audio_sec = sum(ffmpeg_chunks(model, path)[1] for path in args.audio)
+        wall = time.perf_counter() - started
+        print(f"ffmpeg chunks     | {audio_sec:8.1f}s audio | {wall:8.1f}s wall | {audio_sec / wall:6.2f} audio-sec/wall-sec")
+
+    for workers in args.workers:
+        model = WhisperModel(args.model, device="cpu", cpu_threads=max(1, cores // workers), num_workers=workers)
+        transcriber = ChunkTranscriber(model, workers=workers, chunk_sec=args.chunk_sec, split=args.split)
+        for path in args.audio:
+            transcriber.transcribe_file(path)
+        transcriber.close()
+        stats = transcriber.stats()
+        print(
+            f"in-memory x{workers:<7} | {stats['audio_sec']:8.1f}s audio | {stats['wall_sec']:8.1f}s wall | "
+            f"{stats['realtime_factor']:6.2f} audio-sec/wall-sec | {stats['chunks']} chunks, {stats['decode_sec']}s decoding"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark encoder backends against the eager PyTorch reference:
+sentences/sec for bulk encoding, single-query latency, and cosine
+similarity to the torch embeddings (compatibility with existing indexes).
+With --workers N each backend is also run through the length-bucketed
+multi-process BulkEncoder used by ingestion.
+
+Run from the repo root:
+    python -m src.bench_encoders --backends torch torch_int8 onnx onnx_int8
+    python -m src.bench_encoders --backends torch onnx --workers 4
+"""
+import time
+import argparse
+from functools import partial
+
+import numpy as np
+
+from src.bulk_encoder import BulkEncoder
+from src.encoders import COMPATIBILITY_MIN_COSINE, ENCODER_BACKENDS, compare_embeddings, load_encoder
+from src.snapshot_store import SnapshotStore
+from src.bench_search import QUERIES
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def corpus_texts(limit):
+    rows = SnapshotStore(
+        "snapshots", 384,
+        legacy_index_path="vector.index",
+        legacy_metadata_path="metadata.pkl"
+    ).current().rows or []
+    texts = [row["transcript"] for row in rows if row.get("transcript")][:limit]
+    # Fall back to short sentences when nothing has been ingested
+    return texts or [f"{q} part {i}" for i in range(limit // len(QUERIES)) for q in QUERIES]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=list(ENCODER_BACKENDS))
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-runs", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    texts = corpus_texts(args.texts)
+    print(f"{len(texts)} texts | batch_size={args.batch_size}")
+
+    reference = None
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        try:
+            model = load_encoder(MODEL_NAME, backend)
+        except Exception as e:
+            print(f"{backend:<10} | unavailable: {e}")
+            continue
+
+        # Warm-up (graph optimization, thread pools)
+        model.encode(texts[:args.batch_size], normalize_embeddings=True)
+
+        start = time.perf_counter()
+        embeddings = model.encode(texts, batch_size=args.batch_size, normalize_embeddings=True)
+        rate = len(texts) / (time.perf_counter() - start)
+
+        latencies = []
+        for i in range(args.latency_runs):
+            start = time.perf_counter()
+            model.encode([QUERIES[i % len(QUERIES)]], normalize_embeddings=True)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        if reference is None:
+            reference = embeddings
+        min_cos, mean_cos = compare_embeddings(reference, embeddings)
+        verdict = "✅" if min_cos >= COMPATIBILITY_MIN_COSINE else "❌ not compatible"
+
+        print(
+            f"{backend:<10} | {rate:8.1f} sentences/s | query p50 {np.percentile(latencies, 50):6.2f} ms "
+            f"p99 {np.percentile(latencies, 99):6.2f} ms | cosine vs torch min {min_cos:.4f} "
+            f"mean {mean_cos:.4f} {verdict}"
+        )
+
+        if args.workers:
+            bulk = BulkEncoder(partial(load_encoder, MODEL_NAME, backend), workers=args.workers)
+            bulk.encode(texts[:args.workers * args.batch_size])
+            bulk.reset_stats()
+            bulk_embeddings = bulk.encode(texts)
+            stats = bulk.stats()
+            bulk.close()
+            # Same backend, so any mismatch means rows came back out of order
+            min_cos, _ = compare_embeddings(embeddings, bulk_embeddings)
+            print(
+                f"{'':<10} | bulk x{args.workers}: {stats['rows_per_sec']:8.1f} rows/s | "
+                f"{stats['batches']} batches | padding overhead {stats['padding_overhead']:.1%} | "
+                f"cosine vs unbatched min {min_cos:.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
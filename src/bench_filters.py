@@ -0,0 +1,130 @@
+"""
+Benchmark filtered search per index type: the bare FAISS ID selector,
+the planned search /search runs (selector with nprobe / efSearch widened
+for the filter's selectivity, or exact scoring of the matching vectors)
+and post-filtering an over-fetched top-k.
+
+Each index type is built from the snapshot's vectors. For each filter,
+recall@k is measured against exact brute-force search over only the
+matching rows, and latency is the mean per query.
+
+Run from the repo root after an ingest:
+    python -m src.bench_filters --top-k 10 --overfetch 10 --index-types flat hnsw ivf_flat ivf_pq
+"""
+import time
+import argparse
+
+import numpy as np
+
+from src import api
+from src.bench_search import QUERIES
+from src.index_factory import INDEX_TYPES, build_index, extract_vectors, filtered_search_plan, search_params
+from src.vector_store import VectorStore
+
+
+def derive_filters(columns):
+    """
+    Filters of decreasing selectivity taken from the data itself.
+    """
+    codes, counts = np.unique(columns.channel_codes, return_counts=True)
+    top_channel = columns.channel_names[codes[np.argmax(counts)]]
+    views = columns.view_count
+    return {
+        "views >= p50": {"min_views": int(np.percentile(views, 50))},
+        "views >= p90": {"min_views": int(np.percentile(views, 90))},
+        "views >= p99": {"min_views": int(np.percentile(views, 99))},
+        "top channel": {"channels": [top_channel]},
+        "short videos": {"max_duration": float(np.percentile(columns.duration, 10))},
+    }
+
+
+def recall(found, truth):
+    truth = set(int(i) for i in truth if i != -1)
+    if not truth:
+        return 1.0
+    return len(truth & set(int(i) for i in found if i != -1)) / len(truth)
+
+
+def planned_search(index, vectors, columns, mask, queries, k):
+    """
+    The filtered search run_search_batch does. Returns ((scores, ids), how).
+    """
+    exact, nprobe, ef_search = filtered_search_plan(index, int(mask.sum()))
+    if exact:
+        return vectors.search_subset(queries, columns.faiss_ids[mask], k), "exact"
+    params = search_params(index, nprobe=nprobe, ef_search=ef_search, sel=columns.selector(mask))
+    how = f"nprobe={nprobe}" if nprobe else f"efSearch={ef_search}" if ef_search else "selector"
+    return index.search(queries, k, params=params), how
+
+
+def timed(fn, repeat, n_queries):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) * 1000 / (repeat * n_queries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--index-types", nargs="+", choices=INDEX_TYPES, default=["flat", "hnsw", "ivf_flat", "ivf_pq"])
+    args = parser.parse_args()
+
+    snapshot = api.get_snapshot()
+    if snapshot.rows is None:
+        print("❌ No metadata found — run /ingest-csv first")
+        return
+
+    columns = snapshot.columns
+    k = args.top_k
+    queries = api.encode_queries(QUERIES)
+
+    if snapshot.vectors is not None:
+        ids, vectors = snapshot.vectors.all()
+    else:
+        ids, vectors = extract_vectors(snapshot.index)
+    store = VectorStore(np.asarray(ids), np.ascontiguousarray(vectors, dtype="float32"))
+    filters = derive_filters(columns)
+
+    for index_type in args.index_types:
+        idx, config = build_index(index_type, vectors.shape[1], vectors, ids, **api.INDEX_PARAMS)
+        print(f"\nIndex: {config['index_type']} (requested {index_type}) | {idx.ntotal} vectors | top_k={k}")
+
+        for label, flt in filters.items():
+            mask = columns.mask(flt)
+            by_id = columns.id_mask(mask)
+            matching = int(mask.sum())
+            # Ground truth: exact inner product over matching rows only
+            _, truth = store.search_subset(queries, columns.faiss_ids[mask], k)
+
+            (_, bare), bare_ms = timed(
+                lambda: idx.search(queries, k, params=search_params(idx, sel=columns.selector(mask))),
+                args.repeat, len(queries)
+            )
+            ((_, planned), how), planned_ms = timed(
+                lambda: planned_search(idx, store, columns, mask, queries, k), args.repeat, len(queries)
+            )
+
+            def post_filter():
+                _, over = idx.search(queries, k * args.overfetch)
+                return [
+                    [i for i in row if i != -1 and i < len(by_id) and by_id[i]][:k]
+                    for row in over
+                ]
+            post, post_ms = timed(post_filter, args.repeat, len(queries))
+
+            def mean_recall(found):
+                return np.mean([recall(f, t) for f, t in zip(found, truth)])
+
+            print(
+                f"{label:<14} | matches {matching:>6} ({matching / max(len(mask), 1):6.1%}) | "
+                f"selector {bare_ms:6.3f} ms recall {mean_recall(bare):.3f} | "
+                f"planned ({how}) {planned_ms:6.3f} ms recall {mean_recall(planned):.3f} | "
+                f"post-filter x{args.overfetch} {post_ms:6.3f} ms recall {mean_recall(post):.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
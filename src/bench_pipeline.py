@@ -0,0 +1,181 @@
+"""
+Benchmark the download -> transcribe pipeline against the sequential
+"download everything, then transcribe one by one" flow of check_ids.py.
+
+Runs offline: a fake downloader copies local audio fixtures (generated
+WAV tones unless --fixtures is given) after a simulated network delay.
+Transcription is either a fake CPU-bound model that burns
+--fake-rtf seconds of CPU per audio second, or real Whisper with
+--model (needs openai-whisper and ffmpeg).
+
+Run from the repo root:
+    python -m src.bench_pipeline --videos 16 --latency 1.0 --workers 2
+    python -m src.bench_pipeline --fixtures audio_downloads --model tiny
+"""
+import os
+import math
+import time
+import wave
+import shutil
+import struct
+import argparse
+import tempfile
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from src.transcribe_pipeline import TranscriptionPipeline
+
+SAMPLE_RATE = 16000
+
+
+# ===============================
+# FIXTURES
+# ===============================
+def write_tone(path, seconds, freq=440.0):
+    frames = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * freq * i / SAMPLE_RATE)))
+        for i in range(int(seconds * SAMPLE_RATE))
+    )
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(frames)
+
+
+def audio_seconds(path):
+    with wave.open(str(path), "rb") as f:
+        return f.getnframes() / f.getframerate()
+
+
+class FixtureDownloader:
+    """
+    Stands in for yt-dlp: sleeps `latency` seconds, then copies a fixture
+    file to out_dir/<video_id><ext>. Video ids named in `fail` return None.
+    """
+
+    def __init__(self, fixtures, out_dir, latency, fail=()):
+        self.fixtures = fixtures
+        self.out_dir = Path(out_dir)
+        self.latency = latency
+        self.fail = set(fail)
+
+    def __call__(self, video_id):
+        time.sleep(self.latency)
+        if video_id in self.fail:
+            return None
+        source = self.fixtures[int(video_id.split("-")[-1]) % len(self.fixtures)]
+        out = self.out_dir / f"{video_id}{source.suffix}"
+        shutil.copyfile(source, out)
+        return str(out)
+
+
+# ===============================
+# MODELS
+# ===============================
+def load_fake_model(rtf):
+    return {"rtf": rtf}
+
+
+def fake_transcribe(model, audio_path):
+    # Busy-loop, not sleep: real inference competes for the CPU
+    deadline = time.perf_counter() + audio_seconds(audio_path) * model["rtf"]
+    while time.perf_counter() < deadline:
+        pass
+    return f"transcript of {Path(audio_path).stem}"
+
+
+def load_whisper(model_name):
+    import whisper
+    return whisper.load_model(model_name)
+
+
+def whisper_transcribe(model, audio_path):
+    return model.transcribe(audio_path)["text"]
+
+
+# ===============================
+# RUNS
+# ===============================
+def run_sequential(download, load_model, transcribe, video_ids):
+    """
+    check_ids.py's order: all downloads (5 threads in check_ids), then
+    one transcription at a time.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        paths = list(pool.map(download, video_ids))
+    downloaded = time.perf_counter() - started
+
+    model = load_model()
+    for path in paths:
+        if path is not None:
+            transcribe(model, path)
+    return {"wall_sec": round(time.perf_counter() - started, 3), "download_sec": round(downloaded, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=16)
+    parser.add_argument("--fixtures", help="directory of audio files (default: generated WAV tones)")
+    parser.add_argument("--audio-sec", type=float, default=2.0, help="length of generated fixtures")
+    parser.add_argument("--latency", type=float, default=1.0, help="simulated download time per video")
+    parser.add_argument("--download-threads", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue-size", type=int, default=4)
+    parser.add_argument("--fake-rtf", type=float, default=0.25, help="CPU seconds per audio second")
+    parser.add_argument("--model", help="real Whisper model name, e.g. tiny")
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench-pipeline-"))
+    try:
+        if args.fixtures:
+            fixtures = sorted(p for p in Path(args.fixtures).iterdir() if p.is_file())
+        else:
+            fixtures = [work_dir / f"tone{i}.wav" for i in range(4)]
+            for i, path in enumerate(fixtures):
+                write_tone(path, args.audio_sec * (i + 1) / 2, freq=220.0 * (i + 1))
+
+        if args.model:
+            load_model, transcribe = partial(load_whisper, args.model), whisper_transcribe
+        else:
+            load_model, transcribe = partial(load_fake_model, args.fake_rtf), fake_transcribe
+
+        video_ids = [f"video-{i}" for i in range(args.videos)]
+
+        if not args.skip_sequential:
+            out_dir = work_dir / "sequential"
+            out_dir.mkdir()
+            download = FixtureDownloader(fixtures, out_dir, args.latency)
+            numbers = run_sequential(download, load_model, transcribe, video_ids)
+            print(f"⏱ sequential: {numbers['wall_sec']:.2f}s wall ({numbers['download_sec']:.2f}s downloading first)")
+
+        out_dir = work_dir / "pipeline"
+        out_dir.mkdir()
+        pipeline = TranscriptionPipeline(
+            FixtureDownloader(fixtures, out_dir, args.latency),
+            load_model,
+            transcribe,
+            download_threads=args.download_threads,
+            transcribe_workers=args.workers,
+            queue_size=args.queue_size,
+            keep_audio=False
+        )
+        try:
+            results = pipeline.run(video_ids)
+        finally:
+            pipeline.close()
+
+        stats = pipeline.stats()
+        print(f"⏱ pipeline:   {stats['wall_sec']:.2f}s wall for {len(results)} videos")
+        print(f"   download:   {stats['download']}")
+        print(f"   transcribe: {stats['transcribe']}")
+        print(f"   queue:      {stats['queue']}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
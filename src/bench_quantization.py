@@ -0,0 +1,104 @@
+"""
+Compare index types by memory per vector, latency and recall@k against
+the exact flat baseline, with and without exact re-ranking from the
+float32 vector store.
+
+Uses the live snapshot's vectors, or --synthetic N clustered random
+vectors to see behaviour at a larger scale.
+
+Run from the repo root:
+    python -m src.bench_quantization --top-k 10 --rerank-factor 4
+    python -m src.bench_quantization --synthetic 200000
+"""
+import time
+import argparse
+
+import numpy as np
+import faiss
+
+from src.index_factory import INDEX_TYPES, LOSSY_TYPES, build_index, extract_vectors
+from src.vector_store import VectorStore
+
+DIM = 384
+
+
+def snapshot_vectors():
+    from src import api
+
+    snapshot = api.get_snapshot()
+    if snapshot.vectors is not None:
+        return snapshot.vectors.all()
+    return extract_vectors(snapshot.index)
+
+
+def synthetic_vectors(n, dim, clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return np.arange(n, dtype="int64"), vectors
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f[f != -1]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    ids, vectors = synthetic_vectors(args.synthetic, DIM) if args.synthetic else snapshot_vectors()
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    if len(ids) == 0:
+        print("❌ No vectors — run /ingest-csv first or pass --synthetic N")
+        return
+
+    # Queries: perturbed corpus vectors, so each has close neighbours
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype("float32")
+    faiss.normalize_L2(queries)
+
+    k = args.top_k
+    flat, _ = build_index("flat", DIM, vectors, ids)
+    _, truth = flat.search(queries, k)
+
+    store = VectorStore(ids, vectors)
+    print(
+        f"{len(ids)} vectors | top_k={k} | rerank x{args.rerank_factor} | "
+        f"float32 store on disk: {vectors.nbytes / len(ids):.0f} B/vector (mmapped, not resident)"
+    )
+
+    for index_type in INDEX_TYPES:
+        index, config = build_index(index_type, DIM, vectors, ids)
+        if config["index_type"] != index_type:
+            print(f"{index_type:<9} | skipped: too few vectors to train")
+            continue
+
+        bytes_per_vector = len(faiss.serialize_index(index)) / len(ids)
+
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        search_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        line = (
+            f"{index_type:<9} | {bytes_per_vector:7.1f} B/vector | "
+            f"{search_ms:7.3f} ms/query | recall@{k} {recall_at_k(found, truth):.3f}"
+        )
+
+        if index_type in LOSSY_TYPES:
+            start = time.perf_counter()
+            _, candidates = index.search(queries, k * args.rerank_factor)
+            _, reranked = store.rerank(queries, candidates, k)
+            rerank_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            line += f" | re-ranked {rerank_ms:7.3f} ms/query recall@{k} {recall_at_k(reranked, truth):.3f}"
+
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
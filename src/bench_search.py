@@ -0,0 +1,95 @@
+"""
+Benchmark /search latency and throughput with micro-batching on and off.
+
+Calls the API handler in-process from a thread pool (the same way
+FastAPI's threadpool runs sync endpoints), so the numbers isolate
+encoder + FAISS cost from HTTP overhead. Every request gets its own
+query text and both caches are cleared before each mode, so no timed
+request is answered from the result or query-embedding cache.
+
+Run from the repo root after an ingest:
+    python -m src.bench_search --clients 16 --requests 800
+"""
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src import api
+
+QUERIES = [
+    "python tutorial for beginners",
+    "machine learning roadmap",
+    "how to build a neural network",
+    "data structures explained",
+    "web development with django",
+    "javascript async await",
+    "sorting algorithms",
+    "docker and kubernetes basics",
+]
+
+
+def bench_query(i):
+    # Distinct per request: a repeated query would be a cache hit
+    return f"{QUERIES[i % len(QUERIES)]} {i}"
+
+
+def clear_caches():
+    api.search_result_cache.clear()
+    api.query_embedding_cache.clear()
+
+
+def run(clients, requests_total, top_k):
+    latencies = []
+
+    def one_call(i):
+        start = time.perf_counter()
+        api.search_videos(api.SearchRequest(query=bench_query(i), top_k=top_k))
+        latencies.append(time.perf_counter() - start)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one_call, range(requests_total)))
+    wall = time.perf_counter() - wall_start
+
+    ms = np.array(latencies) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(statistics.mean(ms)), 2),
+        "qps": round(requests_total / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=800)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if api.get_snapshot().rows is None:
+        print("❌ No metadata found — run /ingest-csv first")
+        return
+
+    # Warm-up so neither mode pays first-call costs
+    api.run_search_batch(QUERIES, args.top_k)
+
+    for batching in (False, True):
+        api.SEARCH_BATCHING = batching
+        clear_caches()
+        batches_before = api.search_batcher.stats()["batches"]
+        result = run(args.clients, args.requests, args.top_k)
+        label = "ON " if batching else "OFF"
+        print(f"Batching {label} | clients={args.clients} | {result}")
+
+        if batching and api.search_batcher.stats()["batches"] == batches_before:
+            raise SystemExit("❌ Batching ON ran no batches: requests never reached the batcher")
+
+    print(f"Batcher stats: {api.search_batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
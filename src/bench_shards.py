@@ -0,0 +1,146 @@
+"""
+Benchmark scatter-gather search throughput for several shard counts.
+
+Writes a synthetic snapshot (random unit vectors, video ids v00000000...)
+to a temp directory, then for each shard count starts the shard
+processes, runs concurrent clients against ShardedSearcher and reports
+QPS, latency percentiles, recall@k against an exact search and each
+shard's own search time. "in-process" is the unsharded baseline: one
+index searched from the calling process.
+
+Run from the repo root:
+    python -m src.bench_shards --rows 200000 --shards 1 2 4 8
+"""
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import faiss
+
+from src.index_factory import LOSSY_TYPES, VECTOR_STORE_TYPES, build_index, search_params
+from src.snapshot_store import SnapshotStore, write_snapshot
+from src.shards import ShardedSearcher
+from src.vector_store import VectorStore
+
+DIM = 384
+
+
+def unit_vectors(n, seed):
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM), dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def write_corpus(root, rows_total, index_type):
+    vectors = unit_vectors(rows_total, seed=0)
+    ids = np.arange(rows_total, dtype="int64")
+    rows = [{"video_id": f"v{i:08d}", "faiss_id": i, "title": f"video {i}"} for i in range(rows_total)]
+    index, config = build_index(index_type, DIM, vectors, ids)
+    store = VectorStore(ids, vectors) if index_type in VECTOR_STORE_TYPES else None
+
+    snapshots = SnapshotStore(root, DIM)
+    staging = snapshots.staging_dir("bench")
+    write_snapshot(staging, index, rows, config, "synthetic", DIM, vector_store=store)
+    return snapshots.publish(staging), vectors
+
+
+def recall(ids, truth):
+    hits = sum(len(set(row[row != -1]) & set(expected)) for row, expected in zip(ids, truth))
+    return hits / truth.size
+
+
+def run(search, queries, clients, batch, k):
+    batches = [queries[i:i + batch] for i in range(0, len(queries), batch)]
+    latencies = []
+
+    def one_call(chunk):
+        started = time.perf_counter()
+        _, ids = search(chunk, k)
+        latencies.append(time.perf_counter() - started)
+        return ids
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        ids = np.concatenate(list(pool.map(one_call, batches)))
+    wall = time.perf_counter() - wall_start
+
+    ms = np.array(latencies) * 1000.0
+    return ids, {
+        "qps": round(len(queries) / wall, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+def report(label, numbers, ids, truth):
+    print(
+        f"{label:<12} | {numbers['qps']:>9.1f} q/s | p50 {numbers['p50_ms']:>8.2f} ms | "
+        f"p99 {numbers['p99_ms']:>8.2f} ms | recall {recall(ids, truth):.4f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--index-type", default="flat")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1, help="queries per search call")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench-shards-")
+    try:
+        started = time.perf_counter()
+        snapshot, vectors = write_corpus(root, args.rows, args.index_type)
+        print(f"📦 {args.rows} x {DIM} {snapshot.config['index_type']} snapshot written in {time.perf_counter() - started:.1f}s")
+
+        queries = unit_vectors(args.queries, seed=1)
+        exact = faiss.IndexFlatIP(DIM)
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.top_k)
+
+        def in_process(chunk, k):
+            index = snapshot.index
+            if snapshot.config["index_type"] in LOSSY_TYPES and args.rerank_factor > 1:
+                _, candidates = index.search(chunk, k * args.rerank_factor, params=search_params(index))
+                return snapshot.vectors.rerank(chunk, candidates, k)
+            return index.search(chunk, k, params=search_params(index))
+
+        ids, numbers = run(in_process, queries, args.clients, args.batch, args.top_k)
+        report("in-process", numbers, ids, truth)
+
+        for n_shards in args.shards:
+            searcher = ShardedSearcher(root, DIM, n_shards, rerank_factor=args.rerank_factor)
+            try:
+                load_started = time.perf_counter()
+                searcher.load(snapshot.name)
+                load_sec = time.perf_counter() - load_started
+
+                ids, numbers = run(
+                    lambda chunk, k: searcher.search(snapshot.name, chunk, k),
+                    queries, args.clients, args.batch, args.top_k
+                )
+                report(f"{n_shards} shard(s)", numbers, ids, truth)
+
+                stats = searcher.stats()
+                print(f"{'':<12}   built in {load_sec:.1f}s, {stats['threads_per_shard']} thread(s)/shard, merge p50 {stats['merge_ms']['p50']} ms")
+                for shard in stats["per_shard"]:
+                    print(
+                        f"{'':<12}   shard {shard['shard']}: {shard['vectors']:>8} vectors | "
+                        f"search p50 {shard['search_ms']['p50']:>7} ms p99 {shard['search_ms']['p99']:>7} ms | "
+                        f"round trip p50 {shard['round_trip_ms']['p50']:>7} ms"
+                    )
+            finally:
+                searcher.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
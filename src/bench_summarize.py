@@ -0,0 +1,167 @@
+"""
+Benchmark single-prompt vs map-reduce summarization of a long transcript.
+
+Talks to Ollama over HTTP. With --fake a local fake Ollama server is
+started instead: it answers after a delay that grows with prompt and
+output length (attention makes long prompts superlinear) and serves
+--fake-parallel requests at a time (like OLLAMA_NUM_PARALLEL), so the
+comparison runs without a GPU. The fake treats parallel slots as
+independent; re-run against the real server before tuning --workers.
+
+For each transcript length it times a single prompt, forced map-reduce
+with 1 and --workers workers (default 2, the API's OLLAMA_MAX_CONCURRENCY
+cap) and the path the API picks: one prompt while the transcript fits
+--context-tokens, map-reduce beyond.
+
+Run from the repo root:
+    python -m src.bench_summarize --fake --words 3000 6000 12000
+    python -m src.bench_summarize --words 3000 6000 12000        # real Ollama
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.map_reduce_summary import (
+    MODEL_CONTEXT_TOKENS,
+    MapReduceSummarizer,
+    approx_tokens,
+    ollama_generate,
+    single_prompt,
+    single_prompt_budget,
+)
+
+OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_MODEL = "llama3"
+
+WORDS = (
+    "model data training python network layer learning function value loss "
+    "gradient example vector index search query video transcript summary"
+).split()
+
+
+# ===============================
+# FAKE OLLAMA
+# ===============================
+def start_fake_ollama(port, parallel, prefill_ms, decode_ms, output_tokens, attn_tokens):
+    """
+    Serves /api/generate (non-streaming) on 127.0.0.1:port in a thread.
+    Latency = n * prefill_ms * (1 + n / attn_tokens) + output_tokens * decode_ms
+    for a prompt of n tokens.
+    """
+    slots = threading.Semaphore(parallel)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with slots:
+                n = approx_tokens(body["prompt"])
+                delay = n * prefill_ms * (1 + n / attn_tokens) + output_tokens * decode_ms
+                time.sleep(delay / 1000.0)
+
+            words = random.choices(WORDS, k=int(output_tokens / 1.3))
+            data = json.dumps({"response": "- " + " ".join(words), "done": True}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ===============================
+# BENCHMARK
+# ===============================
+class DictCache:
+    def __init__(self):
+        self.data = {}
+
+    def get_part(self, key):
+        return self.data.get(key)
+
+    def put_part(self, key, value):
+        self.data[key] = value
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, nargs="+", default=[3000, 6000, 12000])
+    parser.add_argument("--chunk-tokens", type=int, default=1500)
+    parser.add_argument("--context-tokens", type=int, default=MODEL_CONTEXT_TOKENS)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--url", default=OLLAMA_URL)
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--fake-port", type=int, default=11499)
+    parser.add_argument("--fake-parallel", type=int, default=2)
+    parser.add_argument("--fake-prefill-ms", type=float, default=0.2)
+    parser.add_argument("--fake-attn-tokens", type=int, default=4096)
+    parser.add_argument("--fake-decode-ms", type=float, default=20.0)
+    parser.add_argument("--fake-output-tokens", type=int, default=120)
+    args = parser.parse_args()
+
+    url = args.url
+    if args.fake:
+        start_fake_ollama(
+            args.fake_port,
+            args.fake_parallel,
+            args.fake_prefill_ms,
+            args.fake_decode_ms,
+            args.fake_output_tokens,
+            args.fake_attn_tokens
+        )
+        url = f"http://127.0.0.1:{args.fake_port}/api/generate"
+
+    def generate(prompt):
+        return ollama_generate(url, OLLAMA_MODEL, prompt, timeout=600, num_ctx=args.context_tokens)
+
+    budget = single_prompt_budget(args.context_tokens)
+    random.seed(0)
+    for words in args.words:
+        transcript = " ".join(random.choices(WORDS, k=words))
+        tokens = approx_tokens(transcript)
+        over = " (over the context: a real server truncates it)" if tokens > budget else ""
+        print(f"\nTranscript: {words} words (~{tokens} tokens){over}")
+
+        single = timed(lambda: generate(single_prompt(transcript)))
+        print(f"Single prompt          | {single}s | 1 call")
+
+        for workers in sorted({1, args.workers}):
+            summarizer = MapReduceSummarizer(
+                generate, max_workers=workers, chunk_tokens=args.chunk_tokens, single_prompt_tokens=0
+            )
+            seconds = timed(lambda: summarizer.summarize(transcript))
+            print(f"Map-reduce workers={workers}   | {seconds}s | {summarizer.calls} calls")
+
+        summarizer = MapReduceSummarizer(
+            generate, max_workers=args.workers, chunk_tokens=args.chunk_tokens, single_prompt_tokens=budget
+        )
+        seconds = timed(lambda: summarizer.summarize(transcript))
+        path = "single prompt" if summarizer.fits_single_prompt(transcript) else "map-reduce"
+        print(f"API path               | {seconds}s | {summarizer.calls} calls ({path})")
+
+    # Second run over the same transcript only pays for cache lookups
+    cache = DictCache()
+    summarizer = MapReduceSummarizer(
+        generate, cache=cache, max_workers=args.workers, chunk_tokens=args.chunk_tokens, single_prompt_tokens=0
+    )
+    summarizer.summarize(transcript)
+    seconds = timed(lambda: summarizer.summarize(transcript))
+    print(f"\nMap-reduce cached      | {seconds}s | {summarizer.cache_hits} cache hits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measure resident memory per API worker for several worker counts, to
+size deployments.
+
+Starts src.serve with N forked workers, waits until every worker reports
+ready, sends some searches so each one touches the index and metadata,
+then reads each worker's RSS / PSS / shared / private memory. The sum of
+PSS is what the workers really cost together.
+
+Run from the repo root after an ingest (Linux, or psutil installed):
+    python -m src.bench_workers --workers 1 2 4 --modes preload background
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+import httpx
+
+from src.process_memory import memory_usage
+
+SEARCH_QUERIES = ["python tutorial", "machine learning roadmap", "docker basics", "sorting algorithms"]
+MB = 1024 * 1024
+
+
+def ready_workers(url, workers, timeout):
+    """
+    Polls /health/ready until `workers` distinct pids answered ready.
+    """
+    pids = set()
+    deadline = time.time() + timeout
+    while len(pids) < workers and time.time() < deadline:
+        try:
+            # A new connection each time, so the kernel spreads them over workers
+            r = httpx.get(f"{url}/health/ready", timeout=5)
+            if r.status_code == 200:
+                pids.add(r.json()["pid"])
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    return pids
+
+
+def measure(mode, workers, port, searches, timeout):
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "src.serve", "--workers", str(workers), "--port", str(port)],
+        env=dict(os.environ, STARTUP_MODE=mode),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        started = time.time()
+        pids = ready_workers(url, workers, timeout)
+        ready_sec = time.time() - started
+        if len(pids) < workers:
+            print(f"❌ {mode} x{workers}: only {len(pids)} workers ready after {timeout}s")
+            return
+
+        for i in range(searches):
+            httpx.post(f"{url}/search", json={"query": SEARCH_QUERIES[i % len(SEARCH_QUERIES)], "top_k": 5}, timeout=30)
+
+        usage = [memory_usage(pid) for pid in sorted(pids)]
+        parent = memory_usage(server.pid)
+        if "error" in parent:
+            print(f"❌ {parent['error']}")
+            return
+
+        total_pss = sum(u["pss_bytes"] or 0 for u in usage) + (parent["pss_bytes"] or 0)
+        print(f"{mode:<10} x{workers} | ready in {ready_sec:5.1f}s | total PSS (incl. parent) {total_pss / MB:8.1f} MB")
+        for u in usage:
+            print(
+                f"{'':<10}    worker {u['pid']:>7} | RSS {u['rss_bytes'] / MB:7.1f} MB | "
+                f"PSS {(u['pss_bytes'] or 0) / MB:7.1f} MB | shared {u['shared_bytes'] / MB:7.1f} MB | "
+                f"private {u['private_bytes'] / MB:7.1f} MB"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", default=["preload", "background"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        for workers in args.workers:
+            measure(mode, workers, args.port, args.searches, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import os
+import time
+import multiprocessing
+from multiprocessing import util
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Rough WordPiece tokens per whitespace word for English transcripts
+TOKENS_PER_WORD = 1.3
+
+
+# ===============================
+# WORKER PROCESS
+# ===============================
+# One model copy per pool process, loaded by the initializer
+_model = None
+
+
+def _init_worker(load_model, threads):
+    global _model
+    # Split the cores between processes instead of every process
+    # spinning up a full set of intra-op threads
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _model = load_model()
+
+
+def _encode_batch(texts, normalize):
+    return _encode_with(_model, texts, normalize)
+
+
+def _encode_with(model, texts, normalize):
+    # The batch is already length-bucketed: run it as one forward pass
+    return model.encode(
+        texts,
+        batch_size=len(texts),
+        convert_to_numpy=True,
+        normalize_embeddings=normalize
+    ).astype("float32")
+
+
+# ===============================
+# BATCHING
+# ===============================
+def approx_tokens(text, max_seq_length):
+    """
+    Token count estimate, capped where the model truncates
+    (+2 for [CLS] / [SEP]).
+    """
+    return min(int(len(text.split()) * TOKENS_PER_WORD) + 2, max_seq_length)
+
+
+def length_batches(lengths, batch_tokens, max_batch_size):
+    """
+    Groups positions into batches of similar length, longest first.
+    A batch is closed once its padded size (rows x longest row) would
+    exceed batch_tokens, so short texts get proportionally larger batches.
+    """
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    batches, current = [], []
+    for pos in order:
+        if current and (
+            len(current) >= max_batch_size
+            or (len(current) + 1) * lengths[current[0]] > batch_tokens
+        ):
+            batches.append(current)
+            current = []
+        current.append(int(pos))
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BulkEncoder:
+    """
+    Encodes large lists of texts over a pool of encoder processes.
+
+    Texts are sorted by approximate token length and cut into batches
+    under a padded-token budget, the batches are spread over `workers`
+    processes (one model copy each) and the embeddings are put back in
+    input order. With workers=1 the batches run in this process.
+
+    encode() matches SentenceTransformer.encode, so a BulkEncoder can be
+    passed to EmbeddingCache.encode in place of the model. load_model
+    must be picklable, e.g. functools.partial(load_encoder, name, backend).
+    """
+
+    def __init__(self, load_model, workers=None, dim=384, batch_tokens=8192,
+                 max_batch_size=256, max_seq_length=256):
+        self.load_model = load_model
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.dim = dim
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_seq_length = max_seq_length
+
+        self._pool = None
+        self._finalizer = None
+        self._model = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.rows = 0
+        self.batches = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.seconds = 0.0
+
+    def _ensure_started(self):
+        if self.workers == 1:
+            if self._model is None:
+                self._model = self.load_model()
+            return
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # spawn: never fork a process that holds model/FAISS threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.load_model, threads)
+            )
+            # Inside a pool worker (ingest jobs) multiprocessing joins child
+            # processes on exit before atexit handlers run, so shut the pool
+            # down first (and before its queues' own exit finalizers, priority 10)
+            self._finalizer = util.Finalize(self, self._pool.shutdown, exitpriority=100)
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True, **encode_kwargs):
+        """
+        Returns a float32 (len(texts), dim) array in input order.
+        """
+        started = time.perf_counter()
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        if not len(texts):
+            return out
+
+        lengths = [approx_tokens(text, self.max_seq_length) for text in texts]
+        batches = length_batches(lengths, self.batch_tokens, self.max_batch_size)
+        self._ensure_started()
+
+        if self._pool is None:
+            results = (
+                _encode_with(self._model, [texts[i] for i in batch], normalize_embeddings)
+                for batch in batches
+            )
+        else:
+            futures = [
+                self._pool.submit(_encode_batch, [texts[i] for i in batch], normalize_embeddings)
+                for batch in batches
+            ]
+            results = (future.result() for future in futures)
+
+        for batch, embeddings in zip(batches, results):
+            out[batch] = embeddings
+
+        self.rows += len(texts)
+        self.batches += len(batches)
+        self.tokens += sum(lengths)
+        self.padded_tokens += sum(len(batch) * lengths[batch[0]] for batch in batches)
+        self.seconds += time.perf_counter() - started
+        return out
+
+    def close(self):
+        if self._pool is not None:
+            self._finalizer()
+            self._pool = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "rows": self.rows,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.rows / self.seconds, 1) if self.seconds else 0.0,
+            # Padded tokens over real tokens, minus one (estimated)
+            "padding_overhead": round(self.padded_tokens / self.tokens - 1, 4) if self.tokens else 0.0,
+        }
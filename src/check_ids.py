@@ -1,10 +1,11 @@
+import os
 import subprocess
 import whisper
 import torch
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from utils import ensure_dir, load_csv, save_csv
-import time
+from utils import ensure_dir, load_csv
+from transcribe_pipeline import TranscriptionPipeline
+from transcript_checkpoint import TranscriptCheckpoint
 
 # ===============================
 # Paths
@@ -12,6 +13,9 @@ import time
 VIDEO_CSV = r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\data\Tech_with_Tim.csv"
 AUDIO_DIR = Path(r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\audio_downloads")
 OUTPUT_CSV = r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\data\twt_transcripts.csv"
+# Results are committed here per video; a rerun skips finished ones
+CHECKPOINT_DB = str(Path(OUTPUT_CSV).with_suffix(".checkpoint.db"))
+FAILURES_JSON = str(Path(OUTPUT_CSV).with_suffix(".failed.json"))
 COOKIES_FILE = r"E:\Internship\Infosys Springboard\Infosys TASK1\INFOSYS TASK1\cookies.txt"  # Exported from Firefox
 
 ensure_dir(AUDIO_DIR)
@@ -20,22 +24,23 @@ ensure_dir(AUDIO_DIR)
 # Device Setup
 # ===============================
 device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"🔧 Using device: {device}")
 
-# Load Whisper model
+# Whisper model, loaded once per transcription worker
 model_name = "tiny"  # tiny = fastest, base = more accurate
-model = whisper.load_model(model_name).to(device)
 
 # ===============================
 # Globals
 # ===============================
-failed_downloads = []
-failed_transcripts = []
+# Downloads (network-bound) run on threads while finished files are
+# transcribed by worker processes; at most QUEUE_SIZE files wait in between
+DOWNLOAD_THREADS = 5
+TRANSCRIBE_WORKERS = 1 if device == "cuda" else min(4, os.cpu_count() or 1)
+QUEUE_SIZE = 4
 
 # ===============================
 # Audio Download Function
 # ===============================
-def download_audio(vid, retry=False):
+def download_audio(vid):
     """
     Download audio using yt-dlp with cookies.
     Detects 0-byte files and retries.
@@ -68,33 +73,19 @@ def download_audio(vid, retry=False):
 
     except Exception as e:
         print(f"❌ Failed to download {vid}: {e}")
-        if not retry:
-            failed_downloads.append(vid)
         return None
 
 # ===============================
 # Transcription Function
 # ===============================
-def transcribe_audio(vid):
+def load_model():
+    return whisper.load_model(model_name).to(device)
+
+def transcribe_file(model, audio_file):
     """
     Transcribe a video audio file using Whisper.
     """
-    audio_file = download_audio(vid)
-
-    if audio_file is None:
-        print(f"⛔ Skipping transcription — audio missing for: {vid}")
-        failed_transcripts.append(vid)
-        return {"id": vid, "transcript": ""}
-
-    try:
-        print(f"📝 Transcribing {vid} ...")
-        result = model.transcribe(audio_file)
-        return {"id": vid, "transcript": result["text"]}
-
-    except Exception as e:
-        print(f"❌ Whisper transcription failed for {vid}: {e}")
-        failed_transcripts.append(vid)
-        return {"id": vid, "transcript": ""}
+    return model.transcribe(audio_file)["text"]
 
 # ===============================
 # Main Function
@@ -103,46 +94,47 @@ def main():
     df = load_csv(VIDEO_CSV)
     video_ids = df["id"].tolist()
 
+    print(f"🔧 Using device: {device}")
+    checkpoint = TranscriptCheckpoint(CHECKPOINT_DB, f"whisper:{model_name}")
+    pending = checkpoint.pending(video_ids, lambda vid: AUDIO_DIR / f"{vid}.mp3")
     print(f"📌 Total videos: {len(video_ids)}")
+    print(f"⏭ Already transcribed: {checkpoint.skipped}, to process: {len(pending)}")
     print("🚀 Starting full download + transcription pipeline...\n")
 
+    pipeline = TranscriptionPipeline(
+        download_audio,
+        load_model,
+        transcribe_file,
+        download_threads=DOWNLOAD_THREADS,
+        transcribe_workers=TRANSCRIBE_WORKERS,
+        queue_size=QUEUE_SIZE,
+        on_result=checkpoint.record_result
+    )
+
     # -------------------------
-    # STEP 1 — PARALLEL AUDIO DOWNLOADS
+    # STEP 1 — Downloads (threads) feeding transcription (processes)
     # -------------------------
-    print("🎧 Downloading all audio files (parallel)...")
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {executor.submit(download_audio, vid): vid for vid in video_ids}
-        for fut in as_completed(futures):
-            fut.result()  # errors logged inside function
-
-    # Retry failed downloads once
-    if failed_downloads:
-        print(f"\n🔁 Retrying {len(failed_downloads)} failed downloads...\n")
-        for vid in failed_downloads[:]:
-            audio_file = download_audio(vid, retry=True)
-            if audio_file:
-                failed_downloads.remove(vid)
-
-    print("\n🎵 Audio download stage complete!")
-    if failed_downloads:
-        print(f"❗ Still failed downloads: {failed_downloads}")
+    pipeline.run(pending)
+    stats = pipeline.stats()
+    print(f"\n⏱ Pipeline: {stats['wall_sec']}s")
+    print(f"   download:   {stats['download']}")
+    print(f"   transcribe: {stats['transcribe']}")
+    print(f"   queue:      {stats['queue']}")
 
     # -------------------------
-    # STEP 2 — Transcription
+    # STEP 2 — Retry failed downloads once
     # -------------------------
-    print("\n✍ Transcribing videos...\n")
-    results = []
-
-    for vid in video_ids:
-        print("\n------------------------------------------------------------")
-        print(f"▶️ Processing video: {vid}")
-        res = transcribe_audio(vid)
-        results.append(res)
+    if pipeline.failed_downloads:
+        print(f"\n🔁 Retrying {len(pipeline.failed_downloads)} failed downloads...\n")
+        pipeline.run(pipeline.failed_downloads)
+    pipeline.close()
 
     # -------------------------
-    # STEP 3 — Save Output
+    # STEP 3 — Compact the checkpoint into the output CSV
     # -------------------------
-    save_csv(results, OUTPUT_CSV)
+    checkpoint.compact(OUTPUT_CSV, video_ids)
+    failures = checkpoint.write_failures(FAILURES_JSON)
+    checkpoint.close()
     print("\n💾 Transcripts saved!")
 
     # -------------------------
@@ -150,8 +142,9 @@ def main():
     # -------------------------
     print("\n================ SUMMARY ================")
     print(f"Total videos: {len(video_ids)}")
-    print(f"Failed downloads: {failed_downloads}")
-    print(f"Failed transcriptions: {failed_transcripts}")
+    print(f"Failed downloads: {failures['download']}")
+    print(f"Failed transcriptions: {failures['transcribe']}")
+    print(f"(failures listed in {FAILURES_JSON} are retried on the next run)")
     print("=========================================")
     print("\n🎉 DONE — all videos processed!\n")
 
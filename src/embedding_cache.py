@@ -0,0 +1,217 @@
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache.
+
+    Vectors live in one append-only float32 file (vectors.f32) read back
+    through np.memmap; index.pkl maps hash(model, encoder backend,
+    normalize, text) to the row slot in that file, in least-recently-used order.
+    When the cache grows past max_entries the oldest entries are evicted
+    and the vector file is compacted.
+    """
+
+    def __init__(self, cache_dir, model_name, normalize=True, dim=384,
+                 max_entries=200_000, backend="torch", onnx_file=None):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        # Backends embed slightly differently (quantization, ONNX export),
+        # so their vectors must never be mixed in one index
+        self.backend = backend or "torch"
+        self.onnx_file = onnx_file
+        self.normalize = normalize
+        self.dim = dim
+        self.max_entries = max_entries
+
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self.index_path = os.path.join(cache_dir, "index.pkl")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._memmap = None
+        self._slots = OrderedDict()
+        self._load()
+
+    # ---------------------------
+    # Storage
+    # ---------------------------
+    def _load(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                self._slots = pickle.load(f)
+
+        # Drop entries pointing past the end of a partially written file
+        rows = self._rows_on_disk()
+        for key in [k for k, slot in self._slots.items() if slot >= rows]:
+            del self._slots[key]
+
+    def _rows_on_disk(self):
+        if not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dim)
+
+    def _vectors(self):
+        rows = self._rows_on_disk()
+        if self._memmap is None or self._memmap.shape[0] != rows:
+            self._memmap = None
+            if rows:
+                self._memmap = np.memmap(
+                    self.vectors_path, dtype="float32", mode="r",
+                    shape=(rows, self.dim)
+                )
+        return self._memmap
+
+    def _save_index(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self._slots, f)
+        os.replace(tmp, self.index_path)
+
+    def _evict(self):
+        """
+        Evicts least-recently-used entries down to 90% of max_entries and
+        rewrites the vector file so only live rows remain.
+        """
+        target = int(self.max_entries * 0.9)
+        while len(self._slots) > target:
+            self._slots.popitem(last=False)
+            self.evictions += 1
+
+        old = self._vectors()
+        keys = list(self._slots)
+        survivors = old[[self._slots[k] for k in keys]] if keys else None
+
+        tmp = self.vectors_path + ".tmp"
+        with open(tmp, "wb") as f:
+            if survivors is not None:
+                np.ascontiguousarray(survivors, dtype="float32").tofile(f)
+
+        # Release the old mapping before replacing the file (Windows)
+        del old, survivors
+        self._memmap = None
+        os.replace(tmp, self.vectors_path)
+
+        self._slots = OrderedDict((k, slot) for slot, k in enumerate(keys))
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def key(self, text):
+        h = hashlib.sha1()
+        h.update(self.model_name.encode("utf-8"))
+        # Plain torch keeps the key format from before backends existed,
+        # so caches filled by it stay valid
+        if self.backend != "torch" or self.onnx_file:
+            h.update(f"\x1f{self.backend}\x1f{self.onnx_file or ''}".encode("utf-8"))
+        h.update(b"\x1f1\x1f" if self.normalize else b"\x1f0\x1f")
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def get_many(self, texts):
+        """
+        Bulk lookup.
+        Returns (embeddings, missing) where embeddings is (len(texts), dim)
+        and missing lists the positions that were not in the cache.
+        """
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        missing = []
+
+        with self._lock:
+            vectors = self._vectors()
+            found_pos, found_slots = [], []
+            for pos, text in enumerate(texts):
+                key = self.key(text)
+                slot = self._slots.get(key)
+                if slot is None:
+                    missing.append(pos)
+                    continue
+                self._slots.move_to_end(key)
+                found_pos.append(pos)
+                found_slots.append(slot)
+
+            if found_pos:
+                out[found_pos] = vectors[found_slots]
+
+            self.hits += len(found_pos)
+            self.misses += len(missing)
+
+        return out, missing
+
+    def put_many(self, texts, embeddings):
+        """
+        Appends new embeddings to the vector file and persists the index.
+        """
+        embeddings = np.asarray(embeddings, dtype="float32")
+
+        with self._lock:
+            new_keys, new_rows, seen = [], [], set()
+            for text, vector in zip(texts, embeddings):
+                key = self.key(text)
+                if key in self._slots or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(vector)
+
+            if not new_keys:
+                return
+
+            start = self._rows_on_disk()
+            with open(self.vectors_path, "ab") as f:
+                np.ascontiguousarray(new_rows, dtype="float32").tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            for offset, key in enumerate(new_keys):
+                self._slots[key] = start + offset
+
+            if len(self._slots) > self.max_entries:
+                self._evict()
+
+            self._save_index()
+
+    def encode(self, model, texts, **encode_kwargs):
+        """
+        Returns embeddings for texts, sending only cache misses to model.
+        """
+        embeddings, missing = self.get_many(texts)
+
+        if missing:
+            # Encode each distinct missing text once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            encoded = model.encode(
+                unique,
+                convert_to_numpy=True,
+                normalize_embeddings=self.normalize,
+                **encode_kwargs
+            ).astype("float32")
+
+            lookup = dict(zip(unique, encoded))
+            for i in missing:
+                embeddings[i] = lookup[texts[i]]
+
+            self.put_many(unique, encoded)
+
+        return embeddings
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "bytes": self._rows_on_disk() * 4 * self.dim,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+        }
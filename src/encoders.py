@@ -0,0 +1,96 @@
+import platform
+
+import numpy as np
+
+# ===============================
+# ENCODER BACKENDS
+# ===============================
+# torch      : SentenceTransformer in eager PyTorch (reference)
+# torch_int8 : same model with nn.Linear layers dynamically quantized to int8
+# onnx       : ONNX Runtime export of the model (sentence-transformers onnx backend)
+# onnx_int8  : ONNX Runtime with an int8-quantized export
+#
+# Every backend exposes SentenceTransformer's encode(texts, ...) so the
+# API, EmbeddingCache and the scripts can use any of them unchanged.
+ENCODER_BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+# Quantized ONNX files published with sentence-transformers models. Each
+# one is built for an instruction set; without it ONNX Runtime fails or
+# falls back to slow kernels, so the plain fp32 export is used instead.
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+ONNX_INT8_ARM64_FILE = "onnx/model_qint8_arm64.onnx"
+ONNX_PORTABLE_FILE = "onnx/model.onnx"
+
+# Minimum cosine similarity to the torch embedding of the same text for a
+# backend to be considered compatible with an index built by torch
+COMPATIBILITY_MIN_COSINE = 0.99
+
+
+def cpu_flags():
+    """
+    Instruction-set flags of the CPU (Linux /proc/cpuinfo); empty when unknown.
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def default_onnx_file(backend):
+    """
+    ONNX file for backend when none is configured: the int8 export built
+    for this CPU, or the portable fp32 export if there is none.
+    """
+    if backend != "onnx_int8":
+        return None
+    if "avx2" in cpu_flags():
+        return ONNX_INT8_FILE
+    if platform.machine().lower() in ("aarch64", "arm64"):
+        return ONNX_INT8_ARM64_FILE
+    print(f"⚠️ CPU without AVX2: using {ONNX_PORTABLE_FILE} instead of {ONNX_INT8_FILE}")
+    return ONNX_PORTABLE_FILE
+
+
+def load_encoder(model_name, backend="torch", onnx_file=None, device=None):
+    """
+    Loads model_name with the requested backend.
+    device=None lets sentence-transformers pick (CUDA when available);
+    the int8 backends always run on CPU, where their kernels live.
+    ONNX backends need `pip install sentence-transformers[onnx]`.
+    """
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {ENCODER_BACKENDS}")
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name, device=device)
+
+    if backend == "torch_int8":
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if backend == "onnx_int8":
+        device = "cpu"
+    model_kwargs = {}
+    onnx_file = onnx_file or default_onnx_file(backend)
+    if onnx_file:
+        model_kwargs["file_name"] = onnx_file
+    return SentenceTransformer(model_name, device=device, backend="onnx", model_kwargs=model_kwargs)
+
+
+def compare_embeddings(reference, candidate):
+    """
+    Row-wise cosine similarity between two embedding matrices.
+    Returns (min, mean) so callers can check COMPATIBILITY_MIN_COSINE.
+    """
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = np.sum(reference * candidate, axis=1)
+    return float(cosine.min()), float(cosine.mean())
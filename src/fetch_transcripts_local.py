@@ -1,16 +1,21 @@
+import os
 import subprocess
 from pathlib import Path
 import pandas as pd
 from faster_whisper import WhisperModel
-from utils import ensure_dir, save_csv, load_csv
-import math
-import tempfile
+from utils import ensure_dir, load_csv
+from audio_chunks import ChunkTranscriber
+from transcript_checkpoint import TranscriptCheckpoint
 import time
 
 # Paths
 VIDEO_CSV = Path(r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\data\Tech_with_Tim.csv")
 AUDIO_DIR = Path(r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\audio_downloads")
 OUTPUT_CSV = Path(r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\data\twt_transcripts.csv")
+# Results are committed here per video; a rerun skips finished ones
+CHECKPOINT_DB = OUTPUT_CSV.with_suffix(".checkpoint.db")
+FAILURES_JSON = OUTPUT_CSV.with_suffix(".failed.json")
+MODEL_NAME = "base"
 
 # Ensure directories exist
 ensure_dir(AUDIO_DIR)
@@ -19,6 +24,11 @@ ensure_dir(AUDIO_DIR)
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
 
+# Chunks of one video transcribed in parallel, each on cores // workers threads
+TRANSCRIBE_WORKERS = min(4, os.cpu_count() or 1)
+CHUNK_LENGTH_SEC = 300  # upper bound; short videos get one chunk per worker
+CHUNK_SPLIT = "silence"  # "fixed" windows or cuts moved to the quietest frame nearby
+
 def download_audio(video_id: str) -> Path:
     """Download audio from YouTube with retries"""
     out_path = AUDIO_DIR / f"{video_id}.mp3"
@@ -46,81 +56,61 @@ def download_audio(video_id: str) -> Path:
     print(f"⚠️ Could not download audio for {video_id} after {MAX_RETRIES} attempts")
     return None
 
-def transcribe_audio_chunks_ffmpeg(model, audio_path: Path) -> str:
-    """Split audio into chunks using ffmpeg and transcribe each chunk"""
-    # Get audio duration
-    result = subprocess.run(
-        ['ffprobe', '-i', str(audio_path), '-show_entries', 'format=duration',
-         '-v', 'quiet', '-of', 'csv=p=0'],
-        capture_output=True, text=True
-    )
-    duration_sec = float(result.stdout.strip())
-    full_text = ""
-
-    chunk_length_sec = 300  # 5 minutes per chunk
-    num_chunks = math.ceil(duration_sec / chunk_length_sec)
-    print(f"⏱ Audio length: {duration_sec:.1f}s, splitting into {num_chunks} chunks")
-
-    for i in range(num_chunks):
-        start = i * chunk_length_sec
-        end = min((i + 1) * chunk_length_sec, duration_sec)
-
-        # Create temporary chunk
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmpfile:
-            chunk_path = Path(tmpfile.name)
-
-        # Extract chunk with ffmpeg
-        ffmpeg_cmd = [
-            "ffmpeg",
-            "-y",
-            "-i", str(audio_path),
-            "-ss", str(start),
-            "-to", str(end),
-            "-c", "copy",
-            str(chunk_path)
-        ]
-        subprocess.run(ffmpeg_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        print(f"▶️ Transcribing chunk {i+1}/{num_chunks} ({start:.1f}s - {end:.1f}s)...")
-        segments, _ = model.transcribe(str(chunk_path))
-        chunk_text = " ".join([s.text for s in segments])
-        full_text += chunk_text + " "
-
-        # Remove temporary chunk
-        chunk_path.unlink()
-
-    return full_text.strip()
-
 def main():
     print("📌 Loading video list...")
     df = load_csv(VIDEO_CSV)
     video_ids = df["id"].tolist()
     print(f"Found {len(video_ids)} videos")
 
-    # Load model on CPU
-    model = WhisperModel("base", device="cpu")
+    checkpoint = TranscriptCheckpoint(str(CHECKPOINT_DB), f"faster-whisper:{MODEL_NAME}")
+    pending = checkpoint.pending(video_ids, lambda vid: AUDIO_DIR / f"{vid}.mp3")
+    print(f"⏭ Already transcribed: {checkpoint.skipped}, to process: {len(pending)}")
 
-    transcripts = []
+    # Load model on CPU, with one CTranslate2 worker per parallel chunk
+    model = WhisperModel(
+        MODEL_NAME,
+        device="cpu",
+        cpu_threads=max(1, (os.cpu_count() or 1) // TRANSCRIBE_WORKERS),
+        num_workers=TRANSCRIBE_WORKERS
+    )
+    transcriber = ChunkTranscriber(
+        model,
+        workers=TRANSCRIBE_WORKERS,
+        chunk_sec=CHUNK_LENGTH_SEC,
+        split=CHUNK_SPLIT
+    )
 
-    for idx, vid in enumerate(video_ids, start=1):
-        print(f"\n[{idx}/{len(video_ids)}] Processing video: {vid}")
+    for idx, vid in enumerate(pending, start=1):
+        print(f"\n[{idx}/{len(pending)}] Processing video: {vid}")
 
         audio_path = download_audio(vid)
         if not audio_path:
             print(f"⛔ Skipping transcription — audio missing: {vid}")
-            transcripts.append({"id": vid, "transcript": ""})
+            checkpoint.record_failure(vid, "download", "audio missing")
             continue
 
         try:
-            text = transcribe_audio_chunks_ffmpeg(model, audio_path)
-            transcripts.append({"id": vid, "transcript": text})
-            print(f"📝 Transcription completed for: {vid}")
+            started, audio_before = time.perf_counter(), transcriber.audio_sec
+            text, segments = transcriber.transcribe_file(audio_path)
+            checkpoint.record(vid, text, audio_path)
+            audio_sec = transcriber.audio_sec - audio_before
+            print(f"📝 Transcription completed for: {vid} ({audio_sec:.0f}s audio in {time.perf_counter() - started:.1f}s)")
         except Exception as e:
             print(f"❌ Error transcribing {vid}: {e}")
-            transcripts.append({"id": vid, "transcript": ""})
-
-    # Save all transcripts
-    save_csv(transcripts, OUTPUT_CSV)
+            checkpoint.record_failure(vid, "transcribe", e, audio_path)
+
+    transcriber.close()
+    stats = transcriber.stats()
+    print(f"\n⏱ {stats['audio_sec']}s of audio in {stats['wall_sec']}s "
+          f"({stats['realtime_factor']} audio-sec per wall-sec, {stats['chunks']} chunks, "
+          f"{stats['decode_sec']}s decoding)")
+
+    # Compact the checkpoint into the transcripts CSV
+    checkpoint.compact(OUTPUT_CSV, video_ids)
+    failures = checkpoint.write_failures(FAILURES_JSON)
+    checkpoint.close()
+    if failures["download"] or failures["transcribe"]:
+        print(f"⚠️ Failed videos listed in {FAILURES_JSON} (retried on the next run)")
     print(f"\n🎉 All transcriptions completed. Saved to: {OUTPUT_CSV}")
 
 if __name__ == "__main__":
@@ -0,0 +1,319 @@
+import os
+import json
+import math
+import numpy as np
+import faiss
+
+# ===============================
+# INDEX TYPES
+# ===============================
+# flat     : exact inner-product scan (IndexIDMap2 + IndexFlatIP)
+# hnsw     : graph index (IndexIDMap2 + IndexHNSWFlat)
+# ivf_flat : inverted lists over full vectors (IndexIVFFlat)
+# ivf_pq   : inverted lists over product-quantized codes (IndexIVFPQ)
+# fp16     : flat scan over float16 codes (IndexIDMap2 + IndexScalarQuantizer), 2 bytes/dim
+# sq8      : flat scan over 8-bit scalar codes (IndexIDMap2 + IndexScalarQuantizer), 1 byte/dim
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "fp16", "sq8")
+
+# Types whose scores are approximate; results are re-ranked exactly
+# against the snapshot's float32 vector store when one exists
+LOSSY_TYPES = ("ivf_pq", "fp16", "sq8")
+
+# Types whose snapshots also keep a float32 vector store: lossy types for
+# re-ranking, graph / IVF types so selective filters can be scored exactly
+VECTOR_STORE_TYPES = LOSSY_TYPES + ("hnsw", "ivf_flat")
+
+DEFAULT_PARAMS = {
+    "nlist": None,          # None = ~4 * sqrt(corpus size)
+    "nprobe": 8,
+    "hnsw_m": 32,
+    "ef_construction": 80,
+    "ef_search": 64,
+    "pq_m": 48,             # must divide the embedding dim (384 / 48 = 8)
+    "pq_bits": 8,
+}
+
+
+def default_nlist(n):
+    return max(1, min(4096, int(4 * math.sqrt(max(n, 1)))))
+
+
+def min_train_size(index_type, nlist, pq_bits=8):
+    """
+    Rows needed before an IVF index can be trained (FAISS wants ~39
+    points per centroid, and 2**pq_bits points per PQ codebook).
+    """
+    if index_type == "ivf_flat":
+        return 39 * nlist
+    if index_type == "ivf_pq":
+        return max(39 * nlist, 39 * (2 ** pq_bits))
+    if index_type == "sq8":
+        # Per-dimension min/max ranges need a representative sample
+        return 256
+    return 0
+
+
+def _params(params):
+    merged = dict(DEFAULT_PARAMS)
+    merged.update({
+        k: v for k, v in (params or {}).items()
+        if k in DEFAULT_PARAMS and v is not None
+    })
+    return merged
+
+
+# ===============================
+# BUILD
+# ===============================
+def build_index(index_type, dim, vectors, ids, **params):
+    """
+    Builds an index of the requested type holding vectors under ids.
+
+    IVF types are only built once there are enough rows to train them;
+    until then a flat index is returned. The returned config records the
+    type that was actually built plus its search parameters.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+    p = _params(params)
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    ids = np.asarray(ids, dtype="int64")
+    n = len(vectors)
+
+    built = index_type
+    nlist = p["nlist"] or default_nlist(n)
+    if n < min_train_size(index_type, nlist, p["pq_bits"]):
+        built = "flat"
+
+    if built == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    elif built == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, p["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = p["ef_construction"]
+        index = faiss.IndexIDMap2(hnsw)
+    elif built in ("fp16", "sq8"):
+        qtype = faiss.ScalarQuantizer.QT_fp16 if built == "fp16" else faiss.ScalarQuantizer.QT_8bit
+        sq = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+        sq.train(vectors)
+        index = faiss.IndexIDMap2(sq)
+    else:
+        quantizer = faiss.IndexFlatIP(dim)
+        if built == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(
+                quantizer, dim, nlist, p["pq_m"], p["pq_bits"], faiss.METRIC_INNER_PRODUCT
+            )
+        index.train(vectors)
+
+    if n:
+        index.add_with_ids(vectors, ids)
+
+    config = {
+        "index_type": built,
+        "requested_type": index_type,
+        "nlist": nlist if built.startswith("ivf") else None,
+        "nprobe": p["nprobe"],
+        "ef_search": p["ef_search"],
+        "hnsw_m": p["hnsw_m"],
+        "pq_m": p["pq_m"],
+        "pq_bits": p["pq_bits"],
+    }
+    apply_search_defaults(index, config)
+    return index, config
+
+
+def extract_vectors(index):
+    """
+    Returns (ids, vectors) for everything stored in index.
+    Vectors from an IVF-PQ index are PQ reconstructions (approximate).
+    """
+    if index.ntotal == 0:
+        return np.zeros(0, dtype="int64"), np.zeros((0, index.d), dtype="float32")
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        ids = faiss.vector_to_array(index.id_map).astype("int64")
+        vectors = index.index.reconstruct_n(0, index.ntotal)
+        return ids, vectors
+
+    invlists = ivf.invlists
+    ids = np.concatenate([
+        faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+        for l in range(ivf.nlist)
+        if invlists.list_size(l)
+    ]).astype("int64")
+
+    ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    vectors = ivf.reconstruct_batch(ids)
+    ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    return ids, vectors
+
+
+# ===============================
+# UPDATE
+# ===============================
+def remove_ids(index, ids, config):
+    """
+    Removes ids from index. HNSW cannot delete in place, so it is
+    rebuilt from the remaining vectors. Returns the (possibly new) index.
+    """
+    ids = np.asarray(ids, dtype="int64")
+    if len(ids) == 0:
+        return index
+
+    if config.get("index_type") != "hnsw":
+        index.remove_ids(ids)
+        return index
+
+    all_ids, vectors = extract_vectors(index)
+    keep = ~np.isin(all_ids, ids)
+    rebuilt, _ = build_index("hnsw", index.d, vectors[keep], all_ids[keep], **_params(config))
+    return rebuilt
+
+
+def maybe_rebuild(index, config, index_type, vector_store=None, **params):
+    """
+    Rebuilds index when the configured type differs from what is on disk,
+    e.g. a flat index that has grown large enough to train IVF.
+    Vectors come from vector_store when given, so a quantized index is
+    never rebuilt from its own lossy codes.
+    Returns (index, config).
+    """
+    p = _params(params)
+    nlist = p["nlist"] or default_nlist(index.ntotal)
+    target = index_type
+    if index.ntotal < min_train_size(index_type, nlist, p["pq_bits"]):
+        target = "flat"
+
+    if config.get("index_type") == target:
+        # Same structure: only refresh the requested type and search knobs
+        config = dict(
+            config,
+            requested_type=index_type,
+            nprobe=p["nprobe"],
+            ef_search=p["ef_search"],
+        )
+        apply_search_defaults(index, config)
+        return index, config
+
+    if vector_store is not None:
+        ids, vectors = vector_store.all()
+    else:
+        ids, vectors = extract_vectors(index)
+    print(f"🔁 Rebuilding {config.get('index_type')} index as {target} ({len(ids)} vectors)")
+    return build_index(index_type, index.d, vectors, ids, **params)
+
+
+# ===============================
+# SEARCH PARAMETERS
+# ===============================
+def apply_search_defaults(index, config):
+    """
+    Sets nprobe / efSearch on a freshly built or loaded index.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = config.get("nprobe") or DEFAULT_PARAMS["nprobe"]
+    elif config.get("index_type") == "hnsw":
+        hnsw = faiss.downcast_index(index.index)
+        hnsw.hnsw.efSearch = config.get("ef_search") or DEFAULT_PARAMS["ef_search"]
+
+
+def search_params(index, nprobe=None, ef_search=None, sel=None):
+    """
+    Per-query overrides passed to index.search(..., params=...).
+    sel is an optional faiss.IDSelector: only selected ids are scored.
+    Returns None when nothing applies to this index type.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        if nprobe or sel is not None:
+            # Params replace the index's own nprobe, so always set it
+            return faiss.SearchParametersIVF(nprobe=nprobe or ivf.nprobe, sel=sel)
+        return None
+
+    hnsw = _hnsw_of(index)
+    if hnsw is not None and (ef_search or sel is not None):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or hnsw.hnsw.efSearch, sel=sel)
+
+    if sel is not None:
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+
+def _hnsw_of(index):
+    if isinstance(index, faiss.IndexIDMap2):
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            return inner
+    return None
+
+
+def scan_budget(index, nprobe=None, ef_search=None):
+    """
+    Rough number of vectors one query scores: nprobe inverted lists for
+    IVF, efSearch expansions of base-layer neighbours for HNSW, every
+    vector for flat scans.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return (nprobe or ivf.nprobe) * index.ntotal / max(ivf.nlist, 1)
+    hnsw = _hnsw_of(index)
+    if hnsw is not None:
+        return (ef_search or hnsw.hnsw.efSearch) * hnsw.hnsw.nb_neighbors(0)
+    return index.ntotal
+
+
+def filtered_search_plan(index, matching, nprobe=None, ef_search=None):
+    """
+    How to search only `matching` rows (those a filter selects).
+
+    On IVF and HNSW an ID selector is no exact prefilter: it only drops
+    non-matching vectors from the lists / graph nodes the search visits,
+    so a selective filter leaves few or no hits. The search is widened by
+    1 / selectivity, so it visits about as many matching vectors as an
+    unfiltered one; when scoring the matching vectors directly is cheaper
+    than that, exact=True. Flat scans see every vector, so their selector
+    is already exact.
+
+    Returns (exact, nprobe, ef_search).
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    hnsw = _hnsw_of(index)
+    if ivf is None and hnsw is None:
+        return False, nprobe, ef_search
+    if matching == 0:
+        return True, nprobe, ef_search
+
+    widen = index.ntotal / matching
+    if ivf is not None:
+        nprobe = min(ivf.nlist, math.ceil((nprobe or ivf.nprobe) * widen))
+    else:
+        ef_search = min(max(index.ntotal, 1), math.ceil((ef_search or hnsw.hnsw.efSearch) * widen))
+    return matching <= scan_budget(index, nprobe, ef_search), nprobe, ef_search
+
+
+# ===============================
+# CONFIG SIDECAR
+# ===============================
+def config_path(index_path):
+    return index_path + ".json"
+
+
+def read_index_config(index_path):
+    """
+    Reads the index config saved next to index_path.
+    Snapshots written before index types existed are flat.
+    """
+    path = config_path(index_path)
+    if not os.path.exists(path):
+        return {"index_type": "flat", "requested_type": "flat"}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_index_config(index_path, config):
+    with open(config_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
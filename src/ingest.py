@@ -0,0 +1,265 @@
+import hashlib
+import numpy as np
+import pandas as pd
+import faiss
+
+from src.index_factory import remove_ids
+from src.metadata_table import MetadataTable
+
+# Fields that make up a metadata row's content hash
+HASH_FIELDS = ["title", "channel_title", "view_count", "duration", "published_at", "transcript"]
+# Fields that are actually encoded: only a change here needs a new embedding
+EMBED_FIELDS = ["transcript"]
+
+
+def _fields_hash(row, fields):
+    h = hashlib.sha1()
+    for field in fields:
+        h.update(str(row.get(field, "")).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def content_hash(row):
+    """
+    Stable hash of a metadata row, used to detect unchanged rows on re-ingest.
+    """
+    return _fields_hash(row, HASH_FIELDS)
+
+
+def embed_hash(row):
+    """
+    Hash of the encoded text only. Rows whose metadata changed (view
+    counts, titles, dates) but whose embed_hash did not keep their vector.
+    """
+    return _fields_hash(row, EMBED_FIELDS)
+
+
+def clean_frame(df):
+    """
+    Normalizes one chunk of an uploaded CSV and applies the lenient
+    filter (transcript > 20 chars or title > 10 chars).
+    """
+    df.columns = df.columns.str.strip()
+
+    def column(name, default):
+        return df[name] if name in df.columns else pd.Series(default, index=df.index)
+
+    df["transcript"] = column("transcript", "").fillna("").astype(str)
+    df["title"] = column("title", "").fillna("").astype(str)
+    df["channel_title"] = column("channel_title", "").fillna("").astype(str)
+    df["viewCount"] = pd.to_numeric(column("viewCount", 0), errors="coerce").fillna(0)
+    df["duration_seconds"] = pd.to_numeric(column("duration_seconds", 0), errors="coerce").fillna(0)
+    df["publishedAt"] = column("publishedAt", "").fillna("").astype(str)
+
+    return df[
+        (df["transcript"].str.len() > 20) |
+        (df["title"].str.len() > 10)
+    ].reset_index(drop=True)
+
+
+def rows_from_frame(df):
+    """
+    Builds metadata rows with column operations instead of iterrows.
+    """
+    return pd.DataFrame({
+        "video_id": df["id"].astype(str),
+        "title": df["title"],
+        "channel_title": df["channel_title"],
+        "view_count": df["viewCount"].astype("int64"),
+        "duration": df["duration_seconds"].astype(str),
+        "published_at": df["publishedAt"],
+        "transcript": df["transcript"],
+    }).to_dict(orient="records")
+
+
+def ensure_id_map(index, metadata):
+    """
+    Wraps a legacy positional IndexFlatIP into an IndexIDMap2 so rows can
+    be replaced by id. Indexes with native ids (IDMap2, IVF) are kept.
+
+    metadata comes back as a MetadataTable (None when empty). Tables
+    written by ingest jobs are returned as they are; legacy rows get
+    faiss_id = their position and freshly computed hashes.
+    """
+    if not isinstance(index, faiss.IndexIDMap2) and faiss.try_extract_index_ivf(index) is None:
+        id_index = faiss.IndexIDMap2(faiss.IndexFlatIP(index.d))
+        if index.ntotal > 0:
+            vectors = index.reconstruct_n(0, index.ntotal)
+            id_index.add_with_ids(vectors, np.arange(index.ntotal, dtype="int64"))
+        index = id_index
+
+    if isinstance(metadata, MetadataTable) and {"faiss_id", "content_hash"} <= set(metadata.schema):
+        return index, metadata
+
+    migrated = []
+    for position, row in enumerate(metadata or []):
+        row = dict(row)
+        row["video_id"] = str(row["video_id"])
+        row.setdefault("faiss_id", position)
+        row.setdefault("content_hash", content_hash(row))
+        # Rows written before embed_hash existed: their vector is of this text
+        row.setdefault("embed_hash", embed_hash(row))
+        migrated.append(row)
+
+    return index, MetadataTable.from_rows(migrated) if migrated else None
+
+
+class SnapshotRows:
+    """
+    The rows of the snapshot an ingest job is building: the base
+    snapshot's MetadataTable, read in place (mmapped), plus the rows the
+    job upserts, which go straight to a SnapshotBuilder on disk.
+
+    Only (position, faiss_id, hashes) of upserted rows stays in memory,
+    never a row's text. next_id is carried from chunk to chunk.
+    """
+
+    def __init__(self, base, builder):
+        self.base = base
+        self.builder = builder
+        self.next_id = base.max_faiss_id() + 1 if base is not None else 0
+
+        self._upserted = {}
+        self._replaced = np.zeros(len(base) if base is not None else 0, dtype=bool)
+
+    def _base_position(self, video_id):
+        return self.base.position_of(video_id) if self.base is not None else None
+
+    def get(self, video_id):
+        """
+        {"faiss_id", "content_hash", "embed_hash"} of video_id, or None.
+        """
+        if video_id in self._upserted:
+            _, faiss_id, row_hash, text_hash = self._upserted[video_id]
+            return {"faiss_id": faiss_id, "content_hash": row_hash, "embed_hash": text_hash}
+
+        position = self._base_position(video_id)
+        if position is None:
+            return None
+        if "embed_hash" in self.base.schema:
+            text_hash = self.base.value("embed_hash", position)
+        else:
+            # Tables written before embed_hash existed
+            text_hash = embed_hash({f: self.base.value(f, position) for f in EMBED_FIELDS if f in self.base.schema})
+        return {
+            "faiss_id": self.base.value("faiss_id", position),
+            "content_hash": self.base.value("content_hash", position),
+            "embed_hash": text_hash,
+        }
+
+    def put(self, rows):
+        """
+        Spools rows (with faiss_id and hashes set), replacing earlier
+        versions of the same video_ids.
+        """
+        first = self.builder.append(rows)
+        for offset, row in enumerate(rows):
+            previous = self._upserted.get(row["video_id"])
+            if previous is not None:
+                self.builder.drop(previous[0])
+            else:
+                position = self._base_position(row["video_id"])
+                if position is not None:
+                    self._replaced[position] = True
+            self._upserted[row["video_id"]] = (
+                first + offset, row["faiss_id"], row["content_hash"], row["embed_hash"]
+            )
+
+    def finish(self, block_rows=1000):
+        """
+        Copies the base rows that were not replaced into the builder,
+        block_rows at a time.
+        """
+        if self.base is None:
+            return
+        keep = np.flatnonzero(~self._replaced)
+        for start in range(0, len(keep), block_rows):
+            block = []
+            for position in keep[start:start + block_rows]:
+                row = self.base.row(int(position))
+                row.setdefault("embed_hash", embed_hash(row))
+                block.append(row)
+            self.builder.append(block)
+
+
+def upsert_rows(index, config, rows, new_rows, encode, vector_store=None, replaced=None):
+    """
+    Upserts new_rows into index and rows (a SnapshotRows).
+
+    - unchanged rows (same content_hash) are skipped
+    - rows whose metadata changed but whose transcript did not (same
+      embed_hash) are replaced in the metadata only; the index is untouched
+    - rows with a changed transcript are re-embedded under the same faiss_id
+    - new rows are embedded and appended with a fresh faiss_id
+
+    encode(texts) must return a float32 array of normalized embeddings.
+    New embeddings are also written to vector_store, if given.
+
+    With a `replaced` list (needs vector_store), re-embedded ids are
+    appended to it instead of being swapped in the index right away;
+    replace_vectors() then swaps them all at once at the end of a job, so
+    an HNSW index is rebuilt once instead of once per chunk.
+    Returns (index, stats); index is a new object when the index type
+    cannot delete in place.
+    """
+    # Duplicate video_ids within one upload: the last row wins
+    new_rows = {row["video_id"]: row for row in new_rows}.values()
+
+    inserted, updated, metadata_only, skipped = [], [], [], 0
+    for row in new_rows:
+        row = dict(row)
+        row["content_hash"] = content_hash(row)
+        row["embed_hash"] = embed_hash(row)
+        old = rows.get(row["video_id"])
+
+        if old is None:
+            row["faiss_id"] = rows.next_id
+            rows.next_id += 1
+            inserted.append(row)
+        elif old["content_hash"] == row["content_hash"]:
+            skipped += 1
+        elif old["embed_hash"] == row["embed_hash"]:
+            row["faiss_id"] = old["faiss_id"]
+            metadata_only.append(row)
+        else:
+            row["faiss_id"] = old["faiss_id"]
+            updated.append(row)
+
+    changed = inserted + updated
+    rows.put(changed + metadata_only)
+    if changed:
+        embeddings = encode([r["transcript"] for r in changed])
+        ids = np.array([r["faiss_id"] for r in changed], dtype="int64")
+        if vector_store is not None:
+            vector_store.upsert(ids, embeddings)
+
+        if replaced is not None:
+            # Only new ids go into the index now; old vectors wait for replace_vectors
+            replaced.extend(r["faiss_id"] for r in updated)
+            ids, embeddings = ids[:len(inserted)], embeddings[:len(inserted)]
+        elif updated:
+            index = remove_ids(index, [r["faiss_id"] for r in updated], config)
+        if len(ids):
+            index.add_with_ids(embeddings, ids)
+
+    return index, {
+        "inserted": len(inserted),
+        "updated": len(updated),
+        "metadata_updated": len(metadata_only),
+        "skipped": skipped,
+    }
+
+
+def replace_vectors(index, config, ids, vector_store):
+    """
+    Swaps the vectors of ids (collected by upsert_rows over a whole job)
+    for their current ones in vector_store, with a single remove_ids call.
+    Returns the (possibly new) index.
+    """
+    ids = np.unique(np.asarray(ids, dtype="int64"))
+    if len(ids) == 0:
+        return index
+    index = remove_ids(index, ids, config)
+    index.add_with_ids(vector_store.get(ids), ids)
+    return index
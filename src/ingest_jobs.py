@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import multiprocessing
+from functools import partial
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+from src.ingest import SnapshotRows, clean_frame, ensure_id_map, replace_vectors, rows_from_frame, upsert_rows
+from src.bulk_encoder import BulkEncoder
+from src.embedding_cache import EmbeddingCache
+from src.encoders import load_encoder
+from src.index_factory import VECTOR_STORE_TYPES, maybe_rebuild
+from src.snapshot_store import SnapshotBuilder, SnapshotStore, write_snapshot
+from src.vector_store import VectorStore
+
+# ===============================
+# WORKER PROCESS
+# ===============================
+# Started once per worker process and reused across jobs
+_encoder = None
+
+
+def _get_encoder(settings):
+    global _encoder
+    if _encoder is None:
+        _encoder = BulkEncoder(
+            partial(
+                load_encoder,
+                settings["model_name"],
+                settings["encoder_backend"],
+                settings["encoder_onnx_file"],
+                settings.get("encoder_device")
+            ),
+            workers=settings["encode_workers"],
+            dim=settings["dim"]
+        )
+    return _encoder
+
+
+def write_status(path, status):
+    """
+    Atomically replaces a job status file so readers never see half a JSON.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(status, f)
+    os.replace(tmp, path)
+
+
+def run_ingest_job(job_id, upload_path, status_path, settings):
+    """
+    Runs one CSV ingest in a worker process.
+
+    Reads the snapshot currently on disk, upserts the upload chunk by
+    chunk and writes the result as a complete snapshot in a staging
+    directory. Rows are spooled to disk per chunk, so memory stays flat
+    as the corpus grows. The API process publishes it; nothing live is
+    modified here.
+    """
+    started = time.time()
+    status = {
+        "job_id": job_id,
+        "status": "running",
+        "started_at": started,
+        "chunks_done": 0,
+        "original_rows": 0,
+        "rows_after_filtering": 0,
+        "inserted": 0,
+        "updated": 0,
+        "metadata_updated": 0,
+        "skipped": 0,
+        "rows_per_sec": 0.0,
+        "encoded": 0,
+        "encode_rows_per_sec": 0.0,
+    }
+    write_status(status_path, status)
+
+    encoder = _get_encoder(settings)
+    encoder.reset_stats()
+    cache = EmbeddingCache(
+        settings["embedding_cache_dir"],
+        settings["model_name"],
+        normalize=True,
+        dim=settings["dim"],
+        max_entries=settings["embedding_cache_max_entries"],
+        backend=settings["encoder_backend"],
+        onnx_file=settings["encoder_onnx_file"]
+    )
+
+    # Index and vectors are read into memory (this copy gets modified);
+    # metadata stays mmapped and is only read row by row
+    store = SnapshotStore(
+        settings["snapshot_dir"],
+        settings["dim"],
+        legacy_index_path=settings["legacy_index_path"],
+        legacy_metadata_path=settings["legacy_metadata_path"],
+        writable=True
+    )
+    snapshot = store.current()
+    idx, base_rows = ensure_id_map(snapshot.index, snapshot.rows)
+    config = snapshot.config
+    # Full-precision vectors, kept alongside quantized indexes
+    vectors = snapshot.vectors or VectorStore.from_index(idx)
+
+    # Each chunk's rows go straight to append-only files in the staging dir
+    staged = store.staging_dir(job_id)
+    builder = SnapshotBuilder(staged)
+    rows = SnapshotRows(base_rows, builder)
+    # Re-embedded ids; their old vectors are swapped out once, after the last chunk
+    replaced = []
+
+    def encode(texts):
+        # Cached texts skip the model entirely
+        return cache.encode(encoder, texts)
+
+    try:
+        for chunk in pd.read_csv(upload_path, chunksize=settings["chunk_rows"]):
+            status["original_rows"] += len(chunk)
+            chunk = clean_frame(chunk)
+            status["rows_after_filtering"] += len(chunk)
+
+            if not chunk.empty:
+                idx, chunk_stats = upsert_rows(
+                    idx, config, rows, rows_from_frame(chunk), encode,
+                    vector_store=vectors, replaced=replaced
+                )
+                for k, v in chunk_stats.items():
+                    status[k] += v
+
+            status["chunks_done"] += 1
+            status["rows_per_sec"] = round(status["original_rows"] / max(time.time() - started, 1e-9), 1)
+            encoder_stats = encoder.stats()
+            status["encoded"] = encoder_stats["rows"]
+            status["encode_rows_per_sec"] = encoder_stats["rows_per_sec"]
+            write_status(status_path, status)
+            print(f"📥 [{job_id}] chunk {status['chunks_done']}: {status['original_rows']} rows read")
+
+        result = dict(status, embedding_cache=cache.stats(), encoder=encoder.stats(), staged=None)
+        if status["rows_after_filtering"] == 0:
+            result["error"] = "No valid rows found after filtering"
+            builder.discard()
+            return result
+
+        idx = replace_vectors(idx, config, replaced, vectors)
+
+        # Train / switch to the configured index type once the corpus allows it
+        new_idx, new_config = maybe_rebuild(
+            idx, config, settings["index_type"], vector_store=vectors, **settings["index_params"]
+        )
+        if not (status["inserted"] or status["updated"] or status["metadata_updated"] or new_config != config):
+            result["vectors_stored"] = new_idx.ntotal
+            builder.discard()
+            return result
+
+        write_started = time.time()
+        rows.finish()
+        write_snapshot(
+            staged,
+            new_idx,
+            None,
+            new_config,
+            settings["model_name"],
+            settings["dim"],
+            encoder_backend=settings["encoder_backend"],
+            vector_store=vectors if new_config["index_type"] in VECTOR_STORE_TYPES else None,
+            builder=builder
+        )
+    except BaseException:
+        builder.discard()
+        raise
+
+    result.update(
+        staged=staged,
+        snapshot_write_sec=round(time.time() - write_started, 3),
+        vectors_stored=new_idx.ntotal,
+        index_type=new_config["index_type"],
+    )
+    return result
+
+
+# ===============================
+# API-SIDE JOB MANAGER
+# ===============================
+@contextmanager
+def file_lock(path):
+    """
+    Exclusive lock shared by every process that opens path (blocking).
+    """
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s; keep waiting
+                    pass
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class IngestJobManager:
+    """
+    Queues ingest jobs and runs them one at a time in a worker process.
+
+    Jobs are serialized so each one starts from the snapshot published by
+    the previous job, also across API worker processes (a lock file in
+    jobs_dir is held from job start to publish). publish(result) runs in
+    the API process once a job has staged its files.
+
+    Job status lives in jobs_dir too, so any worker can answer a status
+    poll for a job submitted through another one.
+    """
+
+    def __init__(self, jobs_dir, settings, publish):
+        self.jobs_dir = jobs_dir
+        self.settings = settings
+        self.publish = publish
+
+        os.makedirs(jobs_dir, exist_ok=True)
+
+        self.lock_path = os.path.join(jobs_dir, "ingest.lock")
+
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._pool = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                # spawn: never fork a process that holds model/FAISS threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                self._thread = threading.Thread(
+                    target=self._dispatch, name="ingest-dispatcher", daemon=True
+                )
+                self._thread.start()
+
+    def upload_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.csv")
+
+    def status_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def new_job_id(self):
+        return uuid.uuid4().hex
+
+    def submit(self, job_id):
+        """
+        Queues an ingest of the CSV already saved at upload_path(job_id).
+        """
+        self._ensure_started()
+        self._jobs[job_id] = {"job_id": job_id, "status": "queued", "queued_at": time.time()}
+        write_status(self.status_path(job_id), self._jobs[job_id])
+        self._queue.put(job_id)
+        return self._jobs[job_id]
+
+    def _dispatch(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with file_lock(self.lock_path):
+                    self._jobs[job_id]["status"] = "running"
+                    future = self._pool.submit(
+                        run_ingest_job,
+                        job_id,
+                        self.upload_path(job_id),
+                        self.status_path(job_id),
+                        self.settings
+                    )
+                    result = future.result()
+                    if result.get("staged"):
+                        self.publish(result)
+                        result["status"] = "completed"
+                    else:
+                        result["status"] = "failed" if result.get("error") else "completed"
+                result.pop("staged", None)
+                result["finished_at"] = time.time()
+                self._jobs[job_id] = result
+            except Exception as e:
+                print(f"❌ Ingest job {job_id} failed: {e}")
+                self._jobs[job_id] = dict(
+                    self._read_status(job_id) or {"job_id": job_id},
+                    status="failed",
+                    error=str(e),
+                    finished_at=time.time()
+                )
+            finally:
+                write_status(self.status_path(job_id), self._jobs[job_id])
+                if os.path.exists(self.upload_path(job_id)):
+                    os.remove(self.upload_path(job_id))
+
+    def _read_status(self, job_id):
+        try:
+            with open(self.status_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def get(self, job_id):
+        """
+        Returns the job's latest status, including per-chunk progress
+        written by the worker while it runs.
+        """
+        if not job_id.isalnum():
+            return None
+        job = self._jobs.get(job_id)
+        if job is None:
+            # Submitted through another API worker
+            return self._read_status(job_id)
+        if job["status"] == "running":
+            progress = self._read_status(job_id)
+            if progress:
+                return dict(progress, status="running")
+        return job
@@ -0,0 +1,275 @@
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+# ===============================
+# TOKENIZER
+# ===============================
+# Keeps library names and versions whole: "node.js", "c++", "python3.11", "scikit-learn"
+TOKEN_RE = re.compile(r"[a-z0-9](?:[a-z0-9]|[._-](?=[a-z0-9]))*[+#]*")
+
+LEXICAL_FILES = {
+    "terms": "lexical_terms.txt",
+    "offsets": "lexical_offsets.npy",
+    "docs": "lexical_docs.npy",
+    "scores": "lexical_scores.npy",
+    "faiss_ids": "lexical_faiss_ids.npy",
+}
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def document_terms(row, title_weight=2):
+    """
+    Term frequencies of one row: transcript tokens, plus title tokens
+    counted title_weight times.
+    """
+    counts = Counter(tokenize(row.get("transcript") or ""))
+    for token in tokenize(row.get("title") or ""):
+        counts[token] += title_weight
+    return counts
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses several ranked id lists: score(id) = sum of 1 / (k + rank).
+    Returns (ids, scores) sorted by fused score. -1 ids are ignored.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            doc_id = int(doc_id)
+            if doc_id != -1:
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return [doc_id for doc_id, _ in ranked], [score for _, score in ranked]
+
+
+# ===============================
+# BM25 INVERTED INDEX
+# ===============================
+class LexicalIndex:
+    """
+    BM25 over title + transcript, stored as CSR-style arrays:
+    postings of term t are docs[offsets[t]:offsets[t + 1]] with their
+    precomputed BM25 contribution in scores[...]. A query is a dict
+    lookup and an array slice per term, then one bincount.
+
+    Title tokens count title_weight times so a match in the title ranks
+    above the same word said once in a long transcript.
+    """
+
+    def __init__(self, terms, offsets, docs, scores, faiss_ids):
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.docs = docs
+        self.scores = scores
+        self.faiss_ids = faiss_ids
+
+    @classmethod
+    def build(cls, rows, title_weight=2, k1=1.2, b=0.75):
+        vocab = {}
+        term_ids, doc_pos, tfs = [], [], []
+        doc_len = np.zeros(len(rows), dtype="float32")
+        faiss_ids = np.zeros(len(rows), dtype="int64")
+
+        for pos, row in enumerate(rows):
+            counts = document_terms(row, title_weight)
+            doc_len[pos] = sum(counts.values())
+            faiss_ids[pos] = row.get("faiss_id", pos)
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_pos.append(pos)
+                tfs.append(tf)
+
+        terms = [None] * len(vocab)
+        for term, i in vocab.items():
+            terms[i] = term
+
+        return cls.from_postings(
+            terms,
+            np.array(term_ids, dtype="int64"),
+            np.array(doc_pos, dtype="int32"),
+            np.array(tfs, dtype="float32"),
+            doc_len,
+            faiss_ids,
+            k1=k1,
+            b=b
+        )
+
+    @classmethod
+    def from_postings(cls, terms, term_ids, doc_pos, tfs, doc_len, faiss_ids, k1=1.2, b=0.75):
+        """
+        Builds the BM25 arrays from (term id, row position, term frequency)
+        postings in any order; terms[i] is the term with id i.
+        """
+        # Group postings by term (stable: docs stay in order within a term)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_pos, tfs = term_ids[order], doc_pos[order], tfs[order]
+
+        df = np.bincount(term_ids, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        offsets[1:] = np.cumsum(df)
+
+        n = max(len(doc_len), 1)
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype("float32")
+        avgdl = float(doc_len.mean()) if len(doc_len) else 1.0
+        norm = k1 * (1.0 - b + b * doc_len[doc_pos] / max(avgdl, 1e-9))
+        scores = (idf[term_ids] * tfs * (k1 + 1.0) / (tfs + norm)).astype("float32")
+
+        return cls(list(terms), offsets, doc_pos, scores, faiss_ids)
+
+    def save(self, snapshot_dir):
+        """
+        Writes the arrays next to the FAISS index. Returns the file names.
+        """
+        with open(os.path.join(snapshot_dir, LEXICAL_FILES["terms"]), "w", encoding="utf-8") as f:
+            f.write("\n".join(self.terms))
+        for name in ("offsets", "docs", "scores", "faiss_ids"):
+            np.save(os.path.join(snapshot_dir, LEXICAL_FILES[name]), getattr(self, name))
+        return list(LEXICAL_FILES.values())
+
+    @classmethod
+    def load(cls, snapshot_dir, mmap=True):
+        """
+        Returns None for snapshots written before lexical search existed.
+        """
+        terms_path = os.path.join(snapshot_dir, LEXICAL_FILES["terms"])
+        if not os.path.exists(terms_path):
+            return None
+
+        with open(terms_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        terms = content.split("\n") if content else []
+
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(snapshot_dir, LEXICAL_FILES[name]), mmap_mode=mmap_mode)
+            for name in ("offsets", "docs", "scores", "faiss_ids")
+        }
+        return cls(terms, **arrays)
+
+    def stats(self):
+        return {
+            "terms": len(self.terms),
+            "postings": int(len(self.docs)),
+            "docs": int(len(self.faiss_ids)),
+        }
+
+    def search(self, query, top_k, mask=None):
+        """
+        Returns (scores, faiss_ids) of the top_k BM25 matches, best first.
+        mask (bool per row, see MetadataColumns.mask) drops rows before ranking.
+        """
+        postings = [
+            self.term_ids[term] for term in set(tokenize(query))
+            if term in self.term_ids
+        ]
+        if not postings:
+            return np.zeros(0, dtype="float32"), np.zeros(0, dtype="int64")
+
+        if len(postings) == 1:
+            # Postings are already one score per document
+            t = postings[0]
+            docs = self.docs[self.offsets[t]:self.offsets[t + 1]]
+            totals = self.scores[self.offsets[t]:self.offsets[t + 1]]
+        else:
+            docs = np.concatenate([self.docs[self.offsets[t]:self.offsets[t + 1]] for t in postings])
+            scores = np.concatenate([self.scores[self.offsets[t]:self.offsets[t + 1]] for t in postings])
+            # BM25 scores are positive, so non-zero sums are exactly the matched docs
+            per_doc = np.bincount(docs, weights=scores).astype("float32")
+            docs = np.flatnonzero(per_doc)
+            totals = per_doc[docs]
+
+        if mask is not None:
+            keep = mask[docs]
+            docs, totals = docs[keep], totals[keep]
+
+        k = min(top_k, len(docs))
+        if k == 0:
+            return np.zeros(0, dtype="float32"), np.zeros(0, dtype="int64")
+        best = np.argpartition(-totals, k - 1)[:k]
+        best = best[np.argsort(-totals[best])]
+        return np.asarray(totals[best]), np.asarray(self.faiss_ids[docs[best]])
+
+
+class LexicalIndexWriter:
+    """
+    Builds a LexicalIndex chunk by chunk: each chunk's postings go to
+    append-only files in spool_dir instead of staying in memory, and BM25
+    scores are computed once in finish(), when document frequencies and
+    lengths over the whole corpus are known.
+    """
+
+    def __init__(self, spool_dir, title_weight=2):
+        self.spool_dir = spool_dir
+        self.title_weight = title_weight
+        self.rows = 0
+        self._vocab = {}
+
+    def _path(self, name):
+        return os.path.join(self.spool_dir, f"lexical_{name}.bin")
+
+    def _append(self, name, array):
+        with open(self._path(name), "ab") as f:
+            array.tofile(f)
+
+    def _read(self, name, dtype):
+        path = self._path(name)
+        return np.fromfile(path, dtype=dtype) if os.path.exists(path) else np.zeros(0, dtype=dtype)
+
+    def append(self, rows):
+        term_ids, doc_pos, tfs = [], [], []
+        doc_len = np.zeros(len(rows), dtype="float32")
+        faiss_ids = np.zeros(len(rows), dtype="int64")
+
+        for i, row in enumerate(rows):
+            pos = self.rows + i
+            counts = document_terms(row, self.title_weight)
+            doc_len[i] = sum(counts.values())
+            faiss_ids[i] = row.get("faiss_id", pos)
+            for term, tf in counts.items():
+                term_ids.append(self._vocab.setdefault(term, len(self._vocab)))
+                doc_pos.append(pos)
+                tfs.append(tf)
+
+        self._append("term_ids", np.array(term_ids, dtype="int64"))
+        self._append("doc_pos", np.array(doc_pos, dtype="int32"))
+        self._append("tfs", np.array(tfs, dtype="float32"))
+        self._append("doc_len", doc_len)
+        self._append("faiss_ids", faiss_ids)
+        self.rows += len(rows)
+
+    def finish(self, snapshot_dir, live, k1=1.2, b=0.75):
+        """
+        Writes the index over the rows where live is True (bool per
+        appended row). Returns (file names, LexicalIndex).
+        """
+        term_ids = self._read("term_ids", "int64")
+        doc_pos = self._read("doc_pos", "int32")
+        tfs = self._read("tfs", "float32")
+
+        keep = live[doc_pos]
+        # Row positions once dropped rows are gone
+        new_pos = (np.cumsum(live) - 1).astype("int32")
+        doc_pos = new_pos[doc_pos[keep]]
+        # Terms only dropped rows used disappear from the vocabulary
+        used, term_ids = np.unique(term_ids[keep], return_inverse=True)
+        terms = list(self._vocab)
+        lexical = LexicalIndex.from_postings(
+            [terms[i] for i in used],
+            term_ids.astype("int64"),
+            doc_pos,
+            tfs[keep],
+            self._read("doc_len", "float32")[live],
+            self._read("faiss_ids", "int64")[live],
+            k1=k1,
+            b=b
+        )
+        return lexical.save(snapshot_dir), lexical
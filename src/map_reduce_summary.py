@@ -0,0 +1,200 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# ===============================
+# CHUNKING
+# ===============================
+# llama3 averages ~1.3 tokens per English word; good enough for budgeting
+TOKENS_PER_WORD = 1.3
+# llama3's context window. Ollama only allocates it when asked for it
+# (options.num_ctx); its default context is much smaller and truncates
+MODEL_CONTEXT_TOKENS = 8192
+# Kept free for the prompt template and the generated summary
+RESERVED_TOKENS = 1024
+
+
+def approx_tokens(text):
+    return int(len(text.split()) * TOKENS_PER_WORD)
+
+
+def single_prompt_budget(context_tokens=MODEL_CONTEXT_TOKENS):
+    """
+    Longest transcript (in tokens) that is summarized in one prompt.
+    """
+    return max(context_tokens - RESERVED_TOKENS, 0)
+
+
+def split_transcript(transcript, max_tokens=1500, overlap_tokens=100):
+    """
+    Splits a transcript into word-aligned chunks of at most max_tokens.
+    Consecutive chunks share overlap_tokens so no sentence is lost at a cut.
+    """
+    words = transcript.split()
+    size = max(int(max_tokens / TOKENS_PER_WORD), 1)
+    overlap = min(int(overlap_tokens / TOKENS_PER_WORD), size - 1)
+
+    chunks = []
+    start = 0
+    while start < len(words):
+        chunks.append(" ".join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+        start += size - overlap
+    return chunks
+
+
+# ===============================
+# PROMPTS
+# ===============================
+def single_prompt(transcript):
+    return f"""
+Summarize the following video transcript in 5–6 concise bullet points.
+
+Transcript:
+{transcript}
+"""
+
+
+def map_prompt(chunk, part, parts):
+    return f"""
+This is part {part} of {parts} of a video transcript.
+Summarize the key points of this part in 3–5 concise bullet points.
+
+Transcript part:
+{chunk}
+"""
+
+
+def reduce_prompt(partials):
+    joined = "\n\n".join(partials)
+    return f"""
+The following are summaries of consecutive parts of one video.
+Combine them into a single summary of 5–6 concise bullet points,
+keeping the order of ideas and dropping repetition.
+
+Part summaries:
+{joined}
+"""
+
+
+# ===============================
+# OLLAMA
+# ===============================
+def ollama_generate(url, model, prompt, timeout=120, session=None, num_ctx=None):
+    """
+    One non-streaming generation. Raises requests.HTTPError on failure.
+    """
+    body = {"model": model, "prompt": prompt, "stream": False}
+    if num_ctx:
+        body["options"] = {"num_ctx": num_ctx}
+    response = (session or requests).post(url, json=body, timeout=timeout)
+    response.raise_for_status()
+    return response.json().get("response", "").strip()
+
+
+# ===============================
+# MAP-REDUCE SUMMARIZER
+# ===============================
+class MapReduceSummarizer:
+    """
+    Hierarchical summarizer for transcripts longer than one prompt.
+
+    Transcripts up to single_prompt_tokens (sized from the model context,
+    see single_prompt_budget) are summarized in one call: below that, one
+    long prompt beats several calls, especially when few can run at once.
+    Longer ones are split into chunks of chunk_tokens.
+
+    Map: chunks are summarized concurrently (at most max_workers calls
+    in flight, so a single local Ollama is not flooded).
+    Reduce: partial summaries are combined; if they do not fit in one
+    prompt they are reduced in groups, level by level.
+
+    generate(prompt) -> text does the model call. With a cache
+    (get_part(key) / put_part(key, text), e.g. SummaryStore) every
+    chunk and reduce result is stored under (stage, prompt hash, model,
+    prompt_version), so a retry or a transcript that only grew at the
+    end reuses the finished parts, and a new prompt_version redoes them.
+    """
+
+    def __init__(self, generate, cache=None, model="", prompt_version=0, max_workers=4,
+                 chunk_tokens=1500, overlap_tokens=100, reduce_fan_in=8, single_prompt_tokens=None):
+        self.generate = generate
+        self.cache = cache
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_workers = max_workers
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.reduce_fan_in = reduce_fan_in
+        self.single_prompt_tokens = (
+            single_prompt_budget() if single_prompt_tokens is None else single_prompt_tokens
+        )
+
+        self.calls = 0
+        self.cache_hits = 0
+
+    def fits_single_prompt(self, text):
+        return approx_tokens(text) <= self.single_prompt_tokens
+
+    def _cache_key(self, stage, prompt):
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        return (stage, digest, self.model, self.prompt_version)
+
+    def _run(self, stage, prompt):
+        key = self._cache_key(stage, prompt)
+        if self.cache is not None:
+            cached = self.cache.get_part(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        self.calls += 1
+        text = self.generate(prompt)
+        if self.cache is not None:
+            self.cache.put_part(key, text)
+        return text
+
+    def _run_all(self, stage, prompts):
+        if len(prompts) == 1:
+            return [self._run(stage, prompts[0])]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(prompts))) as pool:
+            return list(pool.map(lambda p: self._run(stage, p), prompts))
+
+    def final_prompt(self, transcript):
+        """
+        Runs the map step and all but the last reduce step, and returns
+        the prompt that produces the final summary. Lets callers stream
+        the last step.
+        """
+        if self.fits_single_prompt(transcript):
+            return single_prompt(transcript)
+
+        chunks = split_transcript(transcript, self.chunk_tokens, self.overlap_tokens)
+        partials = self._run_all(
+            "map",
+            [map_prompt(chunk, i + 1, len(chunks)) for i, chunk in enumerate(chunks)]
+        )
+
+        # Reduce level by level until the partials fit into one prompt
+        while len(partials) > 1 and (
+            len(partials) > self.reduce_fan_in
+            or not self.fits_single_prompt("\n\n".join(partials))
+        ):
+            groups = [
+                partials[i:i + self.reduce_fan_in]
+                for i in range(0, len(partials), self.reduce_fan_in)
+            ]
+            if len(groups) == len(partials):
+                # Fan-in of 1 would never converge
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            partials = self._run_all("reduce", [reduce_prompt(group) for group in groups])
+
+        return reduce_prompt(partials)
+
+    def summarize(self, transcript):
+        """
+        Full summary of a transcript of any length.
+        """
+        return self._run("final", self.final_prompt(transcript))
@@ -0,0 +1,193 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import faiss
+
+COLUMNS_FILE = "filter_channels.json"
+COLUMN_ARRAYS = ("faiss_ids", "channel_codes", "view_count", "duration", "published_at")
+COLUMN_DTYPES = {
+    "faiss_ids": "int64",
+    "channel_codes": "int32",
+    "view_count": "int64",
+    "duration": "float32",
+    "published_at": "float64",
+}
+
+def to_epoch(value):
+    """
+    Seconds since epoch for an ISO date string or datetime; naive means UTC.
+    """
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return ts.timestamp()
+
+
+def filters_key(filters):
+    """
+    Hashable form of a filters dict, for cache and batcher keys.
+    """
+    if not filters:
+        return None
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in filters.items()
+    ))
+
+
+class MetadataColumns:
+    """
+    Filterable metadata as numpy columns aligned with snapshot rows.
+
+    mask(filters) evaluates predicates with vectorized comparisons;
+    selector(mask) turns the result into a FAISS IDSelectorBitmap over
+    faiss ids so the index only scores rows that pass the filter.
+    """
+
+    def __init__(self, faiss_ids, channel_names, channel_codes, view_count, duration, published_at):
+        self.faiss_ids = faiss_ids
+        self.channel_names = channel_names
+        self.channel_lookup = {name: code for code, name in enumerate(channel_names)}
+        self.channel_codes = channel_codes
+        self.view_count = view_count
+        self.duration = duration
+        self.published_at = published_at
+
+    @classmethod
+    def build(cls, rows):
+        df = pd.DataFrame(rows, columns=["faiss_id", "channel_title", "view_count", "duration", "published_at"])
+
+        faiss_ids = pd.to_numeric(df["faiss_id"], errors="coerce")
+        # Legacy rows have no faiss_id: their vector id is their position
+        faiss_ids = faiss_ids.fillna(pd.Series(np.arange(len(df)), index=df.index)).to_numpy("int64")
+
+        channels = df["channel_title"].fillna("").astype(str).str.strip().str.lower()
+        codes, names = pd.factorize(channels)
+
+        published = pd.to_datetime(df["published_at"], errors="coerce", utc=True)
+        # Missing or unparseable dates become NaN
+        published_at = (published - pd.Timestamp(0, tz="UTC")).dt.total_seconds()
+
+        return cls(
+            faiss_ids,
+            list(names),
+            codes.astype("int32"),
+            pd.to_numeric(df["view_count"], errors="coerce").fillna(0).to_numpy("int64"),
+            pd.to_numeric(df["duration"], errors="coerce").fillna(0).to_numpy("float32"),
+            published_at.to_numpy("float64"),
+        )
+
+    def save(self, snapshot_dir):
+        """
+        Writes the columns next to the index. Returns the file names.
+        """
+        with open(os.path.join(snapshot_dir, COLUMNS_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.channel_names, f)
+        for name in COLUMN_ARRAYS:
+            np.save(os.path.join(snapshot_dir, f"filter_{name}.npy"), getattr(self, name))
+        return [COLUMNS_FILE] + [f"filter_{name}.npy" for name in COLUMN_ARRAYS]
+
+    @classmethod
+    def load(cls, snapshot_dir, mmap=True):
+        """
+        Returns None for snapshots written without saved filter columns.
+        """
+        names_path = os.path.join(snapshot_dir, COLUMNS_FILE)
+        if not os.path.exists(names_path):
+            return None
+        with open(names_path, "r", encoding="utf-8") as f:
+            channel_names = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(snapshot_dir, f"filter_{name}.npy"), mmap_mode=mmap_mode)
+            for name in COLUMN_ARRAYS
+        }
+        return cls(channel_names=channel_names, **arrays)
+
+    def mask(self, filters):
+        """
+        Boolean array over rows, or None when there is nothing to filter.
+        """
+        if not filters:
+            return None
+
+        mask = np.ones(len(self.faiss_ids), dtype=bool)
+
+        if filters.get("channels"):
+            wanted = [
+                self.channel_lookup[name.strip().lower()]
+                for name in filters["channels"]
+                if name.strip().lower() in self.channel_lookup
+            ]
+            mask &= np.isin(self.channel_codes, wanted)
+        if filters.get("min_views") is not None:
+            mask &= self.view_count >= filters["min_views"]
+        if filters.get("max_views") is not None:
+            mask &= self.view_count <= filters["max_views"]
+        if filters.get("min_duration") is not None:
+            mask &= self.duration >= filters["min_duration"]
+        if filters.get("max_duration") is not None:
+            mask &= self.duration <= filters["max_duration"]
+        # Rows without a publish date never match a date filter (NaN compares False)
+        if filters.get("published_after") is not None:
+            mask &= self.published_at >= to_epoch(filters["published_after"])
+        if filters.get("published_before") is not None:
+            mask &= self.published_at <= to_epoch(filters["published_before"])
+
+        return mask
+
+    def id_mask(self, mask):
+        """
+        The row mask re-indexed by faiss id.
+        """
+        size = int(self.faiss_ids.max()) + 1 if len(self.faiss_ids) else 0
+        by_id = np.zeros(size, dtype=bool)
+        by_id[self.faiss_ids[mask]] = True
+        return by_id
+
+    def selector(self, mask):
+        # Bit i of byte i // 8 selects faiss id i
+        return faiss.IDSelectorBitmap(np.packbits(self.id_mask(mask), bitorder="little"))
+
+
+class MetadataColumnsWriter:
+    """
+    Builds filter columns chunk by chunk: each chunk's columns are
+    appended to raw files in spool_dir, with channel codes kept
+    consistent across chunks. finish() writes what save() would.
+    """
+
+    def __init__(self, spool_dir):
+        self.spool_dir = spool_dir
+        self._channels = {}
+
+    def _path(self, name):
+        return os.path.join(self.spool_dir, f"filter_{name}.bin")
+
+    def append(self, rows):
+        columns = MetadataColumns.build(rows)
+        # Chunk-local channel codes -> codes over the whole snapshot
+        codes = np.array(
+            [self._channels.setdefault(name, len(self._channels)) for name in columns.channel_names],
+            dtype="int32"
+        )
+        columns.channel_codes = codes[columns.channel_codes] if len(codes) else columns.channel_codes
+        for name in COLUMN_ARRAYS:
+            with open(self._path(name), "ab") as f:
+                np.asarray(getattr(columns, name), dtype=COLUMN_DTYPES[name]).tofile(f)
+
+    def finish(self, snapshot_dir, live):
+        """
+        Writes the columns of rows where live is True. Returns the file names.
+        """
+        arrays = {
+            name: (
+                np.fromfile(self._path(name), dtype=COLUMN_DTYPES[name])
+                if os.path.exists(self._path(name)) else np.zeros(0, dtype=COLUMN_DTYPES[name])
+            )[live]
+            for name in COLUMN_ARRAYS
+        }
+        return MetadataColumns(channel_names=list(self._channels), **arrays).save(snapshot_dir)
@@ -0,0 +1,269 @@
+import os
+import json
+import numbers
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+SCHEMA_FILE = "metadata_schema.json"
+FILE_PREFIX = "metadata_"
+# Rows per block when copying spooled text columns into place
+COPY_BLOCK_ROWS = 1024
+
+
+def _column_kind(values):
+    if all(isinstance(v, numbers.Integral) and not isinstance(v, bool) for v in values):
+        return "int64"
+    if all(isinstance(v, numbers.Real) and not isinstance(v, bool) for v in values):
+        return "float64"
+    return "str"
+
+
+class MetadataTable:
+    """
+    Snapshot metadata stored column by column: numeric fields as numpy
+    arrays, text fields as one UTF-8 byte array plus row offsets.
+
+    Loaded with np.load(mmap_mode="r"), so every API worker maps the same
+    page-cache pages instead of unpickling a private list of dicts; a row
+    is only decoded when a result needs it. Lookups by faiss id (dense
+    position array) and by video_id (binary search over ids sorted at
+    build time) work on the mapped arrays too.
+
+    Behaves like a read-only sequence of row dicts.
+    """
+
+    def __init__(self, schema, arrays):
+        self.schema = schema
+        self.arrays = arrays
+        self._len = len(arrays["video_order"])
+
+    # ---------------------------
+    # Build / persist
+    # ---------------------------
+    @classmethod
+    def from_rows(cls, rows):
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        schema, arrays = {}, {}
+        for name in names:
+            values = [row.get(name) for row in rows]
+            kind = _column_kind(values)
+            schema[name] = kind
+            if kind != "str":
+                arrays[name] = np.asarray(values, dtype=kind)
+                continue
+            encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+            offsets = np.zeros(len(encoded) + 1, dtype="int64")
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            arrays[f"{name}_offsets"] = offsets
+            arrays[f"{name}_bytes"] = np.frombuffer(b"".join(encoded), dtype="uint8")
+
+        # Legacy rows have no faiss_id: their vector id is their position
+        faiss_ids = [row.get("faiss_id", position) for position, row in enumerate(rows)]
+        size = max(faiss_ids, default=-1) + 1
+        positions = np.full(size, -1, dtype="int64")
+        positions[np.asarray(faiss_ids, dtype="int64")] = np.arange(len(rows))
+        arrays["faiss_positions"] = positions
+
+        video_ids = [str(row.get("video_id", "")) for row in rows]
+        arrays["video_order"] = np.array(
+            sorted(range(len(rows)), key=video_ids.__getitem__), dtype="int64"
+        )
+        return cls(schema, arrays)
+
+    def save(self, snapshot_dir):
+        """
+        Writes one .npy per array plus the schema. Returns the file names.
+        """
+        files = [SCHEMA_FILE]
+        with open(os.path.join(snapshot_dir, SCHEMA_FILE), "w", encoding="utf-8") as f:
+            json.dump({"schema": self.schema, "arrays": list(self.arrays)}, f)
+        for name, array in self.arrays.items():
+            filename = f"{FILE_PREFIX}{name}.npy"
+            np.save(os.path.join(snapshot_dir, filename), array)
+            files.append(filename)
+        return files
+
+    @classmethod
+    def load(cls, snapshot_dir, mmap=True):
+        """
+        Returns None for snapshots written with pickled metadata.
+        """
+        schema_path = os.path.join(snapshot_dir, SCHEMA_FILE)
+        if not os.path.exists(schema_path):
+            return None
+        with open(schema_path, "r", encoding="utf-8") as f:
+            layout = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(snapshot_dir, f"{FILE_PREFIX}{name}.npy"), mmap_mode=mmap_mode)
+            for name in layout["arrays"]
+        }
+        return cls(layout["schema"], arrays)
+
+    # ---------------------------
+    # Reading
+    # ---------------------------
+    def value(self, name, position):
+        if self.schema[name] != "str":
+            return self.arrays[name][position].item()
+        offsets = self.arrays[f"{name}_offsets"]
+        data = self.arrays[f"{name}_bytes"][offsets[position]:offsets[position + 1]]
+        return data.tobytes().decode("utf-8")
+
+    def row(self, position):
+        return {name: self.value(name, position) for name in self.schema}
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, position):
+        if not -self._len <= position < self._len:
+            raise IndexError(position)
+        return self.row(position % self._len)
+
+    def __iter__(self):
+        return (self.row(position) for position in range(self._len))
+
+    def get_by_faiss_id(self, faiss_id):
+        positions = self.arrays["faiss_positions"]
+        if not 0 <= faiss_id < len(positions) or positions[faiss_id] < 0:
+            return None
+        return self.row(int(positions[faiss_id]))
+
+    def position_of(self, video_id):
+        """
+        Row position of video_id, or None.
+        """
+        video_id = str(video_id)
+        order = self.arrays["video_order"]
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if str(self.value("video_id", order[mid])) < video_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and str(self.value("video_id", order[lo])) == video_id:
+            return int(order[lo])
+        return None
+
+    def get_by_video_id(self, video_id):
+        position = self.position_of(video_id)
+        return self.row(position) if position is not None else None
+
+    def max_faiss_id(self):
+        return len(self.arrays["faiss_positions"]) - 1
+
+    def stats(self):
+        return {
+            "rows": self._len,
+            "bytes": int(sum(array.nbytes for array in self.arrays.values())),
+            "mmapped": any(isinstance(array, np.memmap) for array in self.arrays.values()),
+        }
+
+
+class MetadataTableWriter:
+    """
+    Builds a MetadataTable's files chunk by chunk: every column is
+    appended to a raw file in spool_dir as rows arrive, and finish()
+    writes the same layout as MetadataTable.save(), copying text columns
+    block by block so no column is ever held in memory whole.
+
+    A column's kind is fixed by the first chunk that has it; rows
+    without the column get "" / 0.
+    """
+
+    def __init__(self, spool_dir):
+        self.spool_dir = spool_dir
+        self.schema = {}
+        self.rows = 0
+
+    def _path(self, name, part):
+        return os.path.join(self.spool_dir, f"{FILE_PREFIX}{name}.{part}")
+
+    def _append_column(self, name, values):
+        kind = self.schema[name]
+        if kind != "str":
+            with open(self._path(name, "bin"), "ab") as f:
+                np.asarray([0 if v is None else v for v in values], dtype=kind).tofile(f)
+            return
+        encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+        with open(self._path(name, "len"), "ab") as f:
+            np.fromiter(map(len, encoded), dtype="int64", count=len(encoded)).tofile(f)
+        with open(self._path(name, "bytes"), "ab") as f:
+            f.write(b"".join(encoded))
+
+    def append(self, rows):
+        for name in dict.fromkeys(name for row in rows for name in row):
+            if name not in self.schema:
+                self.schema[name] = _column_kind([row[name] for row in rows if name in row])
+                # Rows appended before this column showed up
+                self._append_column(name, [None] * self.rows)
+        for name in self.schema:
+            self._append_column(name, [row.get(name) for row in rows])
+        self.rows += len(rows)
+
+    def _copy_text(self, name, live, snapshot_dir):
+        lengths = np.fromfile(self._path(name, "len"), dtype="int64")
+        starts = np.zeros(len(lengths) + 1, dtype="int64")
+        np.cumsum(lengths, out=starts[1:])
+        offsets = np.zeros(int(live.sum()) + 1, dtype="int64")
+        np.cumsum(lengths[live], out=offsets[1:])
+        np.save(os.path.join(snapshot_dir, f"{FILE_PREFIX}{name}_offsets.npy"), offsets)
+
+        out_path = os.path.join(snapshot_dir, f"{FILE_PREFIX}{name}_bytes.npy")
+        if offsets[-1] == 0:
+            np.save(out_path, np.zeros(0, dtype="uint8"))
+            return
+        data = np.memmap(self._path(name, "bytes"), dtype="uint8", mode="r")
+        out = open_memmap(out_path, mode="w+", dtype="uint8", shape=(int(offsets[-1]),))
+        written = 0
+        for start in range(0, len(lengths), COPY_BLOCK_ROWS):
+            stop = min(start + COPY_BLOCK_ROWS, len(lengths))
+            block = data[starts[start]:starts[stop]]
+            if not live[start:stop].all():
+                block = block[np.repeat(live[start:stop], lengths[start:stop])]
+            out[written:written + len(block)] = block
+            written += len(block)
+        out.flush()
+        del out, data
+
+    def finish(self, snapshot_dir, live):
+        """
+        Writes the table over the rows where live is True (bool per
+        appended row). Returns the file names, like MetadataTable.save().
+        """
+        arrays = []
+        for name, kind in self.schema.items():
+            if kind == "str":
+                self._copy_text(name, live, snapshot_dir)
+                arrays += [f"{name}_offsets", f"{name}_bytes"]
+            else:
+                values = np.fromfile(self._path(name, "bin"), dtype=kind)[live]
+                np.save(os.path.join(snapshot_dir, f"{FILE_PREFIX}{name}.npy"), values)
+                arrays.append(name)
+
+        n = int(live.sum())
+        if self.schema.get("faiss_id") == "int64":
+            faiss_ids = np.load(os.path.join(snapshot_dir, f"{FILE_PREFIX}faiss_id.npy"))
+        else:
+            faiss_ids = np.arange(n, dtype="int64")
+        positions = np.full(int(faiss_ids.max()) + 1 if n else 0, -1, dtype="int64")
+        positions[faiss_ids] = np.arange(n)
+        np.save(os.path.join(snapshot_dir, f"{FILE_PREFIX}faiss_positions.npy"), positions)
+
+        order = np.arange(n, dtype="int64")
+        if self.schema.get("video_id") == "str" and n:
+            # UTF-8 byte order is code point order, the same as sorting the str ids
+            offsets = np.load(os.path.join(snapshot_dir, f"{FILE_PREFIX}video_id_offsets.npy"))
+            data = np.load(os.path.join(snapshot_dir, f"{FILE_PREFIX}video_id_bytes.npy"), mmap_mode="r")
+            video_ids = np.array([data[offsets[i]:offsets[i + 1]].tobytes() for i in range(n)], dtype="S")
+            order = np.argsort(video_ids, kind="stable").astype("int64")
+        np.save(os.path.join(snapshot_dir, f"{FILE_PREFIX}video_order.npy"), order)
+        arrays += ["faiss_positions", "video_order"]
+
+        with open(os.path.join(snapshot_dir, SCHEMA_FILE), "w", encoding="utf-8") as f:
+            json.dump({"schema": self.schema, "arrays": arrays}, f)
+        return [SCHEMA_FILE] + [f"{FILE_PREFIX}{name}.npy" for name in arrays]
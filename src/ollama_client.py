@@ -0,0 +1,223 @@
+import json
+import time
+import asyncio
+import threading
+from collections import deque
+
+import httpx
+
+
+class OllamaError(Exception):
+    pass
+
+
+class OllamaOverloaded(OllamaError):
+    """
+    Raised instead of queueing forever. status_code is 429 when the wait
+    queue is full and 503 when the queue deadline passed.
+    """
+
+    def __init__(self, status_code, message, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# run_coroutine_threadsafe only accepts real coroutines
+async def _anext(agen):
+    return await agen.__anext__()
+
+
+async def _aclose(agen):
+    await agen.aclose()
+
+
+class OllamaPool:
+    """
+    Shared Ollama client with keep-alive connections and admission control.
+
+    At most max_concurrency generations run at once; up to max_queue more
+    wait for a slot, each for at most queue_timeout seconds. Anything
+    beyond that fails fast with OllamaOverloaded so a burst of clicks
+    cannot pile up behind a single local model server.
+
+    num_ctx, when set, is sent as Ollama's context size option, so long
+    prompts are not truncated to the server default.
+
+    The client lives on its own event loop thread, so sync callers
+    (threadpool endpoints, map-reduce workers, background jobs) and async
+    callers on the app loop share one connection pool and one queue.
+    """
+
+    def __init__(self, url, model, max_concurrency=2, max_queue=16,
+                 queue_timeout=30.0, timeout=120.0, num_ctx=None):
+        self.url = url
+        self.model = model
+        self.num_ctx = num_ctx
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._waits = deque(maxlen=1000)
+
+        self._loop = None
+        self._client = None
+        self._slots = None
+        self._start_lock = threading.Lock()
+
+    # ---------------------------
+    # Event loop
+    # ---------------------------
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._slots = asyncio.Semaphore(self.max_concurrency)
+                self._client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(self.timeout, connect=5),
+                    limits=httpx.Limits(
+                        max_connections=self.max_concurrency,
+                        max_keepalive_connections=self.max_concurrency
+                    )
+                )
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name="ollama-pool", daemon=True).start()
+            ready.wait()
+            self._loop = loop
+
+    def _submit(self, coro):
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    # ---------------------------
+    # Admission control
+    # ---------------------------
+    def is_full(self):
+        return self.in_flight >= self.max_concurrency and self.queued >= self.max_queue
+
+    async def _acquire(self):
+        if not self._slots.locked():
+            # A slot is free: take it without counting as queued
+            await self._slots.acquire()
+            self.in_flight += 1
+            self._waits.append(0.0)
+            return
+
+        if self.queued >= self.max_queue:
+            self.rejected_full += 1
+            raise OllamaOverloaded(429, "Summarizer is busy, too many requests queued", self.queue_timeout)
+
+        self.queued += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise OllamaOverloaded(503, "Timed out waiting for a free summarizer slot", self.queue_timeout)
+        finally:
+            self.queued -= 1
+            self._waits.append(time.perf_counter() - started)
+        self.in_flight += 1
+
+    def _release(self):
+        self.in_flight -= 1
+        self.completed += 1
+        self._slots.release()
+
+    # ---------------------------
+    # Generation (runs on the pool loop)
+    # ---------------------------
+    def _body(self, prompt, stream):
+        body = {"model": self.model, "prompt": prompt, "stream": stream}
+        if self.num_ctx:
+            body["options"] = {"num_ctx": self.num_ctx}
+        return body
+
+    async def _generate(self, prompt):
+        await self._acquire()
+        try:
+            response = await self._client.post(
+                self.url,
+                json=self._body(prompt, stream=False)
+            )
+            if response.status_code != 200:
+                raise OllamaError("Failed to generate summary from Ollama")
+            return response.json().get("response", "").strip()
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama request failed: {e}") from e
+        finally:
+            self._release()
+
+    async def _stream(self, prompt):
+        await self._acquire()
+        try:
+            async with self._client.stream(
+                "POST",
+                self.url,
+                json=self._body(prompt, stream=True)
+            ) as response:
+                if response.status_code != 200:
+                    raise OllamaError("Failed to generate summary from Ollama")
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama request failed: {e}") from e
+        finally:
+            self._release()
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def generate_sync(self, prompt):
+        """
+        Blocking generation for threads. Raises OllamaError / OllamaOverloaded.
+        """
+        return self._submit(self._generate(prompt)).result()
+
+    async def generate(self, prompt):
+        return await asyncio.wrap_future(self._submit(self._generate(prompt)))
+
+    async def stream(self, prompt):
+        """
+        Yields Ollama's NDJSON chunks. The slot is held until the stream
+        ends; closing this generator closes the upstream request.
+        """
+        upstream = self._stream(prompt)
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wrap_future(self._submit(_anext(upstream)))
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            self._submit(_aclose(upstream))
+
+    def stats(self):
+        waits = sorted(self._waits)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_queue_timeout": self.rejected_timeout,
+            "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+            "wait_ms_p99": round(waits[int(len(waits) * 0.99)] * 1000, 1) if waits else 0.0,
+        }
@@ -0,0 +1,46 @@
+import os
+
+
+def _smaps_rollup(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            parts = value.split()
+            if len(parts) == 2 and parts[1] == "kB":
+                fields[name] = int(parts[0]) * 1024
+    return {
+        "rss_bytes": fields.get("Rss", 0),
+        "pss_bytes": fields.get("Pss", 0),
+        "shared_bytes": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def memory_usage(pid=None):
+    """
+    Resident memory of a process (default: this one), split into pages
+    shared with other processes (mmapped index and metadata, copy-on-write
+    pages from a preloading parent) and pages private to it.
+
+    PSS charges each shared page 1/N to each of the N processes mapping
+    it, so summing pss_bytes over workers gives their real total.
+    Reads /proc on Linux, else uses psutil if installed (no PSS there).
+    """
+    pid = pid or os.getpid()
+    if os.path.exists(f"/proc/{pid}/smaps_rollup"):
+        return dict(_smaps_rollup(pid), pid=pid)
+
+    try:
+        import psutil
+    except ImportError:
+        return {"pid": pid, "error": "install psutil for memory stats on this platform"}
+
+    info = psutil.Process(pid).memory_full_info()
+    return {
+        "pid": pid,
+        "rss_bytes": info.rss,
+        "pss_bytes": getattr(info, "pss", None),
+        "shared_bytes": info.rss - info.uss,
+        "private_bytes": info.uss,
+    }
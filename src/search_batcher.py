@@ -0,0 +1,100 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class SearchBatcher:
+    """
+    Dynamic micro-batching for concurrent /search calls.
+
+    Requests arriving within max_wait_ms of the first queued request (or
+    until max_batch_size requests are waiting) are handed to run_batch
+    together, so the encoder and FAISS each run once per batch.
+
+    run_batch(queries, top_k, key) must return (distances, indices)
+    with one row per query. key groups requests that can share a search
+    call (e.g. the same nprobe/efSearch overrides).
+    """
+
+    def __init__(self, run_batch, max_batch_size=32, max_wait_ms=3.0):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.batches = 0
+        self.requests = 0
+        self.largest_batch = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._loop, name="search-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def submit(self, query, top_k, key=None):
+        """
+        Queues one query; the returned Future resolves to
+        (distances_row, indices_row).
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((query, top_k, key, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+
+            self.batches += 1
+            self.requests += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[2], []).append(item)
+
+            for key, items in groups.items():
+                try:
+                    top_k = max(item[1] for item in items)
+                    distances, indices = self.run_batch(
+                        [item[0] for item in items], top_k, key
+                    )
+                    for row, item in enumerate(items):
+                        item[3].set_result((distances[row], indices[row]))
+                except Exception as e:
+                    for item in items:
+                        if not item[3].done():
+                            item[3].set_exception(e)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queue_depth": self._queue.qsize(),
+        }
@@ -1,7 +1,8 @@
 import faiss
 import pickle
+import os
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from encoders import load_encoder
 
 # Load index
 index = faiss.read_index("vector.index")
@@ -11,7 +12,7 @@ with open("metadata.pkl", "rb") as f:
     metadata = pickle.load(f)
 
 # Load model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+model = load_encoder("all-MiniLM-L6-v2", os.getenv("ENCODER_BACKEND", "torch"))
 
 # Accept user query
 query = input("\nEnter your search query: ")
@@ -0,0 +1,62 @@
+"""
+Serves the API from several worker processes forked from one parent.
+
+The parent imports src.api before forking. With STARTUP_MODE=preload
+that import loads the encoder and the index once, and the forked workers
+share those pages copy-on-write instead of each loading its own copy;
+every worker then only runs the warm-up phase. All workers accept
+connections on one socket bound by the parent.
+
+Run from the repo root (POSIX only, os.fork):
+    STARTUP_MODE=preload python -m src.serve --workers 4 --port 8000
+
+The same with gunicorn:
+    STARTUP_MODE=preload gunicorn src.api:app -k uvicorn.workers.UvicornWorker -w 4 --preload
+"""
+import os
+import signal
+import argparse
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    from src import api
+
+    config = uvicorn.Config(api.app, host=args.host, port=args.port)
+    sock = config.bind_socket()
+    print(f"🚀 Forking {args.workers} workers (startup mode: {api.STARTUP_MODE}, parent pid {os.getpid()})")
+
+    workers = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            uvicorn.Server(config).run(sockets=[sock])
+            os._exit(0)
+        workers.append(pid)
+
+    def stop(signum, frame):
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        pid, _ = os.wait()
+        if pid in workers:
+            workers.remove(pid)
+    print("🛑 All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
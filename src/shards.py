@@ -0,0 +1,275 @@
+import os
+import time
+import zlib
+import heapq
+import threading
+import multiprocessing
+from collections import deque
+from multiprocessing import util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import faiss
+
+from src.index_factory import LOSSY_TYPES, build_index, extract_vectors, filtered_search_plan, search_params
+from src.snapshot_store import SnapshotStore
+
+# Latency samples kept per shard for /stats percentiles
+TIMING_WINDOW = 1000
+
+
+def shard_of(video_id, n_shards):
+    """
+    Shard number of a video. crc32 rather than hash(): it must be the same
+    in every process (str hashes are salted per interpreter).
+    """
+    return zlib.crc32(str(video_id).encode("utf-8")) % n_shards
+
+
+# ===============================
+# SHARD WORKER PROCESS
+# ===============================
+# Each shard process holds one partition of one snapshot
+_store = None
+_shard = None
+_n_shards = None
+_rerank_factor = None
+_loaded = None   # (snapshot name, Snapshot, shard index, shard faiss ids)
+
+
+def _init_shard(root, dim, shard, n_shards, threads, rerank_factor):
+    global _store, _shard, _n_shards, _rerank_factor
+    # Shards split the cores instead of each running a full OpenMP team
+    faiss.omp_set_num_threads(threads)
+    _store = SnapshotStore(root, dim, mmap=True)
+    _shard = shard
+    _n_shards = n_shards
+    _rerank_factor = rerank_factor
+
+
+def _partition(snapshot):
+    """
+    (ids, vectors) of the snapshot rows whose video_id hashes to this shard.
+    """
+    rows = snapshot.rows
+    mine = np.fromiter(
+        (shard_of(rows.value("video_id", p), _n_shards) == _shard for p in range(len(rows))),
+        dtype=bool,
+        count=len(rows)
+    )
+    wanted = np.asarray(snapshot.columns.faiss_ids)[mine]
+
+    if snapshot.vectors is not None:
+        ids, vectors = snapshot.vectors.ids, snapshot.vectors.vectors
+    else:
+        ids, vectors = extract_vectors(snapshot.index)
+    keep = np.isin(ids, wanted)
+    return np.asarray(ids)[keep], np.asarray(vectors[keep], dtype="float32")
+
+
+def _load_shard(name):
+    """
+    Builds this shard's index from snapshot `name` (once per snapshot).
+    Returns the number of vectors in the shard.
+    """
+    global _loaded
+    if _loaded is None or _loaded[0] != name:
+        snapshot = _store.open_version(name)
+        ids, vectors = _partition(snapshot)
+        config = snapshot.config
+        # nlist is left to default_nlist(), sized for the shard not the corpus
+        index, _ = build_index(
+            config.get("requested_type") or config["index_type"],
+            snapshot.index.d,
+            vectors,
+            ids,
+            **{k: config.get(k) for k in ("nprobe", "ef_search", "hnsw_m", "pq_m", "pq_bits")}
+        )
+        _loaded = (name, snapshot, index, np.sort(ids))
+    return _loaded[2].ntotal
+
+
+def _search_shard(name, queries, k, nprobe, ef_search, filters):
+    """
+    Top-k of this shard. Returns (scores, ids, search_ms).
+    """
+    _load_shard(name)
+    _, snapshot, index, shard_ids = _loaded
+    started = time.perf_counter()
+
+    sel = None
+    if filters:
+        mask = snapshot.columns.mask(filters)
+        wanted = np.asarray(snapshot.columns.faiss_ids)[mask]
+        wanted = wanted[np.isin(wanted, shard_ids, assume_unique=True)]
+        exact, nprobe, ef_search = filtered_search_plan(index, len(wanted), nprobe, ef_search)
+        if exact and snapshot.vectors is not None:
+            scores, ids = snapshot.vectors.search_subset(queries, wanted, k)
+            return scores, ids, (time.perf_counter() - started) * 1000.0
+        # The bitmap is over global faiss ids, so it applies to any shard
+        sel = snapshot.columns.selector(mask)
+    params = search_params(index, nprobe=nprobe, ef_search=ef_search, sel=sel)
+
+    rerank = (
+        _rerank_factor > 1
+        and snapshot.vectors is not None
+        and snapshot.config.get("index_type") in LOSSY_TYPES
+    )
+    if rerank:
+        # Exact scores, so they compare with the other shards' scores
+        _, candidates = index.search(queries, k * _rerank_factor, params=params)
+        scores, ids = snapshot.vectors.rerank(queries, candidates, k)
+    else:
+        scores, ids = index.search(queries, k, params=params)
+    return scores, ids, (time.perf_counter() - started) * 1000.0
+
+
+# ===============================
+# MERGE
+# ===============================
+def merge_topk(results, k):
+    """
+    Merges per-shard (scores, ids) pairs, each sorted best first, into one
+    (scores, ids) top-k per query with a k-way heap merge. Padded with
+    -inf / -1 like index.search.
+    """
+    nq = results[0][0].shape[0]
+    scores = np.full((nq, k), -np.inf, dtype="float32")
+    ids = np.full((nq, k), -1, dtype="int64")
+
+    for q in range(nq):
+        streams = [
+            ((float(s), int(i)) for s, i in zip(shard_scores[q], shard_ids[q]) if i != -1)
+            for shard_scores, shard_ids in results
+        ]
+        merged = heapq.merge(*streams, key=lambda hit: -hit[0])
+        for rank, (score, faiss_id) in zip(range(k), merged):
+            scores[q, rank] = score
+            ids[q, rank] = faiss_id
+    return scores, ids
+
+
+class ShardedSearcher:
+    """
+    Scatter-gather search over n_shards local shard processes.
+
+    Every shard process opens the same snapshot (index and metadata
+    mmapped from the snapshot directory) and builds an index over the
+    rows whose video_id hashes to it. search() sends the query batch to
+    all shards in parallel, each returns its own top-k, and the lists
+    are merged with a heap. Scores are inner products (exact after
+    re-ranking for quantized types), so they compare across shards.
+
+    Shards load a new snapshot the first time they are asked for it;
+    load() does that ahead of the first search.
+    """
+
+    def __init__(self, root, dim, n_shards, rerank_factor=1, threads=None):
+        self.root = os.path.abspath(root)
+        self.dim = dim
+        self.n_shards = n_shards
+        self.rerank_factor = rerank_factor
+        self.threads = threads or max(1, (os.cpu_count() or 1) // n_shards)
+
+        self._pools = None
+        self._finalizer = None
+        self._start_lock = threading.Lock()
+        self.vectors = [None] * n_shards
+        self.searches = 0
+        self._search_ms = [deque(maxlen=TIMING_WINDOW) for _ in range(n_shards)]
+        self._rtt_ms = [deque(maxlen=TIMING_WINDOW) for _ in range(n_shards)]
+        self._merge_ms = deque(maxlen=TIMING_WINDOW)
+
+    def _ensure_started(self):
+        # Started on first use, so a preloading parent forks no shard pools
+        with self._start_lock:
+            if self._pools is None:
+                self._start()
+        return self._pools
+
+    def _start(self):
+        context = multiprocessing.get_context("spawn")
+        pools = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_init_shard,
+                initargs=(self.root, self.dim, shard, self.n_shards, self.threads, self.rerank_factor)
+            )
+            for shard in range(self.n_shards)
+        ]
+        # Shut down before multiprocessing's exit hooks join the children
+        self._finalizer = util.Finalize(self, _shutdown, args=(pools,), exitpriority=100)
+        self._pools = pools
+
+    def load(self, name):
+        """
+        Builds every shard's index for snapshot `name` in parallel.
+        """
+        futures = [pool.submit(_load_shard, name) for pool in self._ensure_started()]
+        self.vectors = [future.result() for future in futures]
+        return self.vectors
+
+    def search(self, name, queries, k, nprobe=None, ef_search=None, filters=None):
+        """
+        (scores, ids) shaped (len(queries), k), like index.search.
+        filters is a filters dict (or its filters_key() tuple).
+        """
+        filters = dict(filters) if filters else None
+        started = time.perf_counter()
+        futures = {
+            pool.submit(_search_shard, name, queries, k, nprobe, ef_search, filters): shard
+            for shard, pool in enumerate(self._ensure_started())
+        }
+
+        results = [None] * self.n_shards
+        for future in as_completed(futures):
+            shard = futures[future]
+            scores, ids, search_ms = future.result()
+            self._search_ms[shard].append(search_ms)
+            self._rtt_ms[shard].append((time.perf_counter() - started) * 1000.0)
+            results[shard] = (scores, ids)
+
+        merge_started = time.perf_counter()
+        merged = merge_topk(results, k)
+        self._merge_ms.append((time.perf_counter() - merge_started) * 1000.0)
+        self.searches += 1
+        return merged
+
+    def close(self):
+        if self._pools is not None:
+            self._finalizer()
+            self._pools = None
+
+    def stats(self):
+        return {
+            "shards": self.n_shards,
+            "threads_per_shard": self.threads,
+            "searches": self.searches,
+            "merge_ms": _percentiles(self._merge_ms),
+            "per_shard": [
+                {
+                    "shard": shard,
+                    "vectors": self.vectors[shard],
+                    # Time inside the shard vs. until its answer was read here
+                    "search_ms": _percentiles(self._search_ms[shard]),
+                    "round_trip_ms": _percentiles(self._rtt_ms[shard]),
+                }
+                for shard in range(self.n_shards)
+            ],
+        }
+
+
+def _shutdown(pools):
+    for pool in pools:
+        pool.shutdown()
+
+
+def _percentiles(samples):
+    if not samples:
+        return None
+    ms = np.array(samples)
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+    }
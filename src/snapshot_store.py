@@ -0,0 +1,429 @@
+import os
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import threading
+import numpy as np
+import faiss
+
+from src.index_factory import apply_search_defaults, read_index_config
+from src.lexical_index import LexicalIndex, LexicalIndexWriter
+from src.metadata_columns import MetadataColumns, MetadataColumnsWriter
+from src.metadata_table import MetadataTable, MetadataTableWriter
+from src.vector_store import VectorStore
+
+# ===============================
+# ON-DISK LAYOUT
+# ===============================
+# snapshots/
+#   CURRENT              -> name of the live snapshot, e.g. "v000012"
+#   v000012/
+#     vector.index
+#     metadata_*.npy     -> columnar metadata, mmapped by every worker (see metadata_table.py)
+#     filter_*.npy/.json -> numeric filter columns (see metadata_columns.py)
+#     metadata.pkl       -> pickled rows, only in snapshots written before the columnar files
+#     lexical_*.npy/.txt -> BM25 inverted index (see lexical_index.py)
+#     vectors.npy        -> float32 vectors for exact re-ranking / filtered search (not for flat)
+#     manifest.json      -> rows, vectors, model, dim, index config, checksums
+#   .staging-<job_id>/   -> a snapshot being written by an ingest job
+#     .spool/            -> append-only per-chunk files, see SnapshotBuilder
+INDEX_FILE = "vector.index"
+METADATA_FILE = "metadata.pkl"
+MANIFEST_FILE = "manifest.json"
+POINTER_FILE = "CURRENT"
+SPOOL_DIR = ".spool"
+
+# Zero-copy mmap of flat codes where FAISS supports it, else IVF lists only
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def _fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    # Directories cannot be opened for fsync on Windows
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def file_checksum(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_snapshot(snapshot_dir, index, rows, config, model_name, dim, encoder_backend=None,
+                   lexical=None, vector_store=None, builder=None):
+    """
+    Writes index, columnar metadata, filter columns, the optional lexical
+    index and vector store and the manifest into snapshot_dir.
+    With a SnapshotBuilder, rows is ignored: metadata, filter columns and
+    the lexical index come from the builder's spooled chunks.
+    Every file is fsynced; the manifest is written last, so a directory
+    with a manifest is complete.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    index_path = os.path.join(snapshot_dir, INDEX_FILE)
+    faiss.write_index(index, index_path)
+    _fsync_file(index_path)
+
+    checksums = {INDEX_FILE: file_checksum(index_path)}
+    if builder is not None:
+        extra_files, row_count, lexical = builder.finish()
+    else:
+        extra_files = MetadataTable.from_rows(rows).save(snapshot_dir)
+        extra_files += MetadataColumns.build(rows).save(snapshot_dir)
+        row_count = len(rows)
+        if lexical is not None:
+            extra_files += lexical.save(snapshot_dir)
+    if vector_store is not None:
+        extra_files += vector_store.save(snapshot_dir)
+    for filename in extra_files:
+        path = os.path.join(snapshot_dir, filename)
+        _fsync_file(path)
+        checksums[filename] = file_checksum(path)
+
+    manifest = {
+        "created_at": time.time(),
+        "rows": row_count,
+        "vectors": index.ntotal,
+        "embedding_model": model_name,
+        "encoder_backend": encoder_backend,
+        "dim": dim,
+        "index": config,
+        "lexical": lexical.stats() if lexical is not None else None,
+        "vector_store": vector_store.stats() if vector_store is not None else None,
+        "checksums": checksums,
+    }
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+
+    _fsync_dir(snapshot_dir)
+    return manifest
+
+
+class SnapshotBuilder:
+    """
+    The metadata, filter columns and BM25 postings of a snapshot being
+    written by an ingest job, appended chunk by chunk to files in
+    snapshot_dir/.spool, so memory does not grow with the corpus.
+
+    A row replaced by a later chunk is dropped by position; finish()
+    (called by write_snapshot) writes the live rows in their final
+    layout and deletes the spool.
+    """
+
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+        self.spool_dir = os.path.join(snapshot_dir, SPOOL_DIR)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.table = MetadataTableWriter(self.spool_dir)
+        self.columns = MetadataColumnsWriter(self.spool_dir)
+        self.lexical = LexicalIndexWriter(self.spool_dir)
+        self.rows = 0
+        self._dropped = set()
+
+    def append(self, rows):
+        """
+        Spools rows; returns the position of the first one.
+        """
+        first = self.rows
+        if rows:
+            self.table.append(rows)
+            self.columns.append(rows)
+            self.lexical.append(rows)
+            self.rows += len(rows)
+        return first
+
+    def drop(self, position):
+        self._dropped.add(position)
+
+    def __len__(self):
+        return self.rows - len(self._dropped)
+
+    def finish(self):
+        """
+        Returns (file names, row count, LexicalIndex).
+        """
+        live = np.ones(self.rows, dtype=bool)
+        live[list(self._dropped)] = False
+        files = self.table.finish(self.snapshot_dir, live)
+        files += self.columns.finish(self.snapshot_dir, live)
+        lexical_files, lexical = self.lexical.finish(self.snapshot_dir, live)
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        return files + lexical_files, int(live.sum()), lexical
+
+    def discard(self):
+        shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+
+
+class Snapshot:
+    """
+    A FAISS index and the metadata written with it.
+    Readers grab one Snapshot and use it for the whole request, so the
+    index and metadata they see always belong together.
+
+    rows is a MetadataTable (a read-only sequence of row dicts), or None
+    when nothing has been ingested yet.
+    """
+
+    def __init__(self, index, config, rows, version, name=None, manifest=None, lexical=None,
+                 vectors=None, columns=None):
+        self.index = index
+        self.config = config
+        self.rows = rows
+        self.version = version
+        self.name = name
+        self.manifest = manifest
+        self.lexical = lexical
+        self.vectors = vectors
+        # Numpy columns for filtered search, aligned with rows
+        self.columns = columns if columns is not None else MetadataColumns.build(list(rows or []))
+
+    def get(self, video_id):
+        """
+        Lookup of a metadata row by video_id (binary search, no dict).
+        """
+        return self.rows.get_by_video_id(video_id) if self.rows is not None else None
+
+    def get_by_faiss_id(self, faiss_id):
+        """
+        Maps an id returned by index.search back to its metadata row.
+        """
+        return self.rows.get_by_faiss_id(int(faiss_id)) if self.rows is not None else None
+
+
+class SnapshotStore:
+    """
+    Versioned index + metadata snapshots under root, selected by the
+    CURRENT pointer file.
+
+    The live snapshot is loaded once (index and columnar metadata via
+    mmap, so several API workers share page-cache memory) and only
+    reloaded when CURRENT changes: CURRENT is the version file shared by
+    all workers, and each one stats it on current(). publish() renames a fully written staging directory
+    into place, flips CURRENT atomically and swaps the in-memory snapshot
+    in one assignment. Old snapshots are garbage-collected.
+
+    Before the first snapshot exists, the legacy vector.index /
+    metadata.pkl pair (e.g. from store_vectors.py) is served instead.
+
+    writable=True (ingest jobs) reads the index and vector store into
+    memory so they can be modified; metadata stays mmapped.
+    """
+
+    def __init__(self, root, dim, legacy_index_path=None, legacy_metadata_path=None,
+                 mmap=True, keep=3, verify=False, writable=False):
+        # The current snapshot always stays, so fewer than one makes no sense
+        if keep < 1:
+            raise ValueError(f"keep must be at least 1, got {keep}")
+        self.root = root
+        self.dim = dim
+        self.legacy_index_path = legacy_index_path
+        self.legacy_metadata_path = legacy_metadata_path
+        self.mmap = mmap
+        self.writable = writable
+        self.keep = keep
+        self.verify = verify
+
+        self.pointer_path = os.path.join(root, POINTER_FILE)
+
+        self._snapshot = None
+        self._signature = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # Reading
+    # ---------------------------
+    def _disk_signature(self):
+        paths = [self.pointer_path]
+        if not os.path.exists(self.pointer_path):
+            paths += [self.legacy_index_path, self.legacy_metadata_path]
+
+        signature = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except (FileNotFoundError, TypeError):
+                signature.append(None)
+        return tuple(signature)
+
+    def current_name(self):
+        try:
+            with open(self.pointer_path, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _read_index(self, path):
+        if self.mmap and not self.writable:
+            return faiss.read_index(path, MMAP_FLAGS)
+        return faiss.read_index(path)
+
+    def _empty(self):
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        config = {"index_type": "flat", "requested_type": "flat"}
+        return Snapshot(index, config, None, self._version)
+
+    def _load_dir(self, name):
+        snapshot_dir = os.path.join(self.root, name)
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        index_path = os.path.join(snapshot_dir, INDEX_FILE)
+
+        if self.verify:
+            for filename, checksum in manifest["checksums"].items():
+                path = os.path.join(snapshot_dir, filename)
+                if file_checksum(path) != checksum:
+                    raise IOError(f"Checksum mismatch for {path}")
+
+        index = self._read_index(index_path)
+        rows = MetadataTable.load(snapshot_dir, mmap=self.mmap)
+        columns = MetadataColumns.load(snapshot_dir, mmap=self.mmap)
+        lexical = LexicalIndex.load(snapshot_dir, mmap=self.mmap)
+
+        if rows is None:
+            # Snapshots from before columnar metadata (and lexical search)
+            with open(os.path.join(snapshot_dir, METADATA_FILE), "rb") as f:
+                legacy_rows = pickle.load(f)
+            rows = MetadataTable.from_rows(legacy_rows)
+            columns = MetadataColumns.build(legacy_rows)
+            lexical = lexical or LexicalIndex.build(legacy_rows)
+
+        config = manifest["index"]
+        apply_search_defaults(index, config)
+        vectors = VectorStore.load(snapshot_dir, mmap=self.mmap and not self.writable)
+        return Snapshot(
+            index, config, rows, self._version,
+            name=name, manifest=manifest, lexical=lexical, vectors=vectors, columns=columns
+        )
+
+    def open_version(self, name):
+        """
+        Loads snapshot `name` regardless of CURRENT (e.g. in shard processes,
+        which must all serve the version the API process is searching).
+        """
+        return self._load_dir(name)
+
+    def _load_legacy(self):
+        if not self.legacy_metadata_path or not os.path.exists(self.legacy_metadata_path):
+            return self._empty()
+
+        with open(self.legacy_metadata_path, "rb") as f:
+            rows = pickle.load(f)
+
+        if os.path.exists(self.legacy_index_path):
+            index = self._read_index(self.legacy_index_path)
+        else:
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        config = read_index_config(self.legacy_index_path)
+        apply_search_defaults(index, config)
+        return Snapshot(
+            index, config, MetadataTable.from_rows(rows), self._version,
+            name="legacy", lexical=LexicalIndex.build(rows), columns=MetadataColumns.build(rows)
+        )
+
+    def _load(self):
+        self._version += 1
+        name = self.current_name()
+        if name is None:
+            return self._load_legacy()
+        return self._load_dir(name)
+
+    def current(self):
+        """
+        Returns the current Snapshot, reloading only if CURRENT changed.
+        Snapshot.rows is None when nothing has been ingested yet.
+        """
+        signature = self._disk_signature()
+        if signature != self._signature or self._snapshot is None:
+            with self._lock:
+                signature = self._disk_signature()
+                if signature != self._signature or self._snapshot is None:
+                    self._snapshot = self._load()
+                    self._signature = signature
+        return self._snapshot
+
+    # ---------------------------
+    # Writing
+    # ---------------------------
+    def staging_dir(self, tag):
+        return os.path.join(self.root, f".staging-{tag}")
+
+    def _next_name(self):
+        versions = [
+            int(name[1:]) for name in os.listdir(self.root)
+            if name.startswith("v") and name[1:].isdigit()
+        ]
+        return f"v{max(versions, default=0) + 1:06d}"
+
+    def publish(self, staging_dir):
+        """
+        Renames a complete staging directory to the next version, points
+        CURRENT at it (temp file + fsync + rename) and swaps it in memory.
+        Searches keep using the old snapshot until the new one is loaded.
+        """
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            name = self._next_name()
+            os.rename(staging_dir, os.path.join(self.root, name))
+            _fsync_dir(self.root)
+
+            tmp = self.pointer_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(name)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.pointer_path)
+            _fsync_dir(self.root)
+
+            self._version += 1
+            snapshot = self._load_dir(name)
+            self._signature = self._disk_signature()
+            self._snapshot = snapshot
+
+        self.gc()
+        return snapshot
+
+    def gc(self):
+        """
+        Deletes all but the newest `keep` snapshots (never the current one)
+        and leftover staging directories from crashed jobs.
+        Files still mmapped by other workers stay readable until unmapped.
+        """
+        if not os.path.isdir(self.root):
+            return
+
+        current = self.current_name()
+        versions = sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith("v") and name[1:].isdigit()
+        )
+        stale = [name for name in versions[:max(0, len(versions) - self.keep)] if name != current]
+
+        for name in stale:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            # Staging dirs of jobs still running are younger than an hour
+            if name.startswith(".staging-") and time.time() - os.path.getmtime(path) > 3600:
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,54 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+
+class StartupPhases:
+    """
+    Timings of the steps a server process goes through before it is ready
+    (model load, index load, warm-up, ...).
+
+    Each phase records the pid that ran it: with preload, phases run in
+    the parent before the fork show up with the parent's pid in every
+    worker.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.ready = False
+        self._phases = {}
+        self._lock = threading.Lock()
+
+    def _set(self, name, **fields):
+        with self._lock:
+            self._phases.setdefault(name, {}).update(fields, pid=os.getpid())
+
+    @contextmanager
+    def phase(self, name):
+        self._set(name, status="running", ms=None, error=None)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._set(name, status="failed", ms=round((time.perf_counter() - started) * 1000, 1), error=str(e))
+            raise
+        self._set(name, status="ok", ms=round((time.perf_counter() - started) * 1000, 1))
+
+    def record(self, name, seconds):
+        self._set(name, status="ok", ms=round(seconds * 1000, 1), error=None)
+
+    def done(self, name):
+        with self._lock:
+            return self._phases.get(name, {}).get("status") == "ok"
+
+    def stats(self):
+        with self._lock:
+            phases = {name: dict(fields) for name, fields in self._phases.items()}
+        return {
+            "mode": self.mode,
+            "ready": self.ready,
+            "pid": os.getpid(),
+            "phases": phases,
+            "total_ms": round(sum(p["ms"] or 0 for p in phases.values()), 1),
+        }
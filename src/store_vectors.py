@@ -2,51 +2,71 @@ import pandas as pd
 import numpy as np
 import faiss
 import pickle
-from sentence_transformers import SentenceTransformer
+import os
+from functools import partial
+from bulk_encoder import BulkEncoder
+from embedding_cache import EmbeddingCache
+from encoders import default_onnx_file, load_encoder
+from index_factory import build_index, write_index_config
 
 CSV_PATH = r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\data\embedded_output1.csv"
 INDEX_PATH = "vector.index"
 METADATA_PATH = "metadata.pkl"
+MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = "embedding_cache"
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")  # flat | hnsw | ivf_flat | ivf_pq | fp16 | sq8
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")  # torch | torch_int8 | onnx | onnx_int8
+ENCODER_ONNX_FILE = os.getenv("ENCODER_ONNX_FILE") or default_onnx_file(ENCODER_BACKEND)
+ENCODER_DEVICE = os.getenv("ENCODER_DEVICE") or None  # unset: CUDA when available
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", os.cpu_count() or 1))
 
-# Load CSV
-df = pd.read_csv(CSV_PATH)
-df["transcript"] = df["transcript"].fillna("")
 
-texts = df["transcript"].tolist()
+# Encoder processes re-import this script (spawn), so the work lives in main()
+def main():
+    # Load CSV
+    df = pd.read_csv(CSV_PATH)
+    df["transcript"] = df["transcript"].fillna("")
 
-# Load model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+    texts = df["transcript"].tolist()
 
-# Generate normalized embeddings (FOR COSINE SIMILARITY)
-embeddings = model.encode(
-    texts,
-    convert_to_numpy=True,
-    normalize_embeddings=True
-).astype("float32")
+    # Encoder processes (one model copy each), fed length-bucketed batches
+    encoder = BulkEncoder(partial(load_encoder, MODEL_NAME, ENCODER_BACKEND, ENCODER_ONNX_FILE, ENCODER_DEVICE), workers=ENCODE_WORKERS)
 
-dimension = embeddings.shape[1]
+    # Generate normalized embeddings (FOR COSINE SIMILARITY)
+    # Only transcripts missing from the on-disk cache are sent to the model
+    cache = EmbeddingCache(EMBEDDING_CACHE_DIR, MODEL_NAME, normalize=True, backend=ENCODER_BACKEND, onnx_file=ENCODER_ONNX_FILE)
+    embeddings = cache.encode(encoder, texts)
+    encoder.close()
 
-# COSINE SIMILARITY INDEX
-index = faiss.IndexFlatIP(dimension)
-index.add(embeddings)
+    dimension = embeddings.shape[1]
 
-faiss.write_index(index, INDEX_PATH)
+    # COSINE SIMILARITY INDEX (ids = row positions, aligned with metadata)
+    index, config = build_index(INDEX_TYPE, dimension, embeddings, np.arange(len(embeddings)))
 
-# Metadata aligned with vectors
-metadata = df[[
-    "id",
-    "title",
-    "channel_title",
-    "viewCount",
-    "duration",
-    "transcript"
-]].rename(columns={
-    "id": "video_id",
-    "viewCount": "view_count"
-}).to_dict(orient="records")
+    faiss.write_index(index, INDEX_PATH)
+    write_index_config(INDEX_PATH, config)
 
-with open(METADATA_PATH, "wb") as f:
-    pickle.dump(metadata, f)
+    # Metadata aligned with vectors
+    metadata = df[[
+        "id",
+        "title",
+        "channel_title",
+        "viewCount",
+        "duration",
+        "transcript"
+    ]].rename(columns={
+        "id": "video_id",
+        "viewCount": "view_count"
+    }).to_dict(orient="records")
 
-print(f"✅ Stored {index.ntotal} vectors")
-print("✅ Index & metadata saved successfully")
+    with open(METADATA_PATH, "wb") as f:
+        pickle.dump(metadata, f)
+
+    print(f"✅ Stored {index.ntotal} vectors ({config['index_type']} index)")
+    print("✅ Index & metadata saved successfully")
+    print(f"📦 Embedding cache: {cache.stats()}")
+    print(f"⚡ Encoded {encoder.rows} rows at {encoder.stats()['rows_per_sec']} rows/sec ({ENCODE_WORKERS} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,29 @@
-import pickle
-import subprocess
+"""
+Summarizes one video from the current snapshot (the data the API serves;
+the legacy vector.index / metadata.pkl pair before the first snapshot).
+
+Run from the repo root:
+    python -m src.summarize_video
+"""
+import time
+
+from src.map_reduce_summary import MODEL_CONTEXT_TOKENS, MapReduceSummarizer, ollama_generate
+from src.snapshot_store import SnapshotStore
 
-# Load metadata
-with open("metadata.pkl", "rb") as f:
-    metadata = pickle.load(f)
+OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_MODEL = "llama3"
+
+# Load metadata (video_id lookup is a binary search over the mmapped columns)
+snapshot = SnapshotStore(
+    "snapshots", 384,
+    legacy_index_path="vector.index",
+    legacy_metadata_path="metadata.pkl"
+).current()
 
 video_id = input("Enter video ID to summarize: ").strip()
 
 # Find video
-video = next((v for v in metadata if v["video_id"] == video_id), None)
+video = snapshot.get(video_id)
 
 if not video:
     print("❌ Video ID not found in metadata.")
@@ -21,24 +36,17 @@ if not transcript or transcript.strip() == "":
     print("❌ Transcript not found for this video.")
     exit()
 
-prompt = f"""
-Summarize the following YouTube video clearly and concisely.
-Focus on key ideas and main takeaways.
-
-Transcript:
-{transcript}
-"""
-
-# Call Ollama (llama3)
-result = subprocess.run(
-    ["ollama", "run", "llama3"],
-    input=prompt.encode("utf-8"),
-    stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE
+# Long transcripts are summarized chunk by chunk, then combined
+summarizer = MapReduceSummarizer(
+    lambda prompt: ollama_generate(OLLAMA_URL, OLLAMA_MODEL, prompt, timeout=300, num_ctx=MODEL_CONTEXT_TOKENS),
+    max_workers=4
 )
 
-summary = result.stdout.decode("utf-8", errors="ignore")
+started = time.perf_counter()
+summary = summarizer.summarize(transcript)
+elapsed = time.perf_counter() - started
 
 print("\n📝 Video Summary:\n")
 print(summary)
+print(f"\n⏱️ {elapsed:.1f}s, {summarizer.calls} llama3 calls")
 
@@ -0,0 +1,174 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import Future
+
+# PRAGMA user_version of an up-to-date database (1: parts in summary_parts)
+SCHEMA_VERSION = 1
+
+
+def transcript_hash(transcript):
+    return hashlib.sha1(transcript.encode("utf-8")).hexdigest()
+
+
+class SummaryStore:
+    """
+    Persistent summary cache in SQLite, keyed by
+    (video_id, transcript hash, model, prompt version).
+    A changed transcript, model or prompt therefore never hits a stale entry.
+    Map-reduce chunk and reduce results live in a separate summary_parts
+    table, keyed by (stage, prompt hash, model, prompt version), so they
+    never count as summaries.
+    Safe to share between threads and between uvicorn workers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        """
+        Opened on first use in each process: an SQLite connection must not
+        be carried across fork (preloaded, forked API workers).
+        """
+        if self._pid == os.getpid():
+            return self._conn
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._pid = os.getpid()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                video_id        TEXT NOT NULL,
+                transcript_hash TEXT NOT NULL,
+                model           TEXT NOT NULL,
+                prompt_version  INTEGER NOT NULL,
+                summary         TEXT NOT NULL,
+                created_at      REAL NOT NULL,
+                PRIMARY KEY (video_id, transcript_hash, model, prompt_version)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS summary_parts (
+                stage           TEXT NOT NULL,
+                prompt_hash     TEXT NOT NULL,
+                model           TEXT NOT NULL,
+                prompt_version  INTEGER NOT NULL,
+                text            TEXT NOT NULL,
+                created_at      REAL NOT NULL,
+                PRIMARY KEY (stage, prompt_hash, model, prompt_version)
+            )
+        """)
+        # Parts used to be stored as "<stage>:<hash>" rows in summaries.
+        # user_version records that the cleanup ran, so it runs once per file
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._conn.execute(
+                "DELETE FROM summaries WHERE video_id LIKE 'map:%' "
+                "OR video_id LIKE 'reduce:%' OR video_id LIKE 'final:%'"
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+        return self._conn
+
+    def get(self, key, count=True):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT summary FROM summaries WHERE video_id = ? AND transcript_hash = ? "
+                "AND model = ? AND prompt_version = ?",
+                key
+            ).fetchone()
+            if count:
+                if row is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return row[0] if row else None
+
+    def put(self, key, summary):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, summary, time.time())
+            )
+            conn.commit()
+
+    def get_part(self, key):
+        """
+        Map-reduce intermediate results; not counted in hits / misses.
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT text FROM summary_parts WHERE stage = ? AND prompt_hash = ? "
+                "AND model = ? AND prompt_version = ?",
+                key
+            ).fetchone()
+            return row[0] if row else None
+
+    def put_part(self, key, text):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO summary_parts VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, text, time.time())
+            )
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            parts = conn.execute("SELECT COUNT(*) FROM summary_parts").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "parts": parts,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs
+    fn, everyone else arriving meanwhile waits for the same result.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def inflight(self):
+        return len(self._inflight)
@@ -0,0 +1,339 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from multiprocessing import util
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+# Marks the end of the download stage on the queue
+_DONE = object()
+
+
+# ===============================
+# WORKER PROCESS
+# ===============================
+# One model copy per pool process, loaded by the initializer
+_model = None
+
+
+def _init_worker(load_model, threads):
+    global _model
+    # Split the cores between workers instead of every worker
+    # spinning up a full set of intra-op threads
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _model = load_model()
+
+
+def _transcribe_file(transcribe, audio_path):
+    return _transcribe_with(transcribe, _model, audio_path)
+
+
+def _transcribe_with(transcribe, model, audio_path):
+    started = time.perf_counter()
+    text = transcribe(model, audio_path)
+    return text, time.perf_counter() - started
+
+
+class _DepthGauge:
+    """
+    Queue depth over time: current, maximum and time-weighted mean.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.depth = 0
+        self.max_depth = 0
+        self._area = 0.0
+        self._started = self._changed = time.perf_counter()
+        self._stopped = None
+
+    def set(self, depth):
+        with self._lock:
+            now = time.perf_counter()
+            self._area += self.depth * (now - self._changed)
+            self._changed = now
+            self.depth = depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def stop(self):
+        self.set(self.depth)
+        self._stopped = self._changed
+
+    def mean(self):
+        with self._lock:
+            now = self._stopped or time.perf_counter()
+            elapsed = now - self._started
+            area = self._area + self.depth * (now - self._changed)
+            return area / elapsed if elapsed else 0.0
+
+
+class TranscriptionPipeline:
+    """
+    Download -> transcribe pipeline with the two stages running at once.
+
+    download(video_id) -> audio path or None runs on `download_threads`
+    I/O threads (yt-dlp spends its time on the network). Downloaded files
+    go through a bounded queue to `transcribe_workers` spawned processes,
+    each holding its own model from load_model(); transcribe(model, path)
+    returns the text. With transcribe_workers=1 the model runs in this
+    process instead (e.g. one GPU).
+
+    Backpressure: once queue_size files are waiting, download threads
+    block before handing over their file, so at most queue_size +
+    download_threads + transcribe_workers audio files are on disk at a
+    time (fewer with keep_audio=False, which deletes each file once it
+    is transcribed).
+
+    load_model and transcribe must be picklable (module-level functions
+    or functools.partial of them). on_result(video_id, audio_path,
+    transcript, error) is called in the calling thread as each video
+    finishes (audio_path is None when its download failed), e.g. to
+    checkpoint results.
+    """
+
+    def __init__(self, download, load_model, transcribe, download_threads=8,
+                 transcribe_workers=None, queue_size=4, keep_audio=True, on_result=None):
+        self.download = download
+        self.load_model = load_model
+        self.transcribe = transcribe
+        self.download_threads = download_threads
+        self.transcribe_workers = max(1, transcribe_workers or os.cpu_count() or 1)
+        self.queue_size = queue_size
+        self.keep_audio = keep_audio
+        self.on_result = on_result
+
+        self._pool = None
+        self._finalizer = None
+        self._model = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.videos = 0
+        self.downloaded = 0
+        self.transcribed = 0
+        self.failed_downloads = []
+        self.failed_transcripts = []
+        self.download_sec = 0.0
+        self.download_blocked_sec = 0.0
+        self.transcribe_sec = 0.0
+        self.transcribe_idle_sec = 0.0
+        self.wall_sec = 0.0
+        self._gauge = _DepthGauge()
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self.transcribe_workers == 1:
+            if self._model is None:
+                self._model = self.load_model()
+            return
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.transcribe_workers)
+            # spawn: never fork a process that holds model or yt-dlp threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.transcribe_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.load_model, threads)
+            )
+            self._finalizer = util.Finalize(self, self._pool.shutdown, exitpriority=100)
+
+    # ---------------------------
+    # Download stage (threads)
+    # ---------------------------
+    def _download_one(self, video_id, handoff, stop):
+        if stop.is_set():
+            return
+        started = time.perf_counter()
+        try:
+            audio_path = self.download(video_id)
+        except Exception as e:
+            print(f"❌ Download failed for {video_id}: {e}")
+            audio_path = None
+        downloaded = time.perf_counter()
+
+        # Blocks while the queue is full: this is the backpressure.
+        # Failed downloads are queued too, so they are reported in order
+        handoff.put((video_id, audio_path))
+        self._gauge.set(handoff.qsize())
+
+        with self._lock:
+            self.download_sec += downloaded - started
+            self.download_blocked_sec += time.perf_counter() - downloaded
+            if audio_path is None:
+                self.failed_downloads.append(video_id)
+            else:
+                self.downloaded += 1
+
+    def _download_all(self, video_ids, handoff, stop):
+        with ThreadPoolExecutor(max_workers=self.download_threads, thread_name_prefix="download") as pool:
+            for video_id in video_ids:
+                pool.submit(self._download_one, video_id, handoff, stop)
+        handoff.put(_DONE)
+
+    def _abort(self, stop, handoff, downloader, inflight):
+        """
+        Shuts both stages down after the consumer loop raised (e.g. in
+        on_result). Queued downloads return at once; running ones still
+        put() their file, so the queue is emptied until the stage exits.
+        """
+        stop.set()
+        dropped = []
+        while downloader.is_alive():
+            try:
+                item = handoff.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is not _DONE and item[1] is not None:
+                dropped.append(item[1])
+        # Drop queued transcriptions; the next run() starts a fresh pool
+        dropped += [audio_path for future, (_, audio_path) in inflight.items() if future.cancel()]
+        if not self.keep_audio:
+            for audio_path in dropped:
+                try:
+                    os.remove(audio_path)
+                except OSError:
+                    pass
+        if self._pool is not None and inflight:
+            self._finalizer.cancel()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._gauge.stop()
+
+    # ---------------------------
+    # Transcription stage (processes)
+    # ---------------------------
+    def _finish(self, video_id, audio_path, text, seconds, error, results):
+        if audio_path is None:
+            error = "download failed"
+        elif error is not None:
+            print(f"❌ Whisper failed for {video_id}: {error}")
+            self.failed_transcripts.append(video_id)
+        else:
+            self.transcribed += 1
+            self.transcribe_sec += seconds
+            print(f"✅ Completed: {video_id}")
+        if error is not None:
+            text = ""
+        results.append({"id": video_id, "transcript": text})
+        if self.on_result is not None:
+            self.on_result(video_id, audio_path, text, error)
+
+        if audio_path is not None and not self.keep_audio:
+            try:
+                os.remove(audio_path)
+            except OSError:
+                pass
+
+    def _collect(self, done, inflight, results):
+        for future in done:
+            video_id, audio_path = inflight.pop(future)
+            error = future.exception()
+            text, seconds = future.result() if error is None else ("", 0.0)
+            self._finish(video_id, audio_path, text, seconds, error, results)
+
+    def run(self, video_ids):
+        """
+        Downloads and transcribes every video. Returns one
+        {"id", "transcript"} dict per video in completion order, with an
+        empty transcript for failures (see failed_downloads /
+        failed_transcripts).
+        """
+        self.reset_stats()
+        self.videos = len(video_ids)
+        started = time.perf_counter()
+        self._ensure_started()
+
+        handoff = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        downloader = threading.Thread(
+            target=self._download_all, args=(video_ids, handoff, stop), name="download-stage", daemon=True
+        )
+        downloader.start()
+
+        results = []
+        inflight = {}
+        try:
+            self._consume(handoff, inflight, results)
+        except BaseException:
+            self._abort(stop, handoff, downloader, inflight)
+            raise
+        downloader.join()
+        self._gauge.stop()
+        self.wall_sec = time.perf_counter() - started
+        return results
+
+    def _consume(self, handoff, inflight, results):
+        while True:
+            waiting = time.perf_counter()
+            item = handoff.get()
+            if not inflight:
+                # Nothing was transcribing while we waited: the stage was starved
+                self.transcribe_idle_sec += time.perf_counter() - waiting
+            self._gauge.set(handoff.qsize())
+            if item is _DONE:
+                break
+            video_id, audio_path = item
+            if audio_path is None:
+                self._finish(video_id, None, "", 0.0, None, results)
+                continue
+            print(f"📝 Transcribing {video_id} ...")
+
+            if self._pool is None:
+                try:
+                    text, seconds = _transcribe_with(self.transcribe, self._model, audio_path)
+                    error = None
+                except Exception as e:
+                    text, seconds, error = "", 0.0, e
+                self._finish(video_id, audio_path, text, seconds, error, results)
+                continue
+
+            inflight[self._pool.submit(_transcribe_file, self.transcribe, audio_path)] = (video_id, audio_path)
+            # Only take more files off the queue once a worker is free,
+            # so waiting files stay countable (and bounded) in the queue
+            if len(inflight) >= self.transcribe_workers:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                self._collect(done, inflight, results)
+
+        self._collect(wait(inflight).done, inflight, results)
+
+    def close(self):
+        if self._pool is not None:
+            self._finalizer()
+            self._pool = None
+
+    def stats(self):
+        wall = self.wall_sec
+        return {
+            "videos": self.videos,
+            "wall_sec": round(wall, 3),
+            "download": {
+                "threads": self.download_threads,
+                "done": self.downloaded,
+                "failed": len(self.failed_downloads),
+                "busy_sec": round(self.download_sec, 3),
+                "per_sec": round(self.downloaded / wall, 3) if wall else 0.0,
+                # Time download threads waited for queue space
+                "blocked_sec": round(self.download_blocked_sec, 3),
+            },
+            "transcribe": {
+                "workers": self.transcribe_workers,
+                "done": self.transcribed,
+                "failed": len(self.failed_transcripts),
+                "busy_sec": round(self.transcribe_sec, 3),
+                "per_sec": round(self.transcribed / wall, 3) if wall else 0.0,
+                # Time no transcription was running because no file was ready
+                "idle_sec": round(self.transcribe_idle_sec, 3),
+            },
+            "queue": {
+                "size": self.queue_size,
+                "depth": self._gauge.depth,
+                "max_depth": self._gauge.max_depth,
+                "mean_depth": round(self._gauge.mean(), 3),
+            },
+        }
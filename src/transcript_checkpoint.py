@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+import pandas as pd
+
+
+def audio_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class TranscriptCheckpoint:
+    """
+    Durable log of per-video transcription results in SQLite, keyed by
+    (video_id, model).
+
+    Every result is committed the moment its video finishes, so a crash
+    loses at most the videos in flight. On restart pending() drops videos
+    already transcribed with this model whose audio is unchanged; failed
+    videos stay pending, so a rerun retries exactly those. compact()
+    writes the final CSV / Parquet from the log.
+    """
+
+    def __init__(self, path, model):
+        self.path = path
+        self.model = model
+        self.skipped = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Commit means on disk, even on power loss
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id    TEXT NOT NULL,
+                model       TEXT NOT NULL,
+                status      TEXT NOT NULL,
+                stage       TEXT,
+                transcript  TEXT,
+                error       TEXT,
+                audio_hash  TEXT,
+                audio_size  INTEGER,
+                audio_mtime INTEGER,
+                attempts    INTEGER NOT NULL,
+                updated_at  REAL NOT NULL,
+                PRIMARY KEY (video_id, model)
+            )
+        """)
+        self._conn.commit()
+
+    # ---------------------------
+    # Writing
+    # ---------------------------
+    def _write(self, video_id, status, stage, transcript, error, audio_path):
+        fingerprint = (None, None, None)
+        if audio_path is not None and os.path.exists(audio_path):
+            st = os.stat(audio_path)
+            fingerprint = (audio_hash(audio_path), st.st_size, st.st_mtime_ns)
+
+        # A failed rerun of a finished video keeps the last good transcript
+        # and the fingerprint of the audio it came from, so the video stays
+        # done and pending() still retries it while its audio differs
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT (video_id, model) DO UPDATE SET
+                    status = CASE WHEN keep_done THEN status ELSE excluded.status END,
+                    stage = excluded.stage, error = excluded.error,
+                    transcript = CASE WHEN keep_done THEN transcript ELSE excluded.transcript END,
+                    audio_hash = CASE WHEN keep_done THEN audio_hash
+                        ELSE COALESCE(excluded.audio_hash, audio_hash) END,
+                    audio_size = CASE WHEN keep_done THEN audio_size
+                        ELSE COALESCE(excluded.audio_size, audio_size) END,
+                    audio_mtime = CASE WHEN keep_done THEN audio_mtime
+                        ELSE COALESCE(excluded.audio_mtime, audio_mtime) END,
+                    attempts = attempts + 1, updated_at = excluded.updated_at
+                """.replace("keep_done", "(status = 'done' AND excluded.status = 'failed')"),
+                (video_id, self.model, status, stage, transcript, error, *fingerprint, time.time())
+            )
+            self._conn.commit()
+
+    def record(self, video_id, transcript, audio_path=None):
+        self._write(video_id, "done", None, transcript, None, audio_path)
+
+    def record_failure(self, video_id, stage, error, audio_path=None):
+        """
+        stage is "download" or "transcribe". A video already done keeps
+        its transcript; only stage and error record the failed attempt.
+        """
+        self._write(video_id, "failed", stage, None, str(error), audio_path)
+
+    def record_result(self, video_id, audio_path, transcript, error):
+        """
+        TranscriptionPipeline on_result callback (audio_path None means
+        the download failed).
+        """
+        if error is None:
+            self.record(video_id, transcript, audio_path)
+        elif audio_path is None:
+            self.record_failure(video_id, "download", error)
+        else:
+            self.record_failure(video_id, "transcribe", error, audio_path)
+
+    # ---------------------------
+    # Reading
+    # ---------------------------
+    def _done_rows(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id, audio_hash, audio_size, audio_mtime FROM transcripts "
+                "WHERE model = ? AND status = 'done'",
+                (self.model,)
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def is_current(self, done_row, audio_path):
+        """
+        A finished video is only redone when its audio file is on disk and
+        differs from the transcribed one (size/mtime first, then hash).
+        Without the file the recorded result is trusted.
+        """
+        recorded_hash, size, mtime = done_row
+        if audio_path is None or not os.path.exists(audio_path) or recorded_hash is None:
+            return True
+        st = os.stat(audio_path)
+        if (st.st_size, st.st_mtime_ns) == (size, mtime):
+            return True
+        return audio_hash(audio_path) == recorded_hash
+
+    def pending(self, video_ids, audio_path_of=None):
+        """
+        The video_ids (in order) still to transcribe with this model.
+        audio_path_of(video_id) gives where a video's audio would be.
+        """
+        done = self._done_rows()
+        pending = [
+            vid for vid in video_ids
+            if vid not in done or not self.is_current(done[vid], audio_path_of(vid) if audio_path_of else None)
+        ]
+        self.skipped = len(video_ids) - len(pending)
+        return pending
+
+    def failed(self, stage=None):
+        query = "SELECT video_id FROM transcripts WHERE model = ? AND status = 'failed'"
+        params = (self.model,)
+        if stage is not None:
+            query += " AND stage = ?"
+            params += (stage,)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query + " ORDER BY video_id", params)]
+
+    def results(self, video_ids):
+        """
+        {"id", "transcript"} per video in video_ids order ("" when not done).
+        """
+        with self._lock:
+            done = dict(self._conn.execute(
+                "SELECT video_id, transcript FROM transcripts WHERE model = ? AND status = 'done'",
+                (self.model,)
+            ).fetchall())
+        return [{"id": vid, "transcript": done.get(vid, "")} for vid in video_ids]
+
+    # ---------------------------
+    # Compaction
+    # ---------------------------
+    def compact(self, output_path, video_ids):
+        """
+        Writes the log's transcripts for video_ids to output_path (.parquet
+        or CSV), via a temp file and rename so a crash never leaves half a file.
+        """
+        df = pd.DataFrame(self.results(video_ids), columns=["id", "transcript"])
+        output_path = str(output_path)
+        tmp = output_path + ".tmp"
+        if output_path.endswith(".parquet"):
+            try:
+                df.to_parquet(tmp, index=False)
+            except ImportError as e:
+                raise RuntimeError(
+                    f"Writing {output_path} needs pyarrow (pip install pyarrow); "
+                    "use a .csv output path otherwise"
+                ) from e
+        else:
+            df.to_csv(tmp, index=False)
+        os.replace(tmp, output_path)
+        print(f"[✓] Saved: {output_path}")
+        return len(df)
+
+    def write_failures(self, path):
+        """
+        Failed video ids by stage as JSON, for targeted retries.
+        """
+        failures = {"download": self.failed("download"), "transcribe": self.failed("transcribe")}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(failures, f, indent=2)
+        return failures
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM transcripts WHERE model = ? GROUP BY status",
+                (self.model,)
+            ).fetchall())
+        return {
+            "model": self.model,
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "skipped": self.skipped,
+        }
+
+    def close(self):
+        self._conn.close()
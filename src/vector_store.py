@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+
+from src.index_factory import extract_vectors
+
+VECTORS_FILE = "vectors.npy"
+VECTOR_IDS_FILE = "vector_ids.npy"
+
+
+class VectorStore:
+    """
+    Full-precision float32 embeddings keyed by faiss id, kept next to a
+    (possibly quantized) index.
+
+    Loaded via np.load(mmap_mode="r"), so only the rows that get
+    re-ranked are paged in; the search index itself can stay compressed.
+    In an ingest worker it is loaded into memory and updated with upsert().
+    """
+
+    def __init__(self, ids, vectors):
+        self.ids = ids
+        self.vectors = vectors
+        self._pending = {}
+        self._index_positions()
+
+    def _index_positions(self):
+        size = int(self.ids.max()) + 1 if len(self.ids) else 0
+        self._positions = np.full(size, -1, dtype="int64")
+        self._positions[self.ids] = np.arange(len(self.ids))
+
+    @classmethod
+    def from_index(cls, index):
+        """
+        Bootstraps a store from vectors held in an index (exact for flat,
+        HNSW and IVF-flat indexes; PQ codes only give approximations).
+        """
+        ids, vectors = extract_vectors(index)
+        return cls(ids, np.ascontiguousarray(vectors, dtype="float32"))
+
+    @classmethod
+    def load(cls, snapshot_dir, mmap=True):
+        """
+        Returns None for snapshots written without a vector store.
+        """
+        vectors_path = os.path.join(snapshot_dir, VECTORS_FILE)
+        if not os.path.exists(vectors_path):
+            return None
+        mmap_mode = "r" if mmap else None
+        return cls(
+            np.load(os.path.join(snapshot_dir, VECTOR_IDS_FILE)),
+            np.load(vectors_path, mmap_mode=mmap_mode)
+        )
+
+    def _flush(self):
+        if not self._pending:
+            return
+        new_ids = np.fromiter(self._pending.keys(), dtype="int64", count=len(self._pending))
+        new_vectors = np.stack(list(self._pending.values())).astype("float32")
+        self.ids = np.concatenate([self.ids, new_ids])
+        self.vectors = np.concatenate([np.asarray(self.vectors), new_vectors])
+        self._pending = {}
+        self._index_positions()
+
+    def upsert(self, ids, vectors):
+        """
+        Replaces vectors of known ids in place and buffers new ones.
+        Needs a store loaded with mmap=False.
+        """
+        ids = np.asarray(ids, dtype="int64")
+        positions = self.positions(ids)
+        known = positions >= 0
+        if known.any():
+            self.vectors[positions[known]] = vectors[known]
+        for faiss_id, vector in zip(ids[~known], vectors[~known]):
+            self._pending[int(faiss_id)] = vector
+
+    def positions(self, ids):
+        ids = np.asarray(ids, dtype="int64")
+        positions = np.full(len(ids), -1, dtype="int64")
+        inside = (ids >= 0) & (ids < len(self._positions))
+        positions[inside] = self._positions[ids[inside]]
+        return positions
+
+    def get(self, ids):
+        """
+        float32 vectors of ids, including buffered upserts.
+        """
+        self._flush()
+        positions = self.positions(ids)
+        if (positions < 0).any():
+            raise KeyError(f"{int((positions < 0).sum())} ids not in the vector store")
+        return np.asarray(self.vectors[positions], dtype="float32")
+
+    def all(self):
+        """
+        (ids, vectors) for every stored vector, including buffered upserts.
+        """
+        self._flush()
+        return self.ids, np.asarray(self.vectors, dtype="float32")
+
+    def save(self, snapshot_dir):
+        self._flush()
+        np.save(os.path.join(snapshot_dir, VECTOR_IDS_FILE), self.ids)
+        np.save(os.path.join(snapshot_dir, VECTORS_FILE), np.asarray(self.vectors, dtype="float32"))
+        return [VECTOR_IDS_FILE, VECTORS_FILE]
+
+    def rerank(self, queries, candidate_ids, top_k):
+        """
+        Re-scores each query's candidates with exact inner products against
+        the stored float32 vectors. Returns (scores, ids) shaped (nq, top_k),
+        padded with -inf / -1 like index.search.
+        """
+        nq, n_candidates = candidate_ids.shape
+        positions = self.positions(candidate_ids.ravel()).reshape(nq, n_candidates)
+        valid = positions >= 0
+
+        # Sorted unique rows keep mmap reads sequential
+        rows, inverse = np.unique(positions[valid], return_inverse=True)
+        vectors = np.asarray(self.vectors[rows], dtype="float32")
+
+        scores = np.full((nq, n_candidates), -np.inf, dtype="float32")
+        query_of = np.nonzero(valid)[0]
+        scores[valid] = np.einsum("ij,ij->i", queries[query_of], vectors[inverse])
+
+        order = np.argsort(-scores, axis=1)[:, :top_k]
+        top_scores = np.take_along_axis(scores, order, axis=1)
+        top_ids = np.take_along_axis(candidate_ids, order, axis=1)
+        top_ids[~np.isfinite(top_scores)] = -1
+        return top_scores, top_ids
+
+    def search_subset(self, queries, ids, top_k):
+        """
+        Exact top_k of each query among ids only (e.g. the rows a filter
+        selects). Returns (scores, ids) shaped (nq, top_k), padded with
+        -inf / -1 like index.search.
+        """
+        ids = np.asarray(ids, dtype="int64")
+        positions = self.positions(ids)
+        keep = positions >= 0
+        # Sorted rows keep mmap reads sequential
+        order = np.argsort(positions[keep])
+        ids, positions = ids[keep][order], positions[keep][order]
+
+        nq = len(queries)
+        top_scores = np.full((nq, top_k), -np.inf, dtype="float32")
+        top_ids = np.full((nq, top_k), -1, dtype="int64")
+        k = min(top_k, len(ids))
+        if k == 0:
+            return top_scores, top_ids
+
+        scores = queries @ np.asarray(self.vectors[positions], dtype="float32").T
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(best, np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1), axis=1)
+        top_scores[:, :k] = np.take_along_axis(scores, best, axis=1)
+        top_ids[:, :k] = ids[best]
+        return top_scores, top_ids
+
+    def stats(self):
+        return {
+            "vectors": int(len(self.ids) + len(self._pending)),
+            "bytes": int(self.vectors.nbytes),
+        }
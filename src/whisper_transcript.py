@@ -1,9 +1,11 @@
+import os
 import subprocess
 import whisper
 import torch
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from utils import ensure_dir, load_csv, save_csv
+from utils import ensure_dir, load_csv
+from transcribe_pipeline import TranscriptionPipeline
+from transcript_checkpoint import TranscriptCheckpoint
 import time
 
 # ===============================
@@ -12,6 +14,9 @@ import time
 VIDEO_CSV = r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\data\Tech_with_Tim.csv"
 AUDIO_DIR = Path(r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\audio_downloads")
 OUTPUT_CSV = r"E:\Internship\Infosys Springboard\Infosys Task1\INFOSYS TASK1\data\twt_transcripts.csv"
+# Results are committed here per video; a rerun skips finished ones
+CHECKPOINT_DB = str(Path(OUTPUT_CSV).with_suffix(".checkpoint.db"))
+FAILURES_JSON = str(Path(OUTPUT_CSV).with_suffix(".failed.json"))
 
 ensure_dir(AUDIO_DIR)
 
@@ -19,19 +24,21 @@ ensure_dir(AUDIO_DIR)
 # Device Setup
 # ===============================
 device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"🔧 Using device: {device}")
 
-# Load Whisper model
+# Whisper model, loaded once per transcription worker
 model_name = "tiny"  # tiny = fastest, base = more accurate
-model = whisper.load_model(model_name).to(device)
 
 # ===============================
 # Globals
 # ===============================
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
-failed_downloads = []
-failed_transcripts = []
+
+# Downloads (network-bound) run on threads while finished files are
+# transcribed by worker processes; at most QUEUE_SIZE files wait in between
+DOWNLOAD_THREADS = 8
+TRANSCRIBE_WORKERS = 1 if device == "cuda" else min(4, os.cpu_count() or 1)
+QUEUE_SIZE = 4
 
 # ===============================
 # Audio Download Function
@@ -61,73 +68,70 @@ def download_audio(vid):
         time.sleep(RETRY_DELAY)
 
     print(f"⚠️ Failed to download {vid} after {MAX_RETRIES} attempts")
-    failed_downloads.append(vid)
     return None
 
 # ===============================
 # Transcription Function
 # ===============================
-def transcribe_audio(vid):
-    audio_file = download_audio(vid)
-    if audio_file is None:
-        failed_transcripts.append(vid)
-        return {"id": vid, "transcript": ""}
-
-    try:
-        print(f"📝 Transcribing {vid} ...")
-        result = model.transcribe(audio_file)
-        return {"id": vid, "transcript": result["text"]}
-    except Exception as e:
-        print(f"❌ Whisper failed for {vid}: {e}")
-        failed_transcripts.append(vid)
-        return {"id": vid, "transcript": ""}
+def load_model():
+    return whisper.load_model(model_name).to(device)
+
+def transcribe_file(model, audio_file):
+    return model.transcribe(audio_file)["text"]
+
+def print_stats(stats):
+    print(f"\n⏱ {stats['videos']} videos in {stats['wall_sec']}s")
+    print(f"   download:   {stats['download']}")
+    print(f"   transcribe: {stats['transcribe']}")
+    print(f"   queue:      {stats['queue']}")
 
 # ===============================
 # Main Function
 # ===============================
 def main():
+    print(f"🔧 Using device: {device}")
     df = load_csv(VIDEO_CSV)
     video_ids = df["id"].tolist()
-    print(f"📌 Total videos to process: {len(video_ids)}\n")
-
-    results = []
+    checkpoint = TranscriptCheckpoint(CHECKPOINT_DB, f"whisper:{model_name}")
+    pending = checkpoint.pending(video_ids, lambda vid: AUDIO_DIR / f"{vid}.mp3")
+    print(f"📌 Total videos: {len(video_ids)}, already transcribed: {checkpoint.skipped}, to process: {len(pending)}\n")
+
+    pipeline = TranscriptionPipeline(
+        download_audio,
+        load_model,
+        transcribe_file,
+        download_threads=DOWNLOAD_THREADS,
+        transcribe_workers=TRANSCRIBE_WORKERS,
+        queue_size=QUEUE_SIZE,
+        on_result=checkpoint.record_result
+    )
 
     # -------------------------
-    # STEP 1 — Parallel Downloads & Transcriptions
+    # STEP 1 — Downloads overlapped with transcription
     # -------------------------
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = {executor.submit(transcribe_audio, vid): vid for vid in video_ids}
-        for future in as_completed(futures):
-            vid = futures[future]
-            try:
-                res = future.result()
-                results.append(res)
-                print(f"✅ Completed: {vid}")
-            except Exception as e:
-                print(f"❌ Failed: {vid}, error: {e}")
-                failed_transcripts.append(vid)
+    pipeline.run(pending)
+    print_stats(pipeline.stats())
 
     # -------------------------
     # STEP 2 — Retry failed downloads/transcriptions once
     # -------------------------
-    if failed_downloads or failed_transcripts:
+    retry_ids = pipeline.failed_downloads + pipeline.failed_transcripts
+    if retry_ids:
         print(f"\n🔁 Retrying failed downloads/transcriptions...")
-        retry_ids = list(set(failed_downloads + failed_transcripts))
-        failed_downloads.clear()
-        failed_transcripts.clear()
-        for vid in retry_ids:
-            res = transcribe_audio(vid)
-            results.append(res)
+        pipeline.run(retry_ids)
+    pipeline.close()
 
     # -------------------------
-    # STEP 3 — Save transcripts
+    # STEP 3 — Compact the checkpoint into the transcripts CSV
     # -------------------------
-    save_csv(results, OUTPUT_CSV)
+    checkpoint.compact(OUTPUT_CSV, video_ids)
+    failures = checkpoint.write_failures(FAILURES_JSON)
+    checkpoint.close()
     print("\n💾 Transcripts saved!")
-    if failed_downloads or failed_transcripts:
-        print(f"⚠️ Some videos still failed:")
-        print(f"Failed downloads: {failed_downloads}")
-        print(f"Failed transcripts: {failed_transcripts}")
+    if failures["download"] or failures["transcribe"]:
+        print(f"⚠️ Some videos still failed (listed in {FAILURES_JSON}, retried on the next run):")
+        print(f"Failed downloads: {failures['download']}")
+        print(f"Failed transcripts: {failures['transcribe']}")
     else:
         print("🎉 All videos processed successfully!")
 